@@ -0,0 +1,173 @@
+"""
+Checkpoint serializer benchmark.
+
+Compares the bytes stored and the serialize/deserialize time of langgraph's default
+JsonPlusSerializer against the zstd CompressedSerializer, with and without a trained
+dictionary, on recorded conversations:
+
+    PYTHONPATH=src uv run python -m benchmarks.checkpoints.serde_benchmark --db /app/data/memory.db
+
+Checkpoints are read back with the runtime serializer, so databases written with or
+without compression both work. The dictionary is trained on the older half of the
+checkpoints and measured on the newer half. Without a database, `--synthetic N`
+generates N checkpoints of made-up conversations instead.
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from anantha.modules.memory.short_term.serializer import (
+    CompressedSerializer,
+    get_checkpoint_serializer,
+    train_dictionary,
+)
+
+USER_TURNS = [
+    "Hey! How's your day going?",
+    "What are you up to right now?",
+    "I just got back from a long run, I'm exhausted",
+    "Do you have any book recommendations?",
+    "Can you send me a picture of where you are?",
+    "Send me a voice note, I want to hear your voice",
+    "My sister is visiting from Pune this weekend",
+    "I've been learning to cook biryani, it's harder than it looks",
+]
+
+REPLIES = [
+    "Honestly it's been a slow one, I'm still on my second coffee and pretending to read papers.",
+    "Oh nice, how far did you go? I keep promising myself I'll start running again.",
+    "You have to read The God of Small Things if you haven't, it wrecked me in the best way.",
+    "Biryani is a patience game! The dum part is where everyone rushes, give it the full time.",
+    "That sounds lovely, are you planning to show her around or just hang out at home?",
+]
+
+
+def read_checkpoints(db_path: str, limit: int) -> List[Any]:
+    serde = get_checkpoint_serializer()
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT type, checkpoint FROM checkpoints ORDER BY checkpoint_id LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [serde.loads_typed((type_, data)) for type_, data in rows]
+
+
+def synthetic_checkpoints(count: int, seed: int) -> List[Any]:
+    rng = random.Random(seed)
+    checkpoints = []
+    messages: List[Any] = []
+    summary = ""
+    for _ in range(count):
+        messages = messages + [
+            HumanMessage(content=rng.choice(USER_TURNS)),
+            AIMessage(content=rng.choice(REPLIES)),
+        ]
+        if len(messages) > 40:
+            summary += " They talked about " + rng.choice(USER_TURNS).lower()
+            messages = messages[-10:]
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {
+            "messages": messages,
+            "summary": summary,
+            "workflow": rng.choice(["conversation", "image", "audio"]),
+            "current_activity": "Working on the thesis at the university library",
+            "memory_context": "- User's name is Arjun\n- User lives in Bangalore\n- User likes running",
+        }
+        checkpoints.append(checkpoint)
+    return checkpoints
+
+
+def measure(
+    name: str, serde: SerializerProtocol, checkpoints: List[Any], repeat: int
+) -> Dict[str, float]:
+    encoded = [serde.dumps_typed(c) for c in checkpoints]
+
+    dumps_times, loads_times = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for checkpoint in checkpoints:
+            serde.dumps_typed(checkpoint)
+        dumps_times.append((time.perf_counter() - started) / len(checkpoints))
+
+        started = time.perf_counter()
+        for payload in encoded:
+            serde.loads_typed(payload)
+        loads_times.append((time.perf_counter() - started) / len(checkpoints))
+
+    return {
+        "name": name,
+        "bytes": sum(len(data) for _, data in encoded),
+        "dumps_us": statistics.median(dumps_times) * 1e6,
+        "loads_us": statistics.median(loads_times) * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Checkpoint serializer benchmark")
+    parser.add_argument("--db", help="Checkpoint database with recorded conversations")
+    parser.add_argument(
+        "--limit", type=int, default=5000, help="Checkpoints read from the database"
+    )
+    parser.add_argument(
+        "--synthetic", type=int, default=2000, help="Checkpoints generated without --db"
+    )
+    parser.add_argument("--level", type=int, default=3, help="zstd compression level")
+    parser.add_argument("--dict-size", type=int, default=112640)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    checkpoints = (
+        read_checkpoints(args.db, args.limit)
+        if args.db
+        else synthetic_checkpoints(args.synthetic, args.seed)
+    )
+    if len(checkpoints) < 20:
+        raise SystemExit(
+            f"Only {len(checkpoints)} checkpoints, not enough to train a dictionary"
+        )
+
+    half = len(checkpoints) // 2
+    train, test = checkpoints[:half], checkpoints[half:]
+    default = JsonPlusSerializer()
+    dictionary = train_dictionary(
+        [default.dumps_typed(c)[1] for c in train], args.dict_size
+    )
+
+    serializers = {
+        "jsonplus (default)": default,
+        "zstd": CompressedSerializer(default, level=args.level),
+        "zstd + dictionary": CompressedSerializer(
+            default, level=args.level, dictionaries=[dictionary]
+        ),
+    }
+    results = [
+        measure(name, serde, test, args.repeat) for name, serde in serializers.items()
+    ]
+
+    baseline = results[0]["bytes"]
+    print(f"{len(test)} checkpoints (dictionary trained on {len(train)})")
+    print(
+        f"{'serializer':<20} {'bytes':>12} {'ratio':>7} {'dumps us':>10} {'loads us':>10}"
+    )
+    for result in results:
+        print(
+            f"{result['name']:<20} {result['bytes']:>12} {baseline / result['bytes']:>6.2f}x "
+            f"{result['dumps_us']:>10.1f} {result['loads_us']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
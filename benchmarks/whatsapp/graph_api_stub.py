@@ -0,0 +1,222 @@
+"""
+Local stand-in for the WhatsApp Cloud (Graph) API endpoints used by the webhook.
+
+It serves media metadata, media downloads, media uploads and outgoing messages, with
+configurable latency and error injection, so the webhook path can be exercised
+without hitting Meta. Point the webhook at it with:
+
+    WHATSAPP_GRAPH_API_URL=http://localhost:9101/v21.0
+
+Run standalone with:
+
+    uv run python -m benchmarks.whatsapp.graph_api_stub --port 9101 --latency-ms 80 --error-rate 0.02
+
+The load generator starts its own in-process copy on port 9100, so the standalone stub
+defaults to 9101 and both can run side by side.
+"""
+
+import argparse
+import asyncio
+import io
+import random
+import struct
+import time
+import uuid
+import wave
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+API_VERSION = "v21.0"
+
+
+@dataclass
+class StubConfig:
+    """Latency and error injection settings of the stub."""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    audio_bytes: Optional[bytes] = None
+    image_bytes: Optional[bytes] = None
+
+
+@dataclass
+class DeliveredMessage:
+    """Represent a message received on the stub's messages endpoint."""
+
+    to: str
+    type: str
+    received_at: float
+    payload: Dict = field(repr=False)
+
+
+def sample_wav(seconds: float = 1.0, sample_rate: int = 16000) -> bytes:
+    """Return a mono 16-bit WAV file containing a quiet tone."""
+    frames = b"".join(
+        struct.pack("<h", int(2000 * ((i // 40) % 2 * 2 - 1)))
+        for i in range(int(seconds * sample_rate))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def sample_png(width: int = 64, height: int = 64) -> bytes:
+    """Return a small gradient PNG image."""
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data))
+        )
+
+    rows = b"".join(
+        b"\x00"
+        + bytes(
+            value for x in range(width) for value in (x * 4 % 256, y * 4 % 256, 128)
+        )
+        for y in range(height)
+    )
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def create_app(
+    config: StubConfig, on_message: Optional[Callable[[DeliveredMessage], None]] = None
+) -> FastAPI:
+    """Create the stub FastAPI application.
+
+    Args:
+        config: Latency and error injection settings.
+        on_message: Optional callback invoked for every message accepted on the messages endpoint.
+    """
+    app = FastAPI()
+    app.state.delivered = []
+    app.state.uploads = 0
+    audio = config.audio_bytes or sample_wav()
+    image = config.image_bytes or sample_png()
+
+    async def simulate() -> Optional[Response]:
+        delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if random.random() < config.error_rate:
+            if random.random() < 0.5:
+                return JSONResponse(
+                    {"error": {"message": "Rate limit hit", "code": 130429}},
+                    status_code=429,
+                    headers={"Retry-After": "1"},
+                )
+            return JSONResponse(
+                {"error": {"message": "Injected server error", "code": 2}},
+                status_code=500,
+            )
+        return None
+
+    def media_content(media_id: str) -> bytes:
+        return audio if media_id.startswith("audio") else image
+
+    @app.get(f"/{API_VERSION}/{{media_id}}")
+    async def media_metadata(media_id: str, request: Request):
+        if error := await simulate():
+            return error
+        content = media_content(media_id)
+        return {
+            "id": media_id,
+            "url": f"{str(request.base_url).rstrip('/')}/media/{media_id}",
+            "mime_type": "audio/wav" if media_id.startswith("audio") else "image/png",
+            "file_size": len(content),
+            "messaging_product": "whatsapp",
+        }
+
+    @app.get("/media/{media_id}")
+    async def media_download(media_id: str):
+        if error := await simulate():
+            return error
+        return Response(
+            content=media_content(media_id), media_type="application/octet-stream"
+        )
+
+    @app.post(f"/{API_VERSION}/{{phone_number_id}}/media")
+    async def media_upload(phone_number_id: str, request: Request):
+        await request.body()
+        if error := await simulate():
+            return error
+        app.state.uploads += 1
+        return {"id": f"uploaded-{uuid.uuid4().hex}"}
+
+    @app.post(f"/{API_VERSION}/{{phone_number_id}}/messages")
+    async def messages(phone_number_id: str, request: Request):
+        payload = await request.json()
+        if error := await simulate():
+            return error
+
+        delivered = DeliveredMessage(
+            to=payload.get("to", ""),
+            type=payload.get("type", "text"),
+            received_at=time.perf_counter(),
+            payload=payload,
+        )
+        app.state.delivered.append(delivered)
+        if on_message is not None:
+            on_message(delivered)
+
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": delivered.to, "wa_id": delivered.to}],
+            "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}],
+        }
+
+    @app.head(f"/{API_VERSION}")
+    async def warmup():
+        return Response(status_code=200)
+
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local WhatsApp Graph API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--audio-file", help="Audio file served for audio media ids")
+    parser.add_argument("--image-file", help="Image file served for image media ids")
+    return parser.parse_args()
+
+
+def read_optional(path: Optional[str]) -> Optional[bytes]:
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stub_config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        audio_bytes=read_optional(args.audio_file),
+        image_bytes=read_optional(args.image_file),
+    )
+    uvicorn.run(
+        create_app(stub_config), host=args.host, port=args.port, log_level="warning"
+    )
@@ -0,0 +1,353 @@
+"""
+Webhook load generator for the WhatsApp interface.
+
+Starts the local Graph API stand-in in-process (so no standalone stub may be running
+on `--stub-port`), posts realistic text, audio and image
+webhook payloads to the webhook at a target rate and concurrency, and matches every
+reply the webhook sends back through the stand-in to the message that caused it.
+End-to-end latency is measured from the webhook POST to the reply reaching the
+messages endpoint.
+
+Start the webhook against the stand-in first, e.g.:
+
+    WHATSAPP_GRAPH_API_URL=http://127.0.0.1:9100/v21.0 \\
+        fastapi run src/anantha/interfaces/whatsapp/webhook_endpoint.py --port 8080
+
+then run:
+
+    uv run python -m benchmarks.whatsapp.load_generator --rate 5 --messages 200 --concurrency 50
+
+LLM, TTS and image providers are still called by the graph; only the Graph API is
+replaced.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List
+
+import httpx
+import uvicorn
+
+from benchmarks.whatsapp.graph_api_stub import (
+    DeliveredMessage,
+    StubConfig,
+    create_app,
+    read_optional,
+)
+
+TEXT_MESSAGES = [
+    "Hey! How's your day going?",
+    "What are you up to right now?",
+    "I just got back from a long run, I'm exhausted",
+    "Do you have any book recommendations?",
+    "Can you send me a picture of where you are?",
+    "Show me what your desk looks like",
+    "Send me a voice note, I want to hear your voice",
+    "My name is Priya and I work as a data scientist in Bangalore",
+]
+
+IMAGE_CAPTIONS = ["", "Look at this!", "What do you think of my new setup?"]
+
+
+@dataclass
+class PendingMessage:
+    """Represent a webhook message waiting for its reply."""
+
+    kind: str
+    sent_at: float
+
+
+@dataclass
+class LoadReport:
+    """Collect the measurements of a load run."""
+
+    posted: int = 0
+    acked: int = 0
+    post_errors: int = 0
+    replies: int = 0
+    unmatched_replies: int = 0
+    ack_latencies: List[float] = field(default_factory=list)
+    e2e_latencies: Dict[str, List[float]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def build_payload(sender: str, kind: str) -> Dict:
+    """Build a WhatsApp Cloud API webhook payload carrying one message."""
+    message = {
+        "from": sender,
+        "id": f"wamid.{uuid.uuid4().hex}",
+        "timestamp": str(int(time.time())),
+        "type": kind,
+    }
+    if kind == "audio":
+        message["audio"] = {
+            "id": f"audio-{uuid.uuid4().hex}",
+            "mime_type": "audio/ogg; codecs=opus",
+            "voice": True,
+        }
+    elif kind == "image":
+        message["image"] = {
+            "id": f"image-{uuid.uuid4().hex}",
+            "mime_type": "image/jpeg",
+            "caption": random.choice(IMAGE_CAPTIONS),
+        }
+    else:
+        message["text"] = {"body": random.choice(TEXT_MESSAGES)}
+
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [
+            {
+                "id": "LOAD_TEST_WABA",
+                "changes": [
+                    {
+                        "field": "messages",
+                        "value": {
+                            "messaging_product": "whatsapp",
+                            "metadata": {
+                                "display_phone_number": "15550000000",
+                                "phone_number_id": "LOAD_TEST",
+                            },
+                            "contacts": [
+                                {"profile": {"name": "Load Test"}, "wa_id": sender}
+                            ],
+                            "messages": [message],
+                        },
+                    }
+                ],
+            }
+        ],
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse a message mix such as 'text=0.7,audio=0.15,image=0.15'."""
+    weights = {}
+    for part in mix.split(","):
+        kind, weight = part.split("=")
+        if kind not in ("text", "audio", "image"):
+            raise ValueError(f"Unknown message type in mix: {kind}")
+        weights[kind] = float(weight)
+    return weights
+
+
+class LoadGenerator:
+    """Drive the webhook at a target rate and match replies to the messages that caused them."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.report = LoadReport()
+        self.mix = parse_mix(args.mix)
+        # Replies for a sender arrive in order, so pending messages are matched FIFO.
+        self.pending: Dict[str, Deque[PendingMessage]] = defaultdict(deque)
+        self.all_replied = asyncio.Event()
+
+    def on_reply(self, delivered: DeliveredMessage) -> None:
+        queue = self.pending.get(delivered.to)
+        if not queue:
+            self.report.unmatched_replies += 1
+            return
+
+        message = queue.popleft()
+        self.report.replies += 1
+        self.report.e2e_latencies[message.kind].append(
+            delivered.received_at - message.sent_at
+        )
+        if (
+            self.report.replies >= self.report.acked
+            and self.report.posted >= self.args.messages
+        ):
+            self.all_replied.set()
+
+    def sender_for(self, index: int) -> str:
+        senders = self.args.senders or self.args.messages
+        return f"1555{index % senders:07d}"
+
+    async def post(
+        self, client: httpx.AsyncClient, index: int, semaphore: asyncio.Semaphore
+    ) -> None:
+        kind = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        sender = self.sender_for(index)
+        payload = build_payload(sender, kind)
+
+        pending = PendingMessage(kind=kind, sent_at=time.perf_counter())
+        self.pending[sender].append(pending)
+        try:
+            response = await client.post(self.args.webhook_url, json=payload)
+            self.report.ack_latencies.append(time.perf_counter() - pending.sent_at)
+            if response.status_code == 200:
+                self.report.acked += 1
+            else:
+                self.report.post_errors += 1
+                self.pending[sender].remove(pending)
+        except httpx.HTTPError:
+            self.report.post_errors += 1
+            self.pending[sender].remove(pending)
+        finally:
+            semaphore.release()
+
+    async def run(self) -> LoadReport:
+        stub_config = StubConfig(
+            latency_ms=self.args.latency_ms,
+            jitter_ms=self.args.jitter_ms,
+            error_rate=self.args.error_rate,
+            audio_bytes=read_optional(self.args.audio_file),
+            image_bytes=read_optional(self.args.image_file),
+        )
+        server = uvicorn.Server(
+            uvicorn.Config(
+                create_app(stub_config, on_message=self.on_reply),
+                host=self.args.stub_host,
+                port=self.args.stub_port,
+                log_level="warning",
+            )
+        )
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        tasks = []
+        self.report.started_at = time.perf_counter()
+
+        async with httpx.AsyncClient(timeout=self.args.timeout) as client:
+            for index in range(self.args.messages):
+                # Open-loop schedule: message i is due at i / rate, regardless of replies.
+                due = self.report.started_at + index / self.args.rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(self.post(client, index, semaphore)))
+                self.report.posted += 1
+
+            await asyncio.gather(*tasks)
+
+        if self.report.replies < self.report.acked:
+            try:
+                await asyncio.wait_for(
+                    self.all_replied.wait(), timeout=self.args.drain_timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        self.report.finished_at = time.perf_counter()
+        server.should_exit = True
+        await server_task
+        return self.report
+
+
+def summarize(report: LoadReport) -> Dict:
+    """Turn a load report into p50/p95/p99 latencies and throughput."""
+
+    def stats(values: List[float]) -> Dict:
+        return {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+        }
+
+    elapsed = report.finished_at - report.started_at
+    all_e2e = [
+        latency for values in report.e2e_latencies.values() for latency in values
+    ]
+    return {
+        "posted": report.posted,
+        "acked": report.acked,
+        "post_errors": report.post_errors,
+        "replies": report.replies,
+        "unanswered": report.acked - report.replies,
+        "unmatched_replies": report.unmatched_replies,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_replies_per_s": round(report.replies / elapsed, 2)
+        if elapsed
+        else 0.0,
+        "webhook_ack": stats(report.ack_latencies),
+        "end_to_end": stats(all_e2e),
+        "end_to_end_by_type": {
+            kind: stats(values) for kind, values in report.e2e_latencies.items()
+        },
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="WhatsApp webhook load generator")
+    parser.add_argument(
+        "--webhook-url", default="http://127.0.0.1:8080/whatsapp_response"
+    )
+    parser.add_argument(
+        "--messages",
+        type=int,
+        default=100,
+        help="Total number of webhook messages to post",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=5.0, help="Target messages per second"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="Maximum in-flight webhook requests"
+    )
+    parser.add_argument(
+        "--senders",
+        type=int,
+        default=0,
+        help="Number of distinct senders (default: one per message, which avoids burst coalescing)",
+    )
+    parser.add_argument("--mix", default="text=0.7,audio=0.15,image=0.15")
+    parser.add_argument(
+        "--timeout", type=float, default=30.0, help="Webhook request timeout in seconds"
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds to wait for outstanding replies",
+    )
+    parser.add_argument("--stub-host", default="127.0.0.1")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument(
+        "--latency-ms", type=float, default=50.0, help="Graph API stand-in latency"
+    )
+    parser.add_argument(
+        "--jitter-ms",
+        type=float,
+        default=20.0,
+        help="Graph API stand-in latency jitter",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Graph API stand-in error rate"
+    )
+    parser.add_argument("--audio-file", help="Audio file served for audio media ids")
+    parser.add_argument("--image-file", help="Image file served for image media ids")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = summarize(asyncio.run(LoadGenerator(args).run()))
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
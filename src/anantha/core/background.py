@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Set
+
+from anantha.core.metrics import BACKGROUND_TASKS
+
+
+class BackgroundTaskRunner:
+    """Run fire-and-forget coroutines off the request path.
+
+    At most `concurrency` tasks run at once and at most `max_pending` are held in
+    total; submissions beyond that are dropped. When more than `error_budget` tasks
+    fail within `error_window` seconds the runner stops accepting work until the
+    window has passed, so a failing dependency is not hammered by every turn.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        max_pending: int,
+        error_budget: int,
+        error_window: float,
+    ):
+        self._name = name
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._max_pending = max_pending
+        self._error_budget = error_budget
+        self._error_window = error_window
+        self._tasks: Set[asyncio.Task] = set()
+        self._failures: Deque[float] = deque()
+        self._stats = {"completed": 0, "failed": 0, "dropped": 0}
+
+    def _budget_exhausted(self) -> bool:
+        cutoff = time.monotonic() - self._error_window
+        while self._failures and self._failures[0] < cutoff:
+            self._failures.popleft()
+        return len(self._failures) > self._error_budget
+
+    def submit(self, job: Callable[[], Awaitable[None]]) -> bool:
+        """Schedule a job, returning False if it was dropped."""
+        if len(self._tasks) >= self._max_pending:
+            reason = "queue_full"
+        elif self._budget_exhausted():
+            reason = "error_budget"
+        else:
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return True
+
+        self._stats["dropped"] += 1
+        BACKGROUND_TASKS.labels(runner=self._name, outcome="dropped").inc()
+        self.logger.warning(f"Dropped {self._name} task ({reason})")
+        return False
+
+    async def _run(self, job: Callable[[], Awaitable[None]]) -> None:
+        async with self._semaphore:
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failures.append(time.monotonic())
+                self._stats["failed"] += 1
+                BACKGROUND_TASKS.labels(runner=self._name, outcome="error").inc()
+                self.logger.error(f"{self._name} task failed: {e}")
+            else:
+                self._stats["completed"] += 1
+                BACKGROUND_TASKS.labels(runner=self._name, outcome="success").inc()
+
+    async def drain(self, timeout: float) -> None:
+        """Wait up to `timeout` seconds for pending tasks, then cancel the rest."""
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.logger.warning(
+                f"Cancelled {len(pending)} {self._name} task(s) on shutdown"
+            )
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._tasks), **self._stats}
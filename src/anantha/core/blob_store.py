@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict
+
+from anantha.core.exceptions import BlobNotFoundError
+from anantha.settings import settings
+
+# sha256 hex digest plus an optional file extension, e.g. "3b1f...9a.mp3".
+REF_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]{1,8})?$")
+
+
+class BlobStore:
+    """Local content-addressed store for generated audio and images.
+
+    Blobs are written once under the sha256 of their content and referenced by that
+    digest, so graph state only carries a short reference instead of the bytes.
+    The store keeps at most `max_bytes` on disk and evicts the least recently used
+    blobs beyond that.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, root: str, max_bytes: int):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        os.makedirs(os.path.join(self._root, "tmp"), exist_ok=True)
+        entries = []
+        for shard in os.listdir(self._root):
+            shard_dir = os.path.join(self._root, shard)
+            if shard == "tmp" or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if REF_PATTERN.match(name):
+                    stat = os.stat(os.path.join(shard_dir, name))
+                    entries.append((stat.st_mtime, name, stat.st_size))
+        for _, ref, size in sorted(entries):
+            self._index[ref] = size
+            self._total += size
+        self._loaded = True
+
+    def path(self, ref: str) -> str:
+        """Local path of a blob."""
+        if not REF_PATTERN.match(ref):
+            raise BlobNotFoundError(f"Invalid blob reference: {ref}")
+        return os.path.join(self._root, ref[:2], ref)
+
+    def temp_path(self, extension: str = "") -> str:
+        """Path inside the store where a producer can write a file before `put_file`."""
+        with self._lock:
+            self._load()
+        return os.path.join(self._root, "tmp", f"{uuid.uuid4().hex}{extension}")
+
+    def discard_temp(self, path: str) -> None:
+        """Remove a file written at `temp_path` that will not be stored."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _put_file(self, source: str, extension: str) -> str:
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        ref = f"{digest.hexdigest()}{extension}"
+        target = self.path(ref)
+
+        with self._lock:
+            self._load()
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if ref in self._index and os.path.exists(target):
+                os.remove(source)
+                os.utime(target)
+                self._index.move_to_end(ref)
+            else:
+                size = os.path.getsize(source)
+                os.replace(source, target)
+                self._index[ref] = size
+                self._total += size
+                self._evict(keep=ref)
+        return ref
+
+    def _put(self, data: bytes, extension: str) -> str:
+        with self._lock:
+            self._load()
+        temp = os.path.join(self._root, "tmp", uuid.uuid4().hex)
+        with open(temp, "wb") as f:
+            f.write(data)
+        return self._put_file(temp, extension)
+
+    def _evict(self, keep: str) -> None:
+        while self._total > self._max_bytes and len(self._index) > 1:
+            ref, size = next(iter(self._index.items()))
+            if ref == keep:
+                self._index.move_to_end(ref)
+                continue
+            del self._index[ref]
+            self._total -= size
+            try:
+                os.remove(self.path(ref))
+            except FileNotFoundError:
+                pass
+            self.logger.debug(f"Evicted blob {ref} ({size} bytes)")
+
+    def _get(self, ref: str) -> bytes:
+        path = self.path(ref)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise BlobNotFoundError(f"Blob {ref} is not in the store") from None
+        with self._lock:
+            if ref in self._index:
+                self._index.move_to_end(ref)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted since it was read; the bytes are still valid.
+                pass
+        return data
+
+    async def put(self, data: bytes, extension: str = "") -> str:
+        """Store bytes and return their reference."""
+        return await asyncio.to_thread(self._put, data, extension)
+
+    async def put_file(self, source: str, extension: str = "") -> str:
+        """Move a file written at `temp_path` into the store and return its reference."""
+        return await asyncio.to_thread(self._put_file, source, extension)
+
+    async def get(self, ref: str) -> bytes:
+        """Read the bytes of a blob.
+
+        Raises:
+            BlobNotFoundError: If the blob was evicted or never stored.
+        """
+        return await asyncio.to_thread(self._get, ref)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "blobs": len(self._index),
+            "bytes": self._total,
+            "max_bytes": self._max_bytes,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_blob_store() -> BlobStore:
+    """Get the process-wide BlobStore."""
+
+    return BlobStore(settings.BLOB_STORE_PATH, settings.BLOB_STORE_MAX_BYTES)
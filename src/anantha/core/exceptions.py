@@ -1,16 +1,58 @@
-
 class SpeechToTextError(Exception):
     """Base class for all speech-to-text related exceptions."""
+
     pass
 
+
 class TextToSpeechError(Exception):
     """Base class for all text-to-speech related exceptions."""
+
     pass
 
+
 class TextToImageError(Exception):
     """Base class for all text-to-image related exceptions."""
+
     pass
 
+
 class ImageToTextError(Exception):
     """Base class for all image-to-text related exceptions."""
-    pass
\ No newline at end of file
+
+    pass
+
+
+class WorkQueueFullError(Exception):
+    """Raised when the WhatsApp work queue cannot accept more messages."""
+
+    pass
+
+
+class MediaTooLargeError(Exception):
+    """Raised when a media download exceeds the configured size limit."""
+
+    pass
+
+
+class ThreadLeaseTimeoutError(Exception):
+    """Raised when the exclusive lease on a conversation thread cannot be acquired in time."""
+
+    pass
+
+
+class GraphOverloadedError(Exception):
+    """Raised when a graph turn is shed by admission control."""
+
+    pass
+
+
+class BlobNotFoundError(Exception):
+    """Raised when a blob reference cannot be resolved."""
+
+    pass
+
+
+class CheckpointSerializationError(Exception):
+    """Raised when a stored checkpoint cannot be decoded."""
+
+    pass
@@ -0,0 +1,84 @@
+"""
+Process-wide registry of LLM clients and chains.
+One ChatGroq instance is kept per (model, temperature) and every instance shares the same
+pooled HTTP clients, so connections to the Groq API are reused across turns. Compiled
+chains are built once per variant and reused.
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Tuple
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_groq.chat_models import ChatGroq
+
+from anantha.settings import settings
+
+_chains: Dict[Hashable, Runnable] = {}
+
+
+@lru_cache(maxsize=1)
+def _http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    limits = httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT
+    )
+    return (
+        httpx.Client(limits=limits, timeout=timeout),
+        httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_llm(model_name: str, temperature: float) -> ChatGroq:
+    """Get the shared chat model for a model name and temperature.
+
+    Args:
+        model_name (str): The Groq model name.
+        temperature (float): The sampling temperature.
+    Returns:
+        ChatGroq: The chat model instance.
+    """
+
+    http_client, http_async_client = _http_clients()
+    return ChatGroq(
+        api_key=settings.GROQ_API_KEY,
+        model_name=model_name,
+        temperature=temperature,
+        max_retries=settings.LLM_MAX_RETRIES,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def get_chain(variant: Hashable, build: Callable[[], Runnable]) -> Runnable:
+    """Get the compiled chain of a variant, building it on first use.
+
+    Args:
+        variant (Hashable): The key of the chain variant, e.g. ("router", temperature).
+        build (Callable[[], Runnable]): Builds the chain when it is not cached yet.
+    Returns:
+        Runnable: The compiled chain.
+    """
+
+    chain = _chains.get(variant)
+    if chain is None:
+        chain = _chains[variant] = build()
+    return chain
+
+
+async def close_llm_clients() -> None:
+    """Close the pooled HTTP clients and drop the clients and chains using them."""
+    _chains.clear()
+    get_llm.cache_clear()
+    if _http_clients.cache_info().currsize == 0:
+        return
+
+    http_client, http_async_client = _http_clients()
+    _http_clients.cache_clear()
+    http_client.close()
+    await http_async_client.aclose()
@@ -0,0 +1,212 @@
+"""
+Prometheus metrics for the Anantha application.
+This module defines the latency histograms and counters recorded for every stage of a turn.
+"""
+
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+STAGE_LATENCY = Histogram(
+    "anantha_stage_duration_seconds",
+    "Latency of each stage of a turn",
+    ["stage", "workflow", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_CALLS = Counter(
+    "anantha_stage_calls",
+    "Number of executions of each stage of a turn",
+    ["stage", "workflow", "outcome"],
+)
+
+ADMISSION_DECISIONS = Counter(
+    "anantha_admission_decisions",
+    "Admission decisions for graph turns (admitted, degraded or shed)",
+    ["decision"],
+)
+
+GRAPH_RUNS = Gauge(
+    "anantha_graph_runs",
+    "Graph turns currently running or waiting for an execution slot",
+    ["state"],
+)
+
+BACKGROUND_TASKS = Counter(
+    "anantha_background_tasks",
+    "Background tasks run off the request path, by runner and outcome",
+    ["runner", "outcome"],
+)
+
+ROUTER_DECISIONS = Counter(
+    "anantha_router_decisions",
+    "Router decisions by deciding router (fast classifier, LLM or combined) and response type",
+    ["source", "response_type"],
+)
+
+AUDIO_FIRST_BYTE = Histogram(
+    "anantha_audio_first_byte_seconds",
+    "Time from the start of a voice reply to its first synthesized audio, by synthesis mode",
+    ["mode"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_CALLS_PER_TURN = Histogram(
+    "anantha_llm_calls_per_turn",
+    "LLM calls made by one graph turn, by router mode and workflow",
+    ["router_mode", "workflow"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8),
+)
+
+# Workflow label of the turn being processed, used by stages that cannot see the graph state.
+current_workflow: ContextVar[str] = ContextVar(
+    "current_workflow", default="conversation"
+)
+
+# LLM calls of the turn being processed; graph nodes share the counter through the context.
+_turn_llm_calls: ContextVar[Optional["LLMCallCounter"]] = ContextVar(
+    "turn_llm_calls", default=None
+)
+
+MESSAGE_TYPE_WORKFLOWS = {"text": "conversation", "audio": "audio", "image": "image"}
+
+
+def workflow_for_message_type(message_type: str) -> str:
+    """Map an incoming message type to the workflow label of its stages."""
+    return MESSAGE_TYPE_WORKFLOWS.get(message_type, "conversation")
+
+
+def observe_stage(stage: str, workflow: str, outcome: str, duration: float) -> None:
+    """Record one execution of a stage."""
+    STAGE_LATENCY.labels(stage=stage, workflow=workflow, outcome=outcome).observe(
+        duration
+    )
+    STAGE_CALLS.labels(stage=stage, workflow=workflow, outcome=outcome).inc()
+
+
+@contextmanager
+def track_stage(stage: str, workflow: Optional[str] = None) -> Iterator[None]:
+    """Time the wrapped block and record it with a success or error outcome.
+
+    Args:
+        stage (str): The stage name.
+        workflow (Optional[str]): The workflow label. Defaults to the current turn's workflow.
+    """
+    started = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        observe_stage(
+            stage,
+            workflow or current_workflow.get(),
+            outcome,
+            time.perf_counter() - started,
+        )
+
+
+def instrument_node(name: str, workflow_from_state: bool = True) -> Callable:
+    """Decorator recording the latency and outcome of a LangGraph node.
+
+    Args:
+        name (str): The node name used as stage label.
+        workflow_from_state (bool): Read the workflow label from the state after the node ran.
+                                    Nodes running before the router should use the current turn's
+                                    workflow instead, since the state still holds the previous one.
+    """
+
+    def decorator(node: Callable) -> Callable:
+        def workflow_label(state) -> str:
+            if workflow_from_state and state.get("workflow"):
+                return state["workflow"]
+            return current_workflow.get()
+
+        if inspect.iscoroutinefunction(node):
+
+            @functools.wraps(node)
+            async def async_wrapper(state, *args, **kwargs):
+                started = time.perf_counter()
+                outcome = "success"
+                try:
+                    return await node(state, *args, **kwargs)
+                except BaseException:
+                    outcome = "error"
+                    raise
+                finally:
+                    observe_stage(
+                        name,
+                        workflow_label(state),
+                        outcome,
+                        time.perf_counter() - started,
+                    )
+
+            return async_wrapper
+
+        @functools.wraps(node)
+        def wrapper(state, *args, **kwargs):
+            started = time.perf_counter()
+            outcome = "success"
+            try:
+                return node(state, *args, **kwargs)
+            except BaseException:
+                outcome = "error"
+                raise
+            finally:
+                observe_stage(
+                    name, workflow_label(state), outcome, time.perf_counter() - started
+                )
+
+        return wrapper
+
+    return decorator
+
+
+class LLMCallCounter:
+    """LLM calls made by one turn."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def observe(self, router_mode: str, workflow: str) -> None:
+        LLM_CALLS_PER_TURN.labels(router_mode=router_mode, workflow=workflow).observe(
+            self.calls
+        )
+
+
+@contextmanager
+def count_llm_calls() -> Iterator[LLMCallCounter]:
+    """Count the LLM calls recorded with `record_llm_call` within the block."""
+    counter = LLMCallCounter()
+    token = _turn_llm_calls.set(counter)
+    try:
+        yield counter
+    finally:
+        _turn_llm_calls.reset(token)
+
+
+def record_llm_call(calls: int = 1) -> None:
+    """Record LLM calls made on behalf of the current turn."""
+    counter = _turn_llm_calls.get()
+    if counter is not None:
+        counter.calls += calls
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Render all metrics in the Prometheus exposition format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
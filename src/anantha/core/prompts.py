@@ -1,4 +1,3 @@
-
 """
 Prompts for the graph module.
 This module contains the prompts used for generating graphs and performing
@@ -89,6 +88,22 @@ In addition to the roleplay context, you have to follow, ALWAYS, the following r
 """
 
 
+COMBINED_ROUTER_PROMPT = """
+
+# Response Type
+
+Besides your reply, decide the type of your next message: a text message, an image or an audio message.
+Base the decision on the user's last message and the context of the conversation.
+
+- 'conversation' - for normal text message responses
+- 'image' - ONLY when the user explicitly requests visual content. Not for general statements or descriptions,
+  and not just because the conversation mentions visual things or places
+- 'audio' - ONLY when the user explicitly requests to hear your voice. Not for general statements or descriptions,
+  and not just because the conversation mentions sound or music
+
+Write your reply for 'conversation' and 'audio'; for 'image' leave the reply empty.
+"""
+
 IMAGE_SCENARIO_PROMPT = """
 Create an engaging first-person scenario based on the recent conversation context.
 Imagine you're an AI with the ability to experience and visualize scenes.
@@ -127,7 +142,6 @@ and camera details if applicable. If the prompt requests a realistic style, the
 """
 
 
-
 MEMORY_ANALYSIS_PROMPT = """
 Extract and format important personal facts about the user from their message.
 Focus on the actual information, not meta-commentary or requests.
@@ -185,4 +199,4 @@ Output: {{
 
 Message: {message}
 Output:
-"""
\ No newline at end of file
+"""
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from anantha.core.exceptions import GraphOverloadedError
+from anantha.core.metrics import ADMISSION_DECISIONS, GRAPH_RUNS
+
+
+class AdmissionController:
+    """Cap on concurrent graph executions with a bounded waiting queue.
+
+    A turn is admitted in degraded mode when the load (running plus waiting turns) is
+    at or above `degrade_threshold`, or when the caller's own backlog is deep or old:
+    at least `degrade_queue_depth` items, or an oldest item waiting `degrade_queue_wait`
+    seconds. A turn is shed when the waiting queue is full, when it waits longer than
+    `wait_timeout` for a slot, or when the backlog's oldest item waited `shed_queue_wait`
+    seconds (0 disables backlog shedding).
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_waiting: int,
+        degrade_threshold: int,
+        wait_timeout: float,
+        degrade_queue_depth: int = 0,
+        degrade_queue_wait: float = 0.0,
+        shed_queue_wait: float = 0.0,
+    ):
+        self._max_concurrent = max(1, max_concurrent)
+        self._max_waiting = max(0, max_waiting)
+        self._degrade_threshold = degrade_threshold
+        self._wait_timeout = wait_timeout
+        self._degrade_queue_depth = degrade_queue_depth
+        self._degrade_queue_wait = degrade_queue_wait
+        self._shed_queue_wait = shed_queue_wait
+        self.limit_load(self._max_concurrent + self._max_waiting)
+        self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        self._running = 0
+        self._waiting = 0
+
+    @property
+    def load(self) -> int:
+        return self._running + self._waiting
+
+    def limit_load(self, max_load: int) -> None:
+        """Clamp the degrade threshold to the highest load callers can produce.
+
+        E.g. a work queue with N workers never has more than N turns in the graph, so an
+        arriving turn sees a load of at most N - 1 and a higher threshold could never trip.
+        """
+        reachable = max(1, max_load - 1)
+        if self._degrade_threshold > reachable:
+            self.logger.warning(
+                f"Graph degrade threshold {self._degrade_threshold} is unreachable with at most {max_load} "
+                f"concurrent turns, lowering it to {reachable}"
+            )
+            self._degrade_threshold = reachable
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": self._running, "waiting": self._waiting}
+
+    def _publish(self) -> None:
+        GRAPH_RUNS.labels(state="running").set(self._running)
+        GRAPH_RUNS.labels(state="waiting").set(self._waiting)
+
+    @asynccontextmanager
+    async def admit(
+        self, queue_depth: int = 0, queue_wait: float = 0.0
+    ) -> AsyncIterator[bool]:
+        """Hold an execution slot for the duration of the block.
+
+        Args:
+            queue_depth: Items waiting in the caller's backlog, e.g. the WhatsApp work queue.
+            queue_wait: Seconds the oldest item of that backlog has been waiting.
+
+        Yields:
+            bool: Whether the turn must run in degraded mode.
+
+        Raises:
+            GraphOverloadedError: If the turn is shed.
+        """
+        if 0 < self._shed_queue_wait <= queue_wait:
+            ADMISSION_DECISIONS.labels(decision="shed").inc()
+            raise GraphOverloadedError(
+                f"Backlog overloaded (oldest item waited {queue_wait:.1f}s)"
+            )
+
+        if self._semaphore.locked() and self._waiting >= self._max_waiting:
+            ADMISSION_DECISIONS.labels(decision="shed").inc()
+            raise GraphOverloadedError(
+                f"Graph overloaded ({self._running} running, {self._waiting} waiting)"
+            )
+
+        degraded = (
+            self.load >= self._degrade_threshold
+            or 0 < self._degrade_queue_depth <= queue_depth
+            or 0 < self._degrade_queue_wait <= queue_wait
+        )
+
+        # The slot is tracked explicitly: a timeout or cancellation landing right as
+        # acquire() returns must not leave the semaphore short of a permit.
+        self._waiting += 1
+        self._publish()
+        acquired = False
+        try:
+            async with asyncio.timeout(self._wait_timeout):
+                acquired = await self._semaphore.acquire()
+        except TimeoutError:
+            if not acquired:
+                ADMISSION_DECISIONS.labels(decision="shed").inc()
+                raise GraphOverloadedError(
+                    f"Timed out waiting for a graph slot after {self._wait_timeout}s"
+                ) from None
+        except BaseException:
+            if acquired:
+                self._semaphore.release()
+            raise
+        finally:
+            self._waiting -= 1
+            self._publish()
+
+        ADMISSION_DECISIONS.labels(
+            decision="degraded" if degraded else "admitted"
+        ).inc()
+        if degraded:
+            self.logger.warning(
+                f"Running turn in degraded mode (load {self.load + 1}, backlog {queue_depth} items, "
+                f"oldest waited {queue_wait:.1f}s)"
+            )
+
+        self._running += 1
+        self._publish()
+        try:
+            yield degraded
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+            self._publish()
@@ -1,30 +1,37 @@
-
-from langgraph.graph import START, END
 from typing import Literal
 
+from langgraph.graph import END
+
 from anantha.graph.state import AIAnanthaState
+from anantha.graph.utils.summarization import needs_summary
 from anantha.settings import settings
 
-def should_summarize_conversation(
-        state: AIAnanthaState
-    ) -> Literal['summarize_conversation_node', '__end__']:
 
+def should_summarize_conversation(
+    state: AIAnanthaState,
+) -> Literal["summarize_conversation_node", "__end__"]:
     """Should summarize conversation node for the Anantha application."""
 
-    messages = state['messages']
-    if len(messages) > settings.TOTAL_MESSAGES_SUMMARY_TRIGGER:
-        return 'summarize_conversation_node'
-    
+    # Deferred summaries run after the reply is sent (see GraphRuntime.schedule_summarization).
+    if settings.SUMMARY_MODE == "deferred":
+        return END
+
+    # Summarization is deferred to the next turn that is not degraded.
+    if state.get("degraded"):
+        return END
+
+    if needs_summary(state["messages"]):
+        return "summarize_conversation_node"
+
     return END
 
 
 def select_workflow(
-        state: AIAnanthaState
-    ) -> Literal["conversation_node", "image_node", "audio_node"]:
-
+    state: AIAnanthaState,
+) -> Literal["conversation_node", "image_node", "audio_node"]:
     """Select workflow node for the Anantha application."""
 
-    workflow = state['workflow']
+    workflow = state["workflow"]
 
     if workflow == "image":
         return "image_node"
@@ -1,25 +1,22 @@
-
 from functools import lru_cache
 
-from langgraph.graph import StateGraph, START, END
-
-from anantha.graph.edges import (
-    should_summarize_conversation,
-    select_workflow
-)
+from langgraph.graph import END, START, StateGraph
 
+from anantha.graph.edges import select_workflow, should_summarize_conversation
 from anantha.graph.nodes import (
     audio_node,
+    combined_router_node,
     context_injection_node,
     conversation_node,
     image_node,
     memory_extraction_node,
     memory_injection_node,
     router_node,
-    summarize_conversation_node
+    summarize_conversation_node,
 )
-
 from anantha.graph.state import AIAnanthaState
+from anantha.settings import settings
+
 
 @lru_cache(maxsize=1)
 def create_workflow_graph():
@@ -27,7 +24,6 @@ def create_workflow_graph():
     builder = StateGraph(AIAnanthaState)
 
     builder.add_node("memory_extraction_node", memory_extraction_node)
-    builder.add_node("router_node", router_node)
     builder.add_node("context_injection_node", context_injection_node)
     builder.add_node("memory_injection_node", memory_injection_node)
     builder.add_node("conversation_node", conversation_node)
@@ -36,12 +32,24 @@ def create_workflow_graph():
     builder.add_node("summarize_conversation_node", summarize_conversation_node)
 
     builder.add_edge(START, "memory_extraction_node")
-    builder.add_edge("memory_extraction_node", "router_node") # response_type = conversation, image or audio
 
-    builder.add_edge("router_node", "context_injection_node") 
-    builder.add_edge("context_injection_node", "memory_injection_node")
+    if settings.ROUTER_MODE == "combined":
+        # The combined router writes the reply too, so it needs the injected context.
+        builder.add_node("combined_router_node", combined_router_node)
+        builder.add_edge("memory_extraction_node", "context_injection_node")
+        builder.add_edge("context_injection_node", "memory_injection_node")
+        builder.add_edge("memory_injection_node", "combined_router_node")
+        builder.add_conditional_edges("combined_router_node", select_workflow)
+    else:
+        builder.add_node("router_node", router_node)
+        builder.add_edge(
+            "memory_extraction_node", "router_node"
+        )  # response_type = conversation, image or audio
+
+        builder.add_edge("router_node", "context_injection_node")
+        builder.add_edge("context_injection_node", "memory_injection_node")
 
-    builder.add_conditional_edges("memory_injection_node",select_workflow)
+        builder.add_conditional_edges("memory_injection_node", select_workflow)
 
     builder.add_conditional_edges("conversation_node", should_summarize_conversation)
     builder.add_conditional_edges("image_node", should_summarize_conversation)
@@ -50,4 +58,5 @@ def create_workflow_graph():
 
     return builder
 
-# graph = create_workflow_graph().compile()
\ No newline at end of file
+
+# graph = create_workflow_graph().compile()
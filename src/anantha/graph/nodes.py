@@ -1,38 +1,118 @@
-
-import os 
-from uuid import uuid4
+import asyncio
+import logging
+import time
 
 from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
 from langchain_core.runnables import RunnableConfig
 
+from anantha.core.blob_store import get_blob_store
+from anantha.core.exceptions import TextToImageError
+from anantha.core.metrics import (
+    AUDIO_FIRST_BYTE,
+    ROUTER_DECISIONS,
+    instrument_node,
+    record_llm_call,
+)
 from anantha.graph.state import AIAnanthaState
 from anantha.graph.utils.chains import (
     get_anantha_response_chain,
+    get_combined_router_chain,
     get_router_chain,
 )
+from anantha.graph.utils.fast_router import FastRouter, RouterDecisionLog
 from anantha.graph.utils.helpers import (
-    get_chat_model,
+    get_text_to_image_module,
     get_text_to_speech_module,
-    get_text_to_image_module
+    remover_asterisk_content,
 )
-
+from anantha.graph.utils.summarization import evicted_messages, extend_summary
+from anantha.graph.utils.token_budget import assemble_context
 from anantha.modules.memory.long_term.memory_manager import get_memory_manager
 from anantha.modules.schedules.context_generation import ScheduleContextGenerator
 from anantha.settings import settings
 
+logger = logging.getLogger(__name__)
+
+
+@instrument_node("router_node")
 async def router_node(state: AIAnanthaState) -> AIAnanthaState:
     """Router node for the Anantha application."""
 
+    # Only the combined router drafts the reply.
+    state["draft_response"] = ""
+
+    # Under overload, skip the router call and answer with plain text.
+    if state.get("degraded"):
+        state["workflow"] = "conversation"
+        return state
+
+    messages = state["messages"][-settings.ROUTER_MESSAGES_TO_ANALYZE :]
+
+    # Confident local predictions skip the LLM router call.
+    confidence = None
+    if settings.ROUTER_FAST_ENABLED:
+        prediction = await FastRouter.predict(messages)
+        if prediction is not None:
+            response_type, confidence = prediction
+            if confidence >= settings.ROUTER_FAST_CONFIDENCE:
+                state["workflow"] = response_type
+                ROUTER_DECISIONS.labels(
+                    source="fast", response_type=response_type
+                ).inc()
+                await RouterDecisionLog.record(
+                    messages, response_type, "fast", confidence
+                )
+                return state
+
     chain = get_router_chain()
+    response = await chain.ainvoke({"messages": messages})
+    record_llm_call()
+    state["workflow"] = response.response_type
+    ROUTER_DECISIONS.labels(source="llm", response_type=response.response_type).inc()
+    await RouterDecisionLog.record(messages, response.response_type, "llm", confidence)
+    return state
+
+
+@instrument_node("combined_router_node")
+async def combined_router_node(
+    state: AIAnanthaState, config: RunnableConfig
+) -> AIAnanthaState:
+    """Decide the response type and write the reply in a single LLM call.
+
+    The reply is kept as `draft_response`, which the conversation and audio nodes
+    use instead of calling the LLM again.
+    """
+
+    current_activity = ScheduleContextGenerator.get_current_activity()
+    memory_context = state.get("memory_context", "")
+
+    chain = get_combined_router_chain()
     response = await chain.ainvoke(
-        {
-            'messages': state['messages'][-settings.ROUTER_MESSAGES_TO_ANALYZE :]
-        }
+        assemble_context(
+            state["messages"],
+            state.get("summary", ""),
+            memory_context,
+            current_activity,
+        ),
+        config,
     )
-    state['workflow'] = response.response_type
-    return state 
+    record_llm_call()
 
+    messages = state["messages"][-settings.ROUTER_MESSAGES_TO_ANALYZE :]
+    ROUTER_DECISIONS.labels(
+        source="combined", response_type=response.response_type
+    ).inc()
+    await RouterDecisionLog.record(messages, response.response_type, "llm")
 
+    # Under overload, answer with plain text whatever the model decided.
+    state["workflow"] = (
+        "conversation" if state.get("degraded") else response.response_type
+    )
+    state["draft_response"] = remover_asterisk_content(response.response)
+    return state
+
+
+@instrument_node("context_injection_node")
 def context_injection_node(state: AIAnanthaState) -> AIAnanthaState:
     """Context injection node for the Anantha application."""
 
@@ -42,132 +122,215 @@ def context_injection_node(state: AIAnanthaState) -> AIAnanthaState:
     else:
         apply_activity = False
 
-    state['apply_activity'] = apply_activity
-    state['current_activity'] = schedule_context
+    state["apply_activity"] = apply_activity
+    state["current_activity"] = schedule_context
     return state
 
 
-async def conversation_node(state: AIAnanthaState, config: RunnableConfig):
-    """Conversation node for the Anantha application."""
+async def write_text_reply(state: AIAnanthaState, config: RunnableConfig) -> str:
+    """Write a plain text reply to the conversation, reusing the combined router's draft."""
+
+    if state.get("draft_response"):
+        return state["draft_response"]
 
     current_activity = ScheduleContextGenerator.get_current_activity()
-    memory_context =  state.get("memory_context", "")
+    memory_context = state.get("memory_context", "")
 
-    chain = get_anantha_response_chain(state.get("summary", ""))
+    chain = get_anantha_response_chain()
 
     response = await chain.ainvoke(
-        {
-            'messages': state['messages'],
-            'current_activity': current_activity,
-            'memory_context': memory_context
-        },
+        assemble_context(
+            state["messages"],
+            state.get("summary", ""),
+            memory_context,
+            current_activity,
+        ),
         config,
     )
-    state['messages'] = AIMessage(content=response)
-    return state 
+    record_llm_call()
+    return response
+
+
+@instrument_node("conversation_node")
+async def conversation_node(state: AIAnanthaState, config: RunnableConfig):
+    """Conversation node for the Anantha application."""
+
+    state["messages"] = AIMessage(content=await write_text_reply(state, config))
+    return state
 
 
+@instrument_node("image_node")
 async def image_node(state: AIAnanthaState, config: RunnableConfig):
     """Image node for the Anantha application."""
 
     current_activity = ScheduleContextGenerator.get_current_activity()
     memory_context = state.get("memory_context", "")
 
-    chain = get_anantha_response_chain(state.get("summary", ""))
+    chain = get_anantha_response_chain()
     text_to_image_module = get_text_to_image_module()
 
     scenario = await text_to_image_module.create_scenario(state["messages"][-5:])
-    os.makedirs("generated_images", exist_ok=True)
-    img_path = f"generated_images/image_{str(uuid4())}.png"
-    await text_to_image_module.generate_image(scenario.image_prompt, img_path)
+    record_llm_call()
+    img_path = get_blob_store().temp_path(".png")
 
-    scenario_message = HumanMessage(content=f"<image attached by Anantha generated from prompt: {scenario.image_prompt}>")
+    scenario_message = HumanMessage(
+        content=f"<image attached by Anantha generated from prompt: {scenario.image_prompt}>"
+    )
     updated_messages = state["messages"] + [scenario_message]
 
-    response = await chain.ainvoke(
-        {
-            "messages": updated_messages,
-            "current_activity": current_activity,
-            "memory_context": memory_context,
-        },
-        config,
+    # The reply only needs the image prompt, so it is written while the image is generated.
+    image_task = asyncio.create_task(
+        text_to_image_module.generate_image(scenario.image_prompt, img_path)
+    )
+    reply_task = asyncio.create_task(
+        chain.ainvoke(
+            assemble_context(
+                updated_messages,
+                state.get("summary", ""),
+                memory_context,
+                current_activity,
+            ),
+            config,
+        )
     )
+    try:
+        response, _ = await asyncio.gather(reply_task, image_task)
+    except TextToImageError as e:
+        # The reply was written for an attached image: drop it and answer with text only.
+        reply_task.cancel()
+        await asyncio.gather(reply_task, return_exceptions=True)
+        get_blob_store().discard_temp(img_path)
+        logger.warning(f"Image generation failed, replying with text: {e}")
+        return {
+            "workflow": "conversation",
+            "messages": AIMessage(content=await write_text_reply(state, config)),
+        }
+    except BaseException:
+        for task in (reply_task, image_task):
+            task.cancel()
+        await asyncio.gather(reply_task, image_task, return_exceptions=True)
+        get_blob_store().discard_temp(img_path)
+        raise
+    record_llm_call()
 
-    state['messages'] = AIMessage(content=response)
-    state['image_path'] = img_path
+    state["messages"] = AIMessage(content=response)
+    state["image_ref"] = await get_blob_store().put_file(img_path, ".png")
 
-    return state 
+    return state
 
 
+@instrument_node("audio_node")
 async def audio_node(state: AIAnanthaState, config: RunnableConfig) -> AIAnanthaState:
     """Audio node for the Anantha application."""
 
     current_activity = ScheduleContextGenerator.get_current_activity()
     memory_context = state.get("memory_context", "")
 
-    chain = get_anantha_response_chain(state.get("summary", ""))
     text_to_speech_module = get_text_to_speech_module()
-
-    response = await chain.ainvoke(
-        {
-            "messages": state["messages"],
-            "current_activity": current_activity,
-            "memory_context": memory_context,
-        },
-        config,
-    )
-
-    output_audio = await text_to_speech_module.synthesize(response)
-    state['messages'] = AIMessage(content=response)
-    state['audio_buffer'] = output_audio
+    started = time.perf_counter()
+
+    response = state.get("draft_response")
+    if settings.TTS_STREAMING:
+        # Synthesize sentence by sentence while the reply is still being generated.
+        parts = []
+
+        async def reply_chunks():
+            if response:
+                parts.append(response)
+                yield response
+                return
+            chain = get_anantha_response_chain(streaming=True)
+            async for chunk in chain.astream(
+                assemble_context(
+                    state["messages"],
+                    state.get("summary", ""),
+                    memory_context,
+                    current_activity,
+                ),
+                config,
+            ):
+                parts.append(chunk)
+                yield chunk
+
+        output_audio = await text_to_speech_module.synthesize_stream(
+            reply_chunks(),
+            concurrency=settings.TTS_STREAM_CONCURRENCY,
+            min_chars=settings.TTS_STREAM_MIN_CHARS,
+            clean=remover_asterisk_content,
+        )
+        if not response:
+            record_llm_call()
+        response = remover_asterisk_content("".join(parts))
+    else:
+        if not response:
+            chain = get_anantha_response_chain()
+            response = await chain.ainvoke(
+                assemble_context(
+                    state["messages"],
+                    state.get("summary", ""),
+                    memory_context,
+                    current_activity,
+                ),
+                config,
+            )
+            record_llm_call()
+
+        output_audio = await text_to_speech_module.synthesize(response)
+        AUDIO_FIRST_BYTE.labels(mode="full").observe(time.perf_counter() - started)
+
+    state["messages"] = AIMessage(content=response)
+    state["audio_ref"] = await get_blob_store().put(output_audio, ".mp3")
 
     return state
 
+
+@instrument_node("summarize_conversation_node")
 async def summarize_conversation_node(state: AIAnanthaState) -> AIAnanthaState:
     """Summarize conversation node for the Anantha application."""
 
-    model = get_chat_model()
-    summary = state.get("summary", "")
-
-    if summary:
-        summary_message = (
-            f"This is summary of the conversation to date between Anantha and the user: {summary}\n\n"
-            "Extend the summary by taking into account the new messages above:"
-        )
-    else:
-        summary_message = (
-            "Create a summary of the conversation above between Anantha and the user. "
-            "The summary must be a short description of the conversation so far, "
-            "but that captures all the relevant information shared between Anantha and the user:"
-        )
+    evicted = evicted_messages(state["messages"])
+    if not evicted:
+        return {}
 
-    messages = state["messages"] + [HumanMessage(content=summary_message)]
-    response = await model.ainvoke(messages)
+    summary = await extend_summary(state.get("summary", ""), evicted)
+    record_llm_call()
 
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][: -settings.TOTAL_MESSAGES_AFTER_SUMMARY]]
-    state['summary'] = response.content
-    state['messages'] = delete_messages
+    state["summary"] = summary
+    state["messages"] = [RemoveMessage(id=m.id) for m in evicted]
 
     return state
 
 
+@instrument_node("memory_extraction_node", workflow_from_state=False)
 async def memory_extraction_node(state: AIAnanthaState) -> AIAnanthaState:
     """Memory extraction node for the Anantha application."""
 
-    if not state["messages"]:
+    # Deferred extraction is scheduled by the runtime once the reply is sent.
+    if (
+        not state["messages"]
+        or state.get("degraded")
+        or settings.MEMORY_EXTRACTION_MODE != "inline"
+    ):
         return {}
-    
+
     memory_manager = get_memory_manager()
-    await memory_manager.extract_and_store_memory(state["messages"][-1])
+    message = state["messages"][-1]
+
+    await memory_manager.extract_and_store_memory(message)
+    # Only human messages are analyzed by the LLM.
+    if message.type == "human":
+        record_llm_call()
     return {}
 
+
+@instrument_node("memory_injection_node")
 def memory_injection_node(state: AIAnanthaState) -> AIAnanthaState:
     """Memory injection node for the Anantha application."""
-    
+
     memory_manager = get_memory_manager()
     recent_context = " ".join([m.content for m in state["messages"][-3:]])
     memories = memory_manager.get_relevant_memories(recent_context)
     memory_context = memory_manager.format_memories_for_prompt(memories)
 
-    state['memory_context'] = memory_context
+    state["memory_context"] = memory_context
     return state
@@ -0,0 +1,227 @@
+import logging
+from functools import lru_cache
+from typing import AsyncContextManager, Dict, Optional, Sequence, Set
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+from langgraph.graph.state import CompiledStateGraph
+
+from anantha.core.background import BackgroundTaskRunner
+from anantha.core.llm import close_llm_clients
+from anantha.core.metrics import current_workflow, track_stage
+from anantha.graph.admission import AdmissionController
+from anantha.graph.graph import create_workflow_graph
+from anantha.graph.utils.helpers import get_memory_extraction_runner
+from anantha.graph.utils.summarization import (
+    evicted_messages,
+    extend_summary,
+    needs_summary,
+)
+from anantha.modules.memory.long_term.memory_manager import get_memory_manager
+from anantha.modules.memory.short_term.retention import (
+    CheckpointCompactor,
+    CheckpointRetention,
+)
+from anantha.modules.memory.short_term.serializer import get_checkpoint_serializer
+from anantha.modules.memory.short_term.sharding import ShardedAsyncSqliteSaver
+from anantha.modules.memory.short_term.thread_lease import ThreadLeaseManager
+from anantha.settings import settings
+
+
+class GraphRuntime:
+    """Application-scoped owner of the short-term memory checkpointer and the compiled graph.
+
+    The runtime is started once by the hosting interface (the FastAPI lifespan or the
+    Chainlit startup hook) and reused by every turn, instead of reconnecting to SQLite
+    and recompiling the graph per message. Turns on the same thread must run inside
+    `thread_lease`, so concurrent runs cannot race on the thread's checkpoint, and
+    inside `admit`, which caps how many turns execute the graph at once.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._checkpointer: Optional[ShardedAsyncSqliteSaver] = None
+        self._graph: Optional[CompiledStateGraph] = None
+        self._leases = ThreadLeaseManager(
+            db_path=settings.THREAD_LEASE_DB_PATH,
+            ttl_seconds=settings.THREAD_LEASE_TTL_SECONDS,
+            acquire_timeout=settings.THREAD_LEASE_TIMEOUT_SECONDS,
+        )
+        self._admission = AdmissionController(
+            max_concurrent=settings.GRAPH_MAX_CONCURRENT_RUNS,
+            max_waiting=settings.GRAPH_MAX_WAITING_RUNS,
+            degrade_threshold=settings.GRAPH_DEGRADE_THRESHOLD,
+            wait_timeout=settings.GRAPH_ADMISSION_TIMEOUT_SECONDS,
+            degrade_queue_depth=settings.GRAPH_DEGRADE_QUEUE_DEPTH,
+            degrade_queue_wait=settings.GRAPH_DEGRADE_QUEUE_WAIT_SECONDS,
+            shed_queue_wait=settings.GRAPH_SHED_QUEUE_WAIT_SECONDS,
+        )
+        self._summaries = BackgroundTaskRunner(
+            name="summarization",
+            concurrency=settings.SUMMARY_CONCURRENCY,
+            max_pending=settings.SUMMARY_MAX_PENDING,
+            error_budget=settings.SUMMARY_ERROR_BUDGET,
+            error_window=settings.SUMMARY_ERROR_WINDOW_SECONDS,
+        )
+        self._summarizing: Set[str] = set()
+        self._compactor = CheckpointCompactor(
+            CheckpointRetention(
+                keep_latest=settings.CHECKPOINT_KEEP_LATEST,
+                idle_ttl=settings.CHECKPOINT_THREAD_TTL_SECONDS,
+                vacuum_pages=settings.CHECKPOINT_VACUUM_PAGES,
+            ),
+            interval=settings.CHECKPOINT_COMPACTION_INTERVAL_SECONDS,
+        )
+
+    @property
+    def started(self) -> bool:
+        return self._graph is not None
+
+    @property
+    def checkpointer(self) -> ShardedAsyncSqliteSaver:
+        if self._checkpointer is None:
+            raise RuntimeError("Graph runtime has not been started")
+        return self._checkpointer
+
+    @property
+    def graph(self) -> CompiledStateGraph:
+        if self._graph is None:
+            raise RuntimeError("Graph runtime has not been started")
+        return self._graph
+
+    async def start(self) -> None:
+        """Open the checkpointer connection and compile the graph."""
+        if self.started:
+            return
+
+        self._checkpointer = await ShardedAsyncSqliteSaver.open(
+            self._db_path, settings.CHECKPOINT_SHARDS, serde=get_checkpoint_serializer()
+        )
+        self._graph = create_workflow_graph().compile(checkpointer=self._checkpointer)
+        await self._leases.start()
+        # Each shard's lock serializes compaction with the turns sharing its connection.
+        self._compactor.start(
+            [(shard.conn, shard.lock) for shard in self._checkpointer.shards],
+            self.thread_lease,
+        )
+        self.logger.info(
+            f"Graph runtime started with checkpoints at {self._db_path} ({settings.CHECKPOINT_SHARDS} shard(s))"
+        )
+
+    def thread_lease(self, thread_id: str) -> AsyncContextManager[None]:
+        """Hold the exclusive lease of a conversation thread, in this and every other process."""
+        return self._leases.lease(thread_id)
+
+    def admit(
+        self, queue_depth: int = 0, queue_wait: float = 0.0
+    ) -> AsyncContextManager[bool]:
+        """Hold a graph execution slot, yielding whether the turn must run degraded.
+
+        Interfaces with their own backlog pass its depth and the wait of its oldest item.
+        Raises GraphOverloadedError when the turn is shed.
+        """
+        return self._admission.admit(queue_depth, queue_wait)
+
+    def limit_admission_load(self, max_load: int) -> None:
+        """Tell admission control the most turns the hosting interface runs at once."""
+        self._admission.limit_load(max_load)
+
+    def admission_stats(self) -> Dict[str, int]:
+        return self._admission.stats()
+
+    def schedule_memory_extraction(self, message: BaseMessage) -> None:
+        """Extract long-term memories from the turn's human message in the background.
+
+        Called by the interfaces once the reply is sent, when `MEMORY_EXTRACTION_MODE` is
+        deferred, so the analysis LLM call neither delays the reply nor competes with it
+        for the provider's rate limit. It is not counted in the turn's LLM calls.
+        """
+        if settings.MEMORY_EXTRACTION_MODE != "deferred":
+            return
+
+        workflow = current_workflow.get()
+
+        async def job() -> None:
+            with track_stage("memory_extraction_deferred", workflow):
+                await get_memory_manager().extract_and_store_memory(message)
+
+        get_memory_extraction_runner().submit(job)
+
+    def schedule_summarization(
+        self, thread_id: str, messages: Sequence[BaseMessage]
+    ) -> None:
+        """Summarize the thread in the background if its history grew past the trigger.
+
+        Called by the interfaces once the reply is sent, when `SUMMARY_MODE` is deferred,
+        with the history of the turn's final state. Turns below the trigger schedule
+        nothing, so they neither take the thread lease nor write a checkpoint. At most one
+        summarization per thread is pending at a time.
+        """
+        thread_id = str(thread_id)
+        if settings.SUMMARY_MODE != "deferred" or thread_id in self._summarizing:
+            return
+        if not needs_summary(messages) or not evicted_messages(messages):
+            return
+
+        async def job() -> None:
+            try:
+                with track_stage("summarize_deferred"):
+                    await self._summarize(thread_id)
+            finally:
+                self._summarizing.discard(thread_id)
+
+        self._summarizing.add(thread_id)
+        if not self._summaries.submit(job):
+            self._summarizing.discard(thread_id)
+
+    async def _summarize(self, thread_id: str) -> None:
+        # The lease keeps turns on the thread from interleaving with the summary update.
+        async with self.thread_lease(thread_id):
+            config = {"configurable": {"thread_id": thread_id}}
+            snapshot = await self.graph.aget_state(config)
+            messages = snapshot.values.get("messages", [])
+            if not needs_summary(messages):
+                return
+
+            evicted = evicted_messages(messages)
+            if not evicted:
+                return
+
+            summary = await extend_summary(snapshot.values.get("summary", ""), evicted)
+            await self.graph.aupdate_state(
+                config,
+                {
+                    "summary": summary,
+                    "messages": [RemoveMessage(id=m.id) for m in evicted],
+                },
+                as_node="summarize_conversation_node",
+            )
+            self.logger.info(
+                f"Folded {len(evicted)} messages of thread {thread_id} into its summary"
+            )
+
+    def background_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "memory_extraction": get_memory_extraction_runner().stats(),
+            "summarization": self._summaries.stats(),
+        }
+
+    async def close(self) -> None:
+        """Finish background work, then close the checkpointer connection and the LLM clients."""
+        await get_memory_extraction_runner().drain(settings.BACKGROUND_DRAIN_TIMEOUT)
+        await self._summaries.drain(settings.BACKGROUND_DRAIN_TIMEOUT)
+        await self._compactor.stop()
+        self._graph = None
+        await self._leases.close()
+        if self._checkpointer is not None:
+            await self._checkpointer.close()
+            self._checkpointer = None
+        await close_llm_clients()
+
+
+@lru_cache(maxsize=1)
+def get_graph_runtime() -> GraphRuntime:
+    """Get the process-wide GraphRuntime."""
+
+    return GraphRuntime(settings.SHORT_TERM_MEMORY_DB_PATH)
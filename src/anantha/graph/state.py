@@ -1,7 +1,6 @@
-
-
 from langgraph.graph import MessagesState
 
+
 class AIAnanthaState(MessagesState):
     """
     AIAnnathaState is a subclass of MessagesState that represents the state of the AI Anantha system.
@@ -12,19 +11,24 @@ class AIAnanthaState(MessagesState):
                                         Langchain Message type (HumanMessage, AIMessage, SystemMessage)
         2. summary: (str) - A summary of the conversation.
         3. workflow: (str) - The current workflow being executed. (Can be "conversation", "image", or "audio".)
-        4. audio_buffer: (bytes) - The audio buffer to be used for speech-to-text conversion.
-        5. image_path: (str) - The path to the image to be used for image processing.
+        4. audio_ref: (str) - The blob store reference of the synthesized voice reply.
+        5. image_ref: (str) - The blob store reference of the generated image.
         6. current_activity: (str) - The current activity being performed by the AI Anantha system.
         7. apply_activity: (str) - The activity to be applied to the current activity.
-        8. memory_context: (str) - The context of the memory being used by the AI Anantha system. 
+        8. memory_context: (str) - The context of the memory being used by the AI Anantha system.
                                    (injected into the character)
+        9. degraded: (bool) - Whether the turn runs in degraded mode under overload
+                              (conversation only, no memory extraction, no summarization).
+        10. draft_response: (str) - The reply written by the combined router, reused by the
+                                    conversation and audio nodes instead of a second LLM call.
     """
 
-    summary: str 
+    summary: str
     workflow: str
-    audio_buffer: str
-    image_path: str
+    audio_ref: str
+    image_ref: str
     current_activity: str
     apply_activity: str
     memory_context: str
-
+    degraded: bool
+    draft_response: str
@@ -1,44 +1,97 @@
-
-from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnablePassthrough
 
+from anantha.core.llm import get_chain
 from anantha.core.prompts import (
     CHARACTER_CARD_PROMPT,
-    ROUTER_PROMPT
+    COMBINED_ROUTER_PROMPT,
+    ROUTER_PROMPT,
 )
-
 from anantha.graph.utils.helpers import AsteriskRemovalParser, get_chat_model
-from anantha.graph.utils.schema import RouterResponse
+from anantha.graph.utils.schema import CombinedRouterResponse, RouterResponse
+
+
+def format_summary_context(inputs: dict) -> str:
+    """Render the optional `summary` input as the summary section of the system prompt."""
+
+    summary = inputs.get("summary", "")
+    if not summary:
+        return ""
+    return (
+        f"\n\nSummary of conversation earlier between Anantha and the user: {summary}"
+    )
+
+
+# The summary is a prompt variable rather than part of the template, so the chains are
+# built once and cached instead of rebuilt around the character card on every turn.
+with_summary_context = RunnablePassthrough.assign(
+    summary_context=format_summary_context
+)
+
 
 def get_router_chain():
     """Get the router chain for the Anantha application."""
 
-    model = get_chat_model(temperature=0.4).with_structured_output(RouterResponse)
+    def build():
+        model = get_chat_model(temperature=0.4).with_structured_output(RouterResponse)
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ('system', ROUTER_PROMPT), 
-            MessagesPlaceholder(variable_name="messages"),
-        ],
-    )
-    return prompt | model 
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", ROUTER_PROMPT),
+                MessagesPlaceholder(variable_name="messages"),
+            ],
+        )
+        return prompt | model
 
-def get_anantha_response_chain(summary:str = ""):
-    """Get the Anantha response chain for the Anantha application."""
+    return get_chain("router", build)
 
-    model = get_chat_model()
-    system_message = CHARACTER_CARD_PROMPT
 
-    if summary:
-        system_message += f"\n\nSummary of conversation earlier between Anantha and the user: {summary}"
+def get_anantha_response_chain(streaming: bool = False):
+    """Get the Anantha response chain for the Anantha application.
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ('system', system_message),
-            MessagesPlaceholder(variable_name="messages"),
-        ],
-    )
-    return prompt | model | AsteriskRemovalParser()
+    Inputs: messages, current_activity, memory_context and optionally summary.
+
+    Args:
+        streaming (bool): Return raw text chunks for `astream`. Asterisk content is not
+                          removed, since the parser would strip every chunk on its own.
+    """
+
+    def build():
+        model = get_chat_model()
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", CHARACTER_CARD_PROMPT + "{summary_context}"),
+                MessagesPlaceholder(variable_name="messages"),
+            ],
+        )
+        parser = StrOutputParser() if streaming else AsteriskRemovalParser()
+        return with_summary_context | prompt | model | parser
+
+    return get_chain(("anantha_response", streaming), build)
+
+
+def get_combined_router_chain():
+    """Get the chain deciding the response type and writing the reply in a single call.
+
+    Inputs: messages, current_activity, memory_context and optionally summary.
+    """
+
+    def build():
+        model = get_chat_model().with_structured_output(CombinedRouterResponse)
 
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    CHARACTER_CARD_PROMPT
+                    + "{summary_context}"
+                    + COMBINED_ROUTER_PROMPT,
+                ),
+                MessagesPlaceholder(variable_name="messages"),
+            ],
+        )
+        return with_summary_context | prompt | model
 
+    return get_chain("combined_router", build)
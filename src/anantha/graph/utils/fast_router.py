@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+from langchain_core.messages import BaseMessage
+
+from anantha.modules.memory.long_term.vector_store import get_vector_store
+from anantha.settings import settings
+
+
+def context_text(context: Sequence[Tuple[str, str]]) -> str:
+    """Text the fast router classifies from (message type, content) pairs."""
+    return "\n".join(f"{type_}: {content}" for type_, content in context)
+
+
+def router_text(messages: Sequence[BaseMessage]) -> str:
+    """Text the fast router classifies: the same window of messages the LLM router sees."""
+    window = messages[-settings.ROUTER_MESSAGES_TO_ANALYZE :] if messages else []
+    return context_text([(m.type, str(m.content)) for m in window])
+
+
+class FastRouter:
+    """Local classifier for the router decision.
+
+    A scikit-learn classifier over the `all-MiniLM-L6-v2` embeddings already loaded
+    for the vector store. It is trained offline from logged router decisions (see
+    `anantha.graph.utils.train_router`), and its prediction is only used when the
+    class probability reaches `ROUTER_FAST_CONFIDENCE`; below that the LLM router decides.
+    """
+
+    logger = logging.getLogger(__name__)
+    _classifier: Optional[Any] = None
+    _loaded = False
+
+    @classmethod
+    def classifier(cls) -> Optional[Any]:
+        """Load the trained classifier once, or None when no model has been trained."""
+        if not cls._loaded:
+            cls._loaded = True
+            if os.path.exists(settings.ROUTER_MODEL_PATH):
+                bundle = joblib.load(settings.ROUTER_MODEL_PATH)
+                if bundle.get("embedding_model") != get_vector_store().EMBEDDING_MODEL:
+                    cls.logger.warning(
+                        f"Fast router was trained on {bundle.get('embedding_model')} embeddings, ignoring it"
+                    )
+                    return None
+                if bundle.get("messages") != settings.ROUTER_MESSAGES_TO_ANALYZE:
+                    cls.logger.warning(
+                        f"Fast router was trained on windows of {bundle.get('messages', 1)} message(s), "
+                        f"not {settings.ROUTER_MESSAGES_TO_ANALYZE}, ignoring it"
+                    )
+                    return None
+                cls._classifier = bundle["classifier"]
+                cls.logger.info(
+                    f"Loaded fast router trained on {bundle.get('samples', '?')} decisions "
+                    f"({', '.join(cls._classifier.classes_)})"
+                )
+            else:
+                cls.logger.info(
+                    f"No fast router model at {settings.ROUTER_MODEL_PATH}, using the LLM router only"
+                )
+        return cls._classifier
+
+    @classmethod
+    def embed(cls, texts: List[str]) -> np.ndarray:
+        return (
+            get_vector_store()
+            .embedding_model()
+            .encode(texts, normalize_embeddings=True)
+        )
+
+    @classmethod
+    def _predict(cls, text: str) -> Optional[Tuple[str, float]]:
+        classifier = cls.classifier()
+        if classifier is None or not text:
+            return None
+        probabilities = classifier.predict_proba(cls.embed([text]))[0]
+        best = int(np.argmax(probabilities))
+        return str(classifier.classes_[best]), float(probabilities[best])
+
+    @classmethod
+    async def predict(
+        cls, messages: Sequence[BaseMessage]
+    ) -> Optional[Tuple[str, float]]:
+        """Predict the response type of the conversation.
+
+        Returns:
+            Optional[Tuple[str, float]]: The response type and its probability, or None
+                                         when no classifier is available.
+        """
+        try:
+            return await asyncio.to_thread(cls._predict, router_text(messages))
+        except Exception as e:
+            cls.logger.warning(
+                f"Fast router failed, falling back to the LLM router: {e}"
+            )
+            return None
+
+
+def decision_logs(path: str) -> List[str]:
+    """Existing files of a decision log, the rotated one first."""
+    return [p for p in (f"{path}.1", path) if os.path.exists(p)]
+
+
+class RouterDecisionLog:
+    """Append-only JSONL log of router decisions, the training data of the fast router.
+
+    The log contains user messages, so it is only written when `ROUTER_DECISION_LOG_ENABLED`
+    is set. Past `ROUTER_DECISION_LOG_MAX_BYTES` it is rotated to `<path>.1`, replacing
+    the previous rotation, so at most twice that size is kept on disk.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def _append(cls, record: Dict) -> None:
+        path = settings.ROUTER_DECISION_LOG_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            if os.path.getsize(path) >= settings.ROUTER_DECISION_LOG_MAX_BYTES:
+                os.replace(path, f"{path}.1")
+        except FileNotFoundError:
+            pass
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @classmethod
+    async def record(
+        cls,
+        messages: Sequence[BaseMessage],
+        response_type: str,
+        source: str,
+        confidence: Optional[float] = None,
+    ) -> None:
+        """Log a router decision.
+
+        Args:
+            messages: The messages the router analyzed.
+            response_type: The decided response type.
+            source: "fast" for the local classifier, "llm" for the LLM router.
+            confidence: The classifier probability of its best class, if it was consulted.
+        """
+        if (
+            not settings.ROUTER_DECISION_LOG_ENABLED
+            or not settings.ROUTER_DECISION_LOG_PATH
+        ):
+            return
+
+        record = {
+            "ts": time.time(),
+            "text": router_text(messages),
+            "context": [{"type": m.type, "content": str(m.content)} for m in messages],
+            "response_type": response_type,
+            "source": source,
+            "confidence": confidence,
+        }
+        try:
+            await asyncio.to_thread(cls._append, record)
+        except OSError as e:
+            cls.logger.warning(f"Failed to log router decision: {e}")
@@ -1,17 +1,18 @@
+import re
+from functools import lru_cache
 
-import re 
-
-
-from anantha.settings import settings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_groq.chat_models import ChatGroq
 
-
-from anantha.modules.images.text_to_image import TextToImage
+from anantha.core.background import BackgroundTaskRunner
+from anantha.core.llm import get_llm
 from anantha.modules.images.image_to_text import ImageToText
+from anantha.modules.images.text_to_image import TextToImage
 from anantha.modules.speech.text_to_speech import TextToSpeech
+from anantha.settings import settings
 
-def remover_asterisk_content(text: str)->str:
+
+def remover_asterisk_content(text: str) -> str:
     """Remove content between asterisks in the text."""
 
     return re.sub(r"\*.*?\*", "", text).strip()
@@ -25,28 +26,38 @@ class AsteriskRemovalParser(StrOutputParser):
         return remover_asterisk_content(super().parse(text))
 
 
-
 def get_chat_model(temperature: float = 0.6) -> ChatGroq:
-    """Get the chat model with the specified temperature.
-    
+    """Get the shared chat model with the specified temperature.
+
     Args:
         temperature (float): The temperature for the chat model. Default is 0.6.
     Returns:
         ChatGroq: The chat model instance.
     """
 
-    return ChatGroq(
-        api_key=settings.GROQ_API_KEY,
-        model_name=settings.TEXT_MODEL_NAME,
-        temperature=temperature,
-    )
+    return get_llm(settings.TEXT_MODEL_NAME, temperature)
 
 
 def get_text_to_speech_module():
     return TextToSpeech
 
+
 def get_text_to_image_module():
     return TextToImage
 
+
 def get_image_to_text_module():
     return ImageToText
+
+
+@lru_cache(maxsize=1)
+def get_memory_extraction_runner() -> BackgroundTaskRunner:
+    """Get the background runner for deferred long-term memory extraction."""
+
+    return BackgroundTaskRunner(
+        name="memory_extraction",
+        concurrency=settings.MEMORY_EXTRACTION_CONCURRENCY,
+        max_pending=settings.MEMORY_EXTRACTION_MAX_PENDING,
+        error_budget=settings.MEMORY_EXTRACTION_ERROR_BUDGET,
+        error_window=settings.MEMORY_EXTRACTION_ERROR_WINDOW_SECONDS,
+    )
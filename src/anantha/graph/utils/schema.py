@@ -1,8 +1,19 @@
+from typing import Literal
 
 from pydantic import BaseModel, Field
-from typing import Literal, List
+
 
 class RouterResponse(BaseModel):
     response_type: Literal["conversation", "image", "audio"] = Field(
         description="The response type to give to the user. It must be one of: 'conversation', 'image' or 'audio'"
-    )
\ No newline at end of file
+    )
+
+
+class CombinedRouterResponse(BaseModel):
+    response_type: Literal["conversation", "image", "audio"] = Field(
+        description="The response type to give to the user. It must be one of: 'conversation', 'image' or 'audio'"
+    )
+    response: str = Field(
+        default="",
+        description="Your reply to the user's last message. Empty when the response type is 'image'",
+    )
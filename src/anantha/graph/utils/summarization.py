@@ -0,0 +1,50 @@
+from typing import List, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from anantha.core.llm import get_llm
+from anantha.graph.utils.token_budget import fit_messages, history_tokens
+from anantha.settings import settings
+
+
+def needs_summary(messages: Sequence[BaseMessage]) -> bool:
+    """Whether the history grew past the summarization trigger."""
+
+    return history_tokens(messages) > settings.SUMMARY_TRIGGER_TOKENS
+
+
+def evicted_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """The oldest messages, which are folded into the summary and removed from the history."""
+
+    kept = fit_messages(messages, settings.TOKENS_AFTER_SUMMARY)
+    return list(messages[: len(messages) - len(kept)])
+
+
+async def extend_summary(summary: str, evicted: Sequence[BaseMessage]) -> str:
+    """Fold the evicted messages into the rolling summary.
+
+    Only the evicted slice is sent to the model: the messages that stay in the history
+    are still seen verbatim by the reply nodes.
+    """
+
+    if summary:
+        summary_message = (
+            f"This is summary of the conversation to date between Anantha and the user: {summary}\n\n"
+            "Extend the summary by taking into account the new messages above:"
+        )
+    else:
+        summary_message = (
+            "Create a summary of the conversation above between Anantha and the user. "
+            "The summary must be a short description of the conversation so far, "
+            "but that captures all the relevant information shared between Anantha and the user:"
+        )
+
+    model_name = (
+        settings.SMALL_TEXT_MODEL_NAME
+        if settings.SUMMARY_USE_SMALL_MODEL
+        else settings.TEXT_MODEL_NAME
+    )
+    response = await get_llm(model_name, 0.6).ainvoke(
+        list(evicted) + [HumanMessage(content=summary_message)]
+    )
+    return response.content
@@ -0,0 +1,159 @@
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import tiktoken
+from langchain_core.messages import BaseMessage
+
+from anantha.core.prompts import CHARACTER_CARD_PROMPT
+from anantha.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Role markers and separators the chat template adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_message_token_cache: "OrderedDict[str, int]" = OrderedDict()
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+    except Exception as e:
+        # e.g. the BPE file cannot be downloaded; fall back to a character estimate.
+        logger.warning(
+            f"tiktoken encoding {settings.TOKENIZER_ENCODING} unavailable, estimating tokens: {e}"
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text.
+
+    The Groq models use their own tokenizers; a tiktoken encoding is a close enough
+    approximation to budget the context.
+    """
+
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Count the tokens of a message, cached by message id."""
+
+    content = (
+        message.content if isinstance(message.content, str) else str(message.content)
+    )
+    if message.id is None:
+        return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    # Messages are immutable once checkpointed, but the key includes the length to be safe.
+    key = f"{message.id}:{len(content)}"
+    tokens = _message_token_cache.get(key)
+    if tokens is None:
+        tokens = count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        _message_token_cache[key] = tokens
+        if len(_message_token_cache) > settings.TOKEN_COUNT_CACHE_SIZE:
+            _message_token_cache.popitem(last=False)
+    else:
+        _message_token_cache.move_to_end(key)
+    return tokens
+
+
+def history_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Count the tokens of a message history."""
+
+    return sum(message_tokens(m) for m in messages)
+
+
+def fit_messages(messages: Sequence[BaseMessage], budget: int) -> List[BaseMessage]:
+    """Keep the most recent messages that fit in the budget; the last message is always kept."""
+
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        tokens = message_tokens(message)
+        if kept and used + tokens > budget:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """Truncate a text to at most `budget` tokens, keeping its beginning."""
+
+    if count_tokens(text) <= budget:
+        return text
+    encoding = _encoding()
+    if encoding is None:
+        return text[: budget * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+
+
+def truncate_lines(text: str, budget: int) -> str:
+    """Keep the leading lines of a text (e.g. memory bullet points) that fit in `budget` tokens."""
+
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+@lru_cache(maxsize=1)
+def character_card_tokens() -> int:
+    return count_tokens(CHARACTER_CARD_PROMPT)
+
+
+def assemble_context(
+    messages: Sequence[BaseMessage],
+    summary: str = "",
+    memory_context: str = "",
+    current_activity: str = "",
+) -> dict:
+    """Fit history, summary and memory context into `CONTEXT_TOKEN_BUDGET`.
+
+    The character card and the reply reserve are fixed; the summary and the memory
+    context are capped by their own budgets, and the most recent messages fill what is left.
+
+    Returns:
+        dict: The chain inputs messages, summary, memory_context and current_activity.
+    """
+
+    summary = truncate_tokens(summary, settings.SUMMARY_TOKEN_BUDGET)
+    memory_context = truncate_lines(
+        memory_context, settings.MEMORY_CONTEXT_TOKEN_BUDGET
+    )
+
+    history_budget = (
+        settings.CONTEXT_TOKEN_BUDGET
+        - settings.RESPONSE_TOKEN_RESERVE
+        - character_card_tokens()
+        - count_tokens(summary)
+        - count_tokens(memory_context)
+        - count_tokens(current_activity)
+    )
+    fitted = fit_messages(messages, max(history_budget, 0))
+    if len(fitted) < len(messages):
+        logger.debug(
+            f"Context budget keeps {len(fitted)} of {len(messages)} messages ({history_budget} tokens)"
+        )
+
+    return {
+        "messages": fitted,
+        "summary": summary,
+        "memory_context": memory_context,
+        "current_activity": current_activity,
+    }
@@ -0,0 +1,148 @@
+"""
+Train the fast router from logged router decisions.
+
+Decisions made by the LLM router are the labels; by default decisions the fast router
+made itself are left out, so the classifier does not learn from its own output. The
+decisions are only logged with `ROUTER_DECISION_LOG_ENABLED` set; the current log and its
+rotation are both read.
+
+    python -m anantha.graph.utils.train_router \\
+        --log /app/data/router_decisions.jsonl --output /app/data/router_model.joblib
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import classification_report
+from sklearn.model_selection import train_test_split
+
+from anantha.graph.utils.fast_router import FastRouter, context_text, decision_logs
+from anantha.modules.memory.long_term.vector_store import get_vector_store
+from anantha.settings import settings
+
+ROUTES = ("conversation", "image", "audio")
+
+
+def record_text(record: Dict) -> str:
+    """Classifier input of a logged decision, rebuilt from the router's context window."""
+    context = record.get("context")
+    if not context:
+        return ""
+    window = context[-settings.ROUTER_MESSAGES_TO_ANALYZE :]
+    return context_text([(m["type"], m["content"]) for m in window])
+
+
+def load_decisions(paths: List[str], include_fast: bool) -> Tuple[List[str], List[str]]:
+    """Read (text, response_type) pairs from decision logs, keeping the latest label per text."""
+    labels = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                text = record_text(record)
+                if record.get("response_type") not in ROUTES or not text:
+                    continue
+                if record.get("source") != "llm" and not include_fast:
+                    continue
+                labels[text] = record["response_type"]
+    return list(labels), list(labels.values())
+
+
+def train(texts: List[str], labels: List[str], test_size: float) -> LogisticRegression:
+    """Fit the classifier and print a held-out evaluation."""
+    embeddings = FastRouter.embed(texts)
+
+    counts = Counter(labels)
+    if test_size > 0 and min(counts.values()) >= 2:
+        x_train, x_test, y_train, y_test = train_test_split(
+            embeddings, labels, test_size=test_size, stratify=labels, random_state=42
+        )
+        evaluation = LogisticRegression(max_iter=1000, class_weight="balanced").fit(
+            x_train, y_train
+        )
+        print(
+            classification_report(y_test, evaluation.predict(x_test), zero_division=0)
+        )
+
+        confident = (
+            evaluation.predict_proba(x_test).max(axis=1)
+            >= settings.ROUTER_FAST_CONFIDENCE
+        )
+        if confident.any():
+            accuracy = (evaluation.predict(x_test) == np.array(y_test))[
+                confident
+            ].mean()
+            print(
+                f"At confidence >= {settings.ROUTER_FAST_CONFIDENCE}: "
+                f"{confident.mean():.1%} of messages answered locally, {accuracy:.1%} accurate"
+            )
+
+    return LogisticRegression(max_iter=1000, class_weight="balanced").fit(
+        embeddings, labels
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Train the fast router from logged router decisions"
+    )
+    parser.add_argument(
+        "--log",
+        default=settings.ROUTER_DECISION_LOG_PATH,
+        help="Router decision log (JSONL)",
+    )
+    parser.add_argument(
+        "--output",
+        default=settings.ROUTER_MODEL_PATH,
+        help="Where to write the trained model",
+    )
+    parser.add_argument(
+        "--test-size",
+        type=float,
+        default=0.2,
+        help="Held-out fraction for evaluation (0 to skip)",
+    )
+    parser.add_argument(
+        "--include-fast",
+        action="store_true",
+        help="Also train on decisions of the fast router",
+    )
+    parser.add_argument("--min-samples", type=int, default=50)
+    args = parser.parse_args()
+
+    logs = decision_logs(args.log)
+    if not logs:
+        print(f"No router decision log at {args.log}", file=sys.stderr)
+        return 1
+
+    texts, labels = load_decisions(logs, args.include_fast)
+    print(f"Loaded {len(texts)} decisions: {dict(Counter(labels))}")
+    if len(texts) < args.min_samples or len(set(labels)) < 2:
+        print("Not enough labelled decisions to train the fast router", file=sys.stderr)
+        return 1
+
+    classifier = train(texts, labels, args.test_size)
+    joblib.dump(
+        {
+            "classifier": classifier,
+            "embedding_model": get_vector_store().EMBEDDING_MODEL,
+            "messages": settings.ROUTER_MESSAGES_TO_ANALYZE,
+            "samples": len(texts),
+        },
+        args.output,
+    )
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,34 @@ from io import BytesIO
 
 import chainlit as cl
 from langchain_core.messages import AIMessageChunk, HumanMessage
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
-from anantha.settings import settings
-from anantha.graph.graph import create_workflow_graph
-from anantha.modules.speech.speech_to_text import SpeechToText
+from anantha.core.blob_store import get_blob_store
+from anantha.core.exceptions import GraphOverloadedError, ThreadLeaseTimeoutError
+from anantha.core.metrics import count_llm_calls
+from anantha.graph.runtime import get_graph_runtime
 from anantha.modules.images.image_to_text import ImageToText
+from anantha.modules.speech.speech_to_text import SpeechToText
 from anantha.modules.speech.text_to_speech import TextToSpeech
+from anantha.settings import settings
 
 
-graph = create_workflow_graph().compile()
+@cl.on_app_startup
+async def on_app_startup():
+    """Open the shared checkpointer and compile the graph once"""
+    await get_graph_runtime().start()
+
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    """Close the shared checkpointer"""
+    await get_graph_runtime().close()
+
 
 @cl.on_chat_start
 async def on_chat_start():
     """Initialize the chat session"""
-    cl.user_session.set("thread_id", 1)
+    # Every browser session is its own conversation, with its own thread lease.
+    cl.user_session.set("thread_id", cl.context.session.id)
 
 
 @cl.on_message
@@ -41,37 +54,64 @@ async def on_message(message: cl.Message):
                     cl.logger.warning(f"Failed to analyze image: {e}")
 
     thread_id = cl.user_session.get("thread_id")
+    human_message = HumanMessage(content=content)
+
+    runtime = get_graph_runtime()
+    try:
+        async with (
+            cl.Step(type="run"),
+            runtime.thread_lease(thread_id),
+            runtime.admit() as degraded,
+        ):
+            with count_llm_calls() as llm_calls:
+                async for chunk in runtime.graph.astream(
+                    {"messages": [human_message], "degraded": degraded},
+                    {"configurable": {"thread_id": thread_id}},
+                    stream_mode="messages",
+                ):
+                    if chunk[1]["langgraph_node"] == "conversation_node" and isinstance(
+                        chunk[0], AIMessageChunk
+                    ):
+                        await msg.stream_token(chunk[0].content)
+
+            output_state = await runtime.graph.aget_state(
+                config={"configurable": {"thread_id": thread_id}}
+            )
+    except (GraphOverloadedError, ThreadLeaseTimeoutError):
+        await cl.Message(content=settings.OVERLOAD_REPLY).send()
+        return
+
+    llm_calls.observe(
+        settings.ROUTER_MODE, output_state.values.get("workflow", "conversation")
+    )
 
-    async with cl.Step(type="run"):
-        async with AsyncSqliteSaver.from_conn_string(settings.SHORT_TERM_MEMORY_DB_PATH) as short_term_memory:
-            graph = create_workflow_graph().compile(checkpointer=short_term_memory)
-            async for chunk in graph.astream(
-                {"messages": [HumanMessage(content=content)]},
-                {"configurable": {"thread_id": thread_id}},
-                stream_mode="messages",
-            ):
-                if chunk[1]["langgraph_node"] == "conversation_node" and isinstance(chunk[0], AIMessageChunk):
-                    await msg.stream_token(chunk[0].content)
-
-            output_state = await graph.aget_state(config={"configurable": {"thread_id": thread_id}})
-
+    # Media is read from the blob store by Chainlit when the element is sent.
+    blob_store = get_blob_store()
     if output_state.values.get("workflow") == "audio":
         response = output_state.values["messages"][-1].content
-        audio_buffer = output_state.values["audio_buffer"]
         output_audio_el = cl.Audio(
             name="Audio",
             auto_play=True,
             mime="audio/mpeg3",
-            content=audio_buffer,
+            path=blob_store.path(output_state.values["audio_ref"]),
         )
         await cl.Message(content=response, elements=[output_audio_el]).send()
     elif output_state.values.get("workflow") == "image":
         response = output_state.values["messages"][-1].content
-        image = cl.Image(path=output_state.values["image_path"], display="inline")
+        image = cl.Image(
+            path=blob_store.path(output_state.values["image_ref"]), display="inline"
+        )
         await cl.Message(content=response, elements=[image]).send()
     else:
+        # A reply drafted by the combined router is not streamed token by token.
+        if not msg.content:
+            msg.content = output_state.values["messages"][-1].content
         await msg.send()
 
+    if not degraded:
+        runtime.schedule_memory_extraction(human_message)
+        runtime.schedule_summarization(thread_id, output_state.values["messages"])
+
 
 @cl.on_audio_chunk
 async def on_audio_chunk(chunk):
@@ -92,17 +132,29 @@ async def on_audio_end(elements):
     audio_data = audio_buffer.read()
 
     input_audio_el = cl.Audio(mime="audio/mpeg3", content=audio_data)
-    await cl.Message(author="You", content="", elements=[input_audio_el, *elements]).send()
+    await cl.Message(
+        author="You", content="", elements=[input_audio_el, *elements]
+    ).send()
 
     transcription = await SpeechToText.transcribe(audio_data)
     thread_id = cl.user_session.get("thread_id")
-
-    async with AsyncSqliteSaver.from_conn_string(settings.SHORT_TERM_MEMORY_DB_PATH) as short_term_memory:
-        graph = create_workflow_graph().compile(checkpointer=short_term_memory)
-        output_state = await graph.ainvoke(
-            {"messages": [HumanMessage(content=transcription)]},
-            {"configurable": {"thread_id": thread_id}},
-        )
+    human_message = HumanMessage(content=transcription)
+
+    runtime = get_graph_runtime()
+    try:
+        async with runtime.thread_lease(thread_id), runtime.admit() as degraded:
+            with count_llm_calls() as llm_calls:
+                output_state = await runtime.graph.ainvoke(
+                    {"messages": [human_message], "degraded": degraded},
+                    {"configurable": {"thread_id": thread_id}},
+                )
+    except (GraphOverloadedError, ThreadLeaseTimeoutError):
+        await cl.Message(content=settings.OVERLOAD_REPLY).send()
+        return
+
+    llm_calls.observe(
+        settings.ROUTER_MODE, output_state.get("workflow", "conversation")
+    )
 
     audio_buffer = await TextToSpeech.synthesize(output_state["messages"][-1].content)
 
@@ -112,4 +164,10 @@ async def on_audio_end(elements):
         mime="audio/mpeg3",
         content=audio_buffer,
     )
-    await cl.Message(content=output_state["messages"][-1].content, elements=[output_audio_el]).send()
+    await cl.Message(
+        content=output_state["messages"][-1].content, elements=[output_audio_el]
+    ).send()
+
+    if not degraded:
+        runtime.schedule_memory_extraction(human_message)
+        runtime.schedule_summarization(thread_id, output_state["messages"])
@@ -0,0 +1,107 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import aiosqlite
+
+
+class MessageDeduplicator:
+    """Idempotency guard for redelivered WhatsApp messages, keyed on the message id.
+
+    Recently seen ids are kept in an in-memory LRU and persisted in a small SQLite
+    table, so duplicates are recognised across restarts and across worker processes.
+    Entries older than `ttl_seconds` are evicted.
+    """
+
+    PURGE_INTERVAL_SECONDS = 300
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, db_path: str, ttl_seconds: int, cache_size: int):
+        self._db_path = db_path
+        self._ttl = ttl_seconds
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._last_purge = 0.0
+
+    async def start(self) -> None:
+        """Open the SQLite table backing the deduplicator."""
+        if self._conn is not None:
+            return
+        os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+        self._conn = await aiosqlite.connect(self._db_path)
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_messages ("
+            "message_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        await self._conn.commit()
+        await self._purge(time.time())
+
+    async def close(self) -> None:
+        """Close the SQLite connection."""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def claim(self, message_id: str) -> bool:
+        """Record a message id as being processed.
+
+        Returns:
+            bool: True if the id was not seen within the TTL and should be processed,
+                  False if it is a duplicate delivery.
+        """
+        now = time.time()
+        seen_at = self._cache.get(message_id)
+        if seen_at is not None and now - seen_at < self._ttl:
+            self._cache.move_to_end(message_id)
+            return False
+
+        claimed = True
+        if self._conn is not None:
+            try:
+                cursor = await self._conn.execute(
+                    "INSERT INTO processed_messages (message_id, seen_at) VALUES (?, ?) "
+                    "ON CONFLICT(message_id) DO UPDATE SET seen_at = excluded.seen_at "
+                    "WHERE processed_messages.seen_at < ?",
+                    (message_id, now, now - self._ttl),
+                )
+                claimed = cursor.rowcount == 1
+                await self._conn.commit()
+            except Exception as e:
+                # Fall back to the in-memory cache rather than dropping the message.
+                self.logger.warning(f"Failed to persist message id {message_id}: {e}")
+
+        self._remember(message_id, now)
+        if now - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+            await self._purge(now)
+        return claimed
+
+    async def release(self, message_id: str) -> None:
+        """Forget a claimed message id, so a redelivery is processed again."""
+        self._cache.pop(message_id, None)
+        if self._conn is not None:
+            await self._conn.execute(
+                "DELETE FROM processed_messages WHERE message_id = ?", (message_id,)
+            )
+            await self._conn.commit()
+
+    def _remember(self, message_id: str, seen_at: float) -> None:
+        self._cache[message_id] = seen_at
+        self._cache.move_to_end(message_id)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    async def _purge(self, now: float) -> None:
+        self._last_purge = now
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                "DELETE FROM processed_messages WHERE seen_at < ?", (now - self._ttl,)
+            )
+            await self._conn.commit()
+        except Exception as e:
+            self.logger.warning(f"Failed to purge processed message ids: {e}")
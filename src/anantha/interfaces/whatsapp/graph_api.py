@@ -0,0 +1,179 @@
+import logging
+import os
+import tempfile
+from typing import BinaryIO, Dict, Optional, Union
+
+import httpx
+
+from anantha.core.exceptions import MediaTooLargeError
+from anantha.settings import settings
+
+WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
+WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+
+
+class GraphAPIClient:
+    """Client for the WhatsApp Cloud (Graph) API sharing one pooled HTTP/2 connection pool.
+
+    The underlying `httpx.AsyncClient` lives for the whole application: it is opened
+    and warmed in the FastAPI lifespan and reused by every Graph API call, so each
+    hop of a message no longer pays a fresh TCP+TLS handshake.
+    """
+
+    # Graph API error codes of a send whose media id is unknown or expired.
+    MEDIA_ERROR_CODES = {131052, 131053}
+    # Invalid parameter errors, which concern the media id when their details say so.
+    INVALID_PARAMETER_ERROR_CODES = {100, 131009}
+
+    _client: Optional[httpx.AsyncClient] = None
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def _create_client(cls) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.WHATSAPP_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.WHATSAPP_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.WHATSAPP_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.WHATSAPP_HTTP_TIMEOUT,
+                connect=settings.WHATSAPP_HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+
+    @classmethod
+    def client(cls) -> httpx.AsyncClient:
+        """Get or create the shared HTTP client using singleton pattern."""
+        if cls._client is None or cls._client.is_closed:
+            cls._client = cls._create_client()
+        return cls._client
+
+    @classmethod
+    async def start(cls) -> None:
+        """Open the shared HTTP client and warm the connection to the Graph API."""
+        client = cls.client()
+        try:
+            await client.head(settings.WHATSAPP_GRAPH_API_URL)
+            cls.logger.info("Warmed Graph API connection")
+        except httpx.HTTPError as e:
+            cls.logger.warning(f"Failed to warm Graph API connection: {e}")
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared HTTP client."""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+    @staticmethod
+    def _auth_headers() -> Dict[str, str]:
+        return {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
+
+    @classmethod
+    def is_invalid_media_error(cls, response: httpx.Response) -> bool:
+        """Whether a failed send was rejected because of its media id."""
+        if response.status_code == 429 or response.status_code >= 500:
+            return False
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            return False
+        if error.get("code") in cls.MEDIA_ERROR_CODES:
+            return True
+        details = f"{error.get('message', '')} {error.get('error_data', {}).get('details', '')}".lower()
+        return (
+            error.get("code") in cls.INVALID_PARAMETER_ERROR_CODES
+            and "media" in details
+        )
+
+    @classmethod
+    async def get_media_metadata(cls, media_id: str) -> Dict:
+        """Fetch the metadata (download URL, mime type, size) of a media id."""
+        response = await cls.client().get(
+            f"{settings.WHATSAPP_GRAPH_API_URL}/{media_id}",
+            headers=cls._auth_headers(),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @classmethod
+    async def download_media(
+        cls,
+        media_id: str,
+        max_bytes: Optional[int] = None,
+    ) -> tempfile.SpooledTemporaryFile:
+        """Stream the content of a media id into a spooled temporary file.
+
+        The body is kept in memory up to `WHATSAPP_MEDIA_SPOOL_THRESHOLD` bytes and
+        spills to disk past it. The returned file is positioned at the start and must
+        be closed by the caller.
+
+        Raises:
+            MediaTooLargeError: If the media is larger than `max_bytes`.
+        """
+        max_bytes = max_bytes or settings.WHATSAPP_MEDIA_MAX_BYTES
+
+        metadata = await cls.get_media_metadata(media_id)
+        if int(metadata.get("file_size") or 0) > max_bytes:
+            raise MediaTooLargeError(
+                f"Media {media_id} is {metadata['file_size']} bytes (limit {max_bytes})"
+            )
+
+        async with cls.client().stream(
+            "GET", metadata.get("url"), headers=cls._auth_headers()
+        ) as response:
+            response.raise_for_status()
+            if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                raise MediaTooLargeError(
+                    f"Media {media_id} is {response.headers['Content-Length']} bytes (limit {max_bytes})"
+                )
+
+            buffer = tempfile.SpooledTemporaryFile(
+                max_size=settings.WHATSAPP_MEDIA_SPOOL_THRESHOLD
+            )
+            try:
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MediaTooLargeError(
+                            f"Media {media_id} exceeds {max_bytes} bytes"
+                        )
+                    buffer.write(chunk)
+            except BaseException:
+                buffer.close()
+                raise
+
+        buffer.seek(0)
+        return buffer
+
+    @classmethod
+    async def upload_media(
+        cls,
+        media_content: Union[bytes, BinaryIO],
+        mime_type: str,
+        filename: str = "response.mp3",
+    ) -> str:
+        """Upload media to WhatsApp servers and return its media id."""
+        response = await cls.client().post(
+            f"{settings.WHATSAPP_GRAPH_API_URL}/{WHATSAPP_PHONE_NUMBER_ID}/media",
+            headers=cls._auth_headers(),
+            files={"file": (filename, media_content, mime_type)},
+            data={"messaging_product": "whatsapp", "type": mime_type},
+        )
+        result = response.json()
+
+        if "id" not in result:
+            raise Exception("Failed to upload media")
+        return result["id"]
+
+    @classmethod
+    async def send_message(cls, json_data: Dict) -> httpx.Response:
+        """Send a message payload to the messages endpoint."""
+        return await cls.client().post(
+            f"{settings.WHATSAPP_GRAPH_API_URL}/{WHATSAPP_PHONE_NUMBER_ID}/messages",
+            headers={**cls._auth_headers(), "Content-Type": "application/json"},
+            json=json_data,
+        )
@@ -0,0 +1,112 @@
+import logging
+import os
+import time
+from typing import Optional
+
+import aiosqlite
+
+
+class MediaUploadCache:
+    """Cache from the SHA-256 of uploaded media content to its WhatsApp media id.
+
+    Entries are persisted in SQLite, bounded to `max_entries` (least recently used are
+    evicted first) and expire after `ttl_seconds`, which should stay below the
+    lifetime of media ids on the Graph API (30 days).
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_entries: int):
+        self._db_path = db_path
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._conn: Optional[aiosqlite.Connection] = None
+
+    async def start(self) -> None:
+        """Open the SQLite table backing the cache."""
+        if self._conn is not None:
+            return
+        os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+        self._conn = await aiosqlite.connect(self._db_path)
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_uploads ("
+            "sha256 TEXT NOT NULL, mime_type TEXT NOT NULL, media_id TEXT NOT NULL, "
+            "uploaded_at REAL NOT NULL, last_used_at REAL NOT NULL, "
+            "PRIMARY KEY (sha256, mime_type))"
+        )
+        await self._conn.execute(
+            "DELETE FROM media_uploads WHERE uploaded_at < ?",
+            (time.time() - self._ttl,),
+        )
+        await self._conn.commit()
+
+    async def close(self) -> None:
+        """Close the SQLite connection."""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def get(self, sha256: str, mime_type: str) -> Optional[str]:
+        """Return the media id previously uploaded for this content, if still valid."""
+        if self._conn is None:
+            return None
+
+        now = time.time()
+        try:
+            async with self._conn.execute(
+                "SELECT media_id FROM media_uploads WHERE sha256 = ? AND mime_type = ? AND uploaded_at >= ?",
+                (sha256, mime_type, now - self._ttl),
+            ) as cursor:
+                row = await cursor.fetchone()
+
+            if row is None:
+                return None
+
+            await self._conn.execute(
+                "UPDATE media_uploads SET last_used_at = ? WHERE sha256 = ? AND mime_type = ?",
+                (now, sha256, mime_type),
+            )
+            await self._conn.commit()
+            return row[0]
+
+        except Exception as e:
+            self.logger.warning(f"Failed to read media cache: {e}")
+            return None
+
+    async def put(self, sha256: str, mime_type: str, media_id: str) -> None:
+        """Remember the media id returned for an upload."""
+        if self._conn is None:
+            return
+
+        now = time.time()
+        try:
+            await self._conn.execute(
+                "INSERT OR REPLACE INTO media_uploads (sha256, mime_type, media_id, uploaded_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sha256, mime_type, media_id, now, now),
+            )
+            await self._conn.execute(
+                "DELETE FROM media_uploads WHERE uploaded_at < ? OR rowid IN ("
+                "SELECT rowid FROM media_uploads ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (now - self._ttl, self._max_entries),
+            )
+            await self._conn.commit()
+
+        except Exception as e:
+            self.logger.warning(f"Failed to write media cache: {e}")
+
+    async def invalidate(self, sha256: str, mime_type: str) -> None:
+        """Drop a cached media id, e.g. after the Graph API rejected it."""
+        if self._conn is None:
+            return
+
+        try:
+            await self._conn.execute(
+                "DELETE FROM media_uploads WHERE sha256 = ? AND mime_type = ?",
+                (sha256, mime_type),
+            )
+            await self._conn.commit()
+
+        except Exception as e:
+            self.logger.warning(f"Failed to invalidate media cache: {e}")
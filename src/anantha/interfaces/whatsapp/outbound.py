@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class OutboundScheduler:
+    """Scheduler every outbound WhatsApp message goes through.
+
+    Sends are paced by a global token bucket (the Graph API throughput tier) and a
+    per-recipient token bucket (the business/user pair rate limit). Throttling and
+    server errors are retried with jittered exponential backoff, never earlier than a
+    server-sent Retry-After.
+    """
+
+    # Graph API error codes signalling rate limiting or a transient failure.
+    RETRYABLE_ERROR_CODES = {1, 2, 4, 80007, 130429, 131000, 131016, 131048, 131056}
+    IDLE_BUCKET_SECONDS = 600
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        send: Callable[[Dict], Awaitable[httpx.Response]],
+        rate: float,
+        burst: int,
+        recipient_rate: float,
+        recipient_burst: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        self._send = send
+        self._global_bucket = TokenBucket(rate, burst)
+        self._recipient_rate = recipient_rate
+        self._recipient_burst = recipient_burst
+        self._recipient_buckets: Dict[str, TokenBucket] = {}
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._last_cleanup = time.monotonic()
+
+        self._queued = 0
+        self._waiting = 0
+        self._sent = 0
+        self._retried = 0
+        self._dropped = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the outbound counters."""
+        return {
+            "queued": self._queued,
+            "waiting": self._waiting,
+            "sent": self._sent,
+            "retried": self._retried,
+            "dropped": self._dropped,
+            "recipients": len(self._recipient_buckets),
+        }
+
+    async def send(self, recipient: str, json_data: Dict) -> Optional[httpx.Response]:
+        """Send a message payload, waiting for rate limit tokens and retrying on failure.
+
+        Returns:
+            Optional[httpx.Response]: The last response received, or None if every attempt
+                                      failed at the transport level.
+        """
+        self._queued += 1
+        response = None
+
+        for attempt in range(self._max_retries + 1):
+            await self._acquire(recipient)
+
+            retry_after = None
+            try:
+                response = await self._send(json_data)
+                if response.status_code == 200:
+                    self._sent += 1
+                    return response
+                if not self._is_retryable(response):
+                    self.logger.error(
+                        f"Message to {recipient} rejected ({response.status_code}): {response.text}"
+                    )
+                    break
+                retry_after = self._retry_after(response)
+                reason = f"status {response.status_code}"
+            except httpx.TransportError as e:
+                reason = f"{type(e).__name__}: {e}"
+
+            if attempt == self._max_retries:
+                break
+
+            delay = self._backoff(attempt, retry_after)
+            self._retried += 1
+            self.logger.warning(
+                f"Retrying message to {recipient} in {delay:.2f}s ({reason})"
+            )
+            await asyncio.sleep(delay)
+
+        self._dropped += 1
+        self.logger.error(
+            f"Dropped message to {recipient} after {attempt + 1} attempt(s)"
+        )
+        return response
+
+    async def _acquire(self, recipient: str) -> None:
+        """Wait until both the global and the recipient bucket have a token, then take them."""
+        bucket = self._recipient_bucket(recipient)
+        self._waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                self._global_bucket.refill(now)
+                bucket.refill(now)
+                wait = max(self._global_bucket.wait_time(), bucket.wait_time())
+                if wait == 0:
+                    self._global_bucket.tokens -= 1
+                    bucket.tokens -= 1
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self._waiting -= 1
+
+    def _recipient_bucket(self, recipient: str) -> TokenBucket:
+        now = time.monotonic()
+        if now - self._last_cleanup > self.IDLE_BUCKET_SECONDS:
+            self._last_cleanup = now
+            self._recipient_buckets = {
+                key: bucket
+                for key, bucket in self._recipient_buckets.items()
+                if now - bucket.updated_at < self.IDLE_BUCKET_SECONDS
+            }
+
+        bucket = self._recipient_buckets.get(recipient)
+        if bucket is None:
+            bucket = TokenBucket(self._recipient_rate, self._recipient_burst)
+            self._recipient_buckets[recipient] = bucket
+        return bucket
+
+    def _is_retryable(self, response: httpx.Response) -> bool:
+        if response.status_code == 429 or response.status_code >= 500:
+            return True
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            return False
+        return error.get("code") in self.RETRYABLE_ERROR_CODES
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter: spread retries uniformly over the exponential window.
+        delay = random.uniform(
+            0, min(self._backoff_max, self._backoff_base * 2**attempt)
+        )
+        # Retry-After is a floor set by the server; backoff_max only caps our own backoff.
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
@@ -1,8 +1,44 @@
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Response
 
-from fastapi import FastAPI
+from anantha.core.metrics import render_metrics
+from anantha.graph.runtime import get_graph_runtime
+from anantha.interfaces.whatsapp.graph_api import GraphAPIClient
+from anantha.interfaces.whatsapp.whatsapp_response import (
+    deduplicator,
+    media_cache,
+    whatsapp_router,
+    work_queue,
+)
+from anantha.settings import settings
 
-from anantha.interfaces.whatsapp.whatsapp_response import whatsapp_router
 
-app = FastAPI()
-app.include_router(whatsapp_router)
\ No newline at end of file
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the graph runtime and the shared Graph API client, then start the WhatsApp workers."""
+    runtime = get_graph_runtime()
+    await runtime.start()
+    # The workers bound how many turns can reach admission control at once.
+    runtime.limit_admission_load(work_queue.concurrency)
+    await GraphAPIClient.start()
+    await deduplicator.start()
+    await media_cache.start()
+    await work_queue.start()
+    yield
+    await work_queue.stop(timeout=settings.WHATSAPP_QUEUE_DRAIN_TIMEOUT)
+    await media_cache.close()
+    await deduplicator.close()
+    await GraphAPIClient.close()
+    await runtime.close()
+
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(whatsapp_router)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Expose the Prometheus metrics of the application."""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -1,148 +1,334 @@
-
-import logging 
-import os 
+import asyncio
+import hashlib
+import logging
+import os
+import time
 from io import BytesIO
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
-import httpx
 from fastapi import APIRouter, Request, Response
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from fastapi.responses import JSONResponse
+from langchain_core.messages import HumanMessage
 
-from anantha.graph.graph import create_workflow_graph
+from anantha.core.blob_store import get_blob_store
+from anantha.core.exceptions import (
+    BlobNotFoundError,
+    GraphOverloadedError,
+    MediaTooLargeError,
+    ThreadLeaseTimeoutError,
+    WorkQueueFullError,
+)
+from anantha.core.metrics import (
+    count_llm_calls,
+    current_workflow,
+    observe_stage,
+    track_stage,
+    workflow_for_message_type,
+)
+from anantha.graph.runtime import get_graph_runtime
+from anantha.interfaces.whatsapp.dedup import MessageDeduplicator
+from anantha.interfaces.whatsapp.graph_api import GraphAPIClient
+from anantha.interfaces.whatsapp.media_cache import MediaUploadCache
+from anantha.interfaces.whatsapp.outbound import OutboundScheduler
+from anantha.interfaces.whatsapp.work_queue import SenderWorkQueue
 from anantha.modules.images.image_to_text import ImageToText
 from anantha.modules.speech.speech_to_text import SpeechToText
-from anantha.modules.speech.text_to_speech import TextToSpeech
-
-from langchain_core.messages import HumanMessage
-
 from anantha.settings import settings
 
 whatsapp_router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
-WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
 
 @whatsapp_router.api_route("/whatsapp_response", methods=["GET", "POST"])
 async def whatsapp_handler(request: Request) -> Response:
-    """Handles incoming messages and status updates from the WhatsApp Cloud API."""
+    """Handles incoming messages and status updates from the WhatsApp Cloud API.
+
+    Messages are validated and queued for background processing so that the webhook
+    is acknowledged immediately, well within Meta's delivery timeout.
+    """
 
     if request.method == "GET":
         params = request.query_params
         if params.get("hub.verify_token") == os.getenv("WHATSAPP_VERIFY_TOKEN"):
             return Response(content=params.get("hub.challenge"), status_code=200)
         return Response(content="Verification token mismatch", status_code=403)
-    
+
+    parse_started = time.perf_counter()
     try:
         data = await request.json()
-        change_value = data["entry"][0]["changes"][0]["value"]
-        if "messages" in change_value:
-            message = change_value["messages"][0]
-            from_number = message["from"]
-            session_id = from_number
-
-            # Get user message and handle different message types
-            content = ""
-            if message["type"] == "audio":
-                content = await process_audio_message(message)
-            elif message["type"] == "image":
-                # Get image caption if any
-                content = message.get("image", {}).get("caption", "")
-                # Download and analyze image
-                image_bytes = await download_media(message["image"]["id"])
+        changes = [
+            change["value"]
+            for entry in data["entry"]
+            for change in entry.get("changes", [])
+        ]
+    except Exception as e:
+        observe_stage(
+            "webhook_parse", "webhook", "error", time.perf_counter() - parse_started
+        )
+        logger.warning(f"Malformed webhook payload: {e}")
+        return Response(content="Malformed payload", status_code=400)
+
+    # A delivery may mix message types, so parsing is labelled for the delivery as a whole.
+    observe_stage(
+        "webhook_parse", "webhook", "success", time.perf_counter() - parse_started
+    )
+
+    # Meta may batch several messages, and several senders, into a single delivery.
+    # Every message is queued on its sender's queue, so senders are processed
+    # concurrently while each sender's messages stay in order.
+    summary = {
+        "accepted": 0,
+        "duplicates": 0,
+        "rejected": 0,
+        "invalid": 0,
+        "statuses": 0,
+    }
+    try:
+        for change_value in changes:
+            for message in change_value.get("messages", []):
+                if "from" not in message or "type" not in message:
+                    summary["invalid"] += 1
+                    continue
+
+                # Redeliveries of a message already being handled stop here,
+                # before any media download, LLM or TTS call.
+                message_id = message.get("id")
+                if message_id and not await deduplicator.claim(message_id):
+                    summary["duplicates"] += 1
+                    continue
+
                 try:
-                    description = await ImageToText.analyze_image(
-                        image_bytes,
-                        "Please describe what you see in this image in the context of our conversation.",
-                    )
-                    content += f"\n[Image Analysis: {description}]"
-                except Exception as e:
-                    logger.warning(f"Failed to analyze image: {e}")
-            else:
-                content = message["text"]["body"]
-
-            # Process message through the graph agent
-            async with AsyncSqliteSaver.from_conn_string(settings.SHORT_TERM_MEMORY_DB_PATH) as short_term_memory:
-                graph = create_workflow_graph().compile(checkpointer=short_term_memory)
-                await graph.ainvoke(
-                    {"messages": [HumanMessage(content=content)]},
-                    {"configurable": {"thread_id": session_id}},
-                )
+                    work_queue.enqueue(message["from"], message)
+                    summary["accepted"] += 1
+                except WorkQueueFullError as e:
+                    logger.warning(f"Rejecting message {message_id}: {e}")
+                    summary["rejected"] += 1
+                    if message_id:
+                        await deduplicator.release(message_id)
 
-                # Get the workflow type and response from the state
-                output_state = await graph.aget_state(config={"configurable": {"thread_id": session_id}})
+            summary["statuses"] += len(change_value.get("statuses", []))
 
-            workflow = output_state.values.get("workflow", "conversation")
-            response_message = output_state.values["messages"][-1].content
+    except Exception as e:
+        logger.error(f"Error accepting messages: {e}", exc_info=True)
+        return JSONResponse(content=summary, status_code=500)
 
-            # Handle different response types based on workflow
-            if workflow == "audio":
-                audio_buffer = output_state.values["audio_buffer"]
-                success = await send_response(from_number, response_message, "audio", audio_buffer)
-            elif workflow == "image":
-                image_path = output_state.values["image_path"]
-                with open(image_path, "rb") as f:
-                    image_data = f.read()
-                success = await send_response(from_number, response_message, "image", image_data)
-            else:
-                success = await send_response(from_number, response_message, "text")
+    if summary["rejected"]:
+        # Ask Meta to redeliver the batch later instead of silently dropping messages.
+        return JSONResponse(content=summary, status_code=503)
 
-            if not success:
-                return Response(content="Failed to send message", status_code=500)
+    if not (summary["accepted"] or summary["duplicates"] or summary["statuses"]):
+        return JSONResponse(content=summary, status_code=400)
 
-            return Response(content="Message processed", status_code=200)
+    return JSONResponse(content=summary, status_code=200)
 
-        elif "statuses" in change_value:
-            return Response(content="Status update received", status_code=200)
 
-        else:
-            return Response(content="Unknown event type", status_code=400)
+@whatsapp_router.get("/whatsapp_queue")
+async def whatsapp_queue_stats() -> Dict:
+    """Returns the depth and wait times of the WhatsApp work queue and the outbound counters."""
+    return {
+        **work_queue.stats(),
+        "outbound": outbound_scheduler.stats(),
+        "graph": get_graph_runtime().admission_stats(),
+        "background": get_graph_runtime().background_stats(),
+        "blobs": get_blob_store().stats(),
+    }
 
-    except Exception as e:
-        logger.error(f"Error processing message: {e}", exc_info=True)
-        return Response(content="Internal server error", status_code=500)
 
+async def extract_message_content(message: Dict) -> str:
+    """Turn an incoming WhatsApp message into the text handed to the graph."""
+
+    current_workflow.set(workflow_for_message_type(message["type"]))
+
+    # Get user message and handle different message types
+    content = ""
+    if message["type"] == "audio":
+        content = await process_audio_message(message)
+    elif message["type"] == "image":
+        # Get image caption if any
+        content = message.get("image", {}).get("caption", "")
+        # Download and analyze image
+        with await download_media(message["image"]["id"]) as image_file:
+            try:
+                description = await ImageToText.analyze_image(
+                    image_file,
+                    "Please describe what you see in this image in the context of our conversation.",
+                )
+                content += f"\n[Image Analysis: {description}]"
+            except Exception as e:
+                logger.warning(f"Failed to analyze image: {e}")
+    else:
+        content = message["text"]["body"]
+
+    return content
+
+
+async def process_messages(from_number: str, messages: List[Dict]) -> None:
+    """Process a burst of WhatsApp messages from one sender as a single graph turn."""
+    session_id = from_number
+
+    current_workflow.set(workflow_for_message_type(messages[-1]["type"]))
+
+    # Messages coalesced by the work queue are merged into one human turn,
+    # so a burst costs a single graph invocation.
+    results = await asyncio.gather(
+        *(extract_message_content(message) for message in messages),
+        return_exceptions=True,
+    )
+    contents = []
+    read = []
+    too_large = False
+    for message, result in zip(messages, results):
+        if isinstance(result, MediaTooLargeError):
+            logger.warning(
+                f"Rejected {message['type']} message {message.get('id')}: {result}"
+            )
+            too_large = True
+        elif isinstance(result, Exception):
+            logger.error(
+                f"Failed to read {message['type']} message {message.get('id')}: {result}"
+            )
+        elif result:
+            contents.append(result)
+            read.append(message)
+
+    if too_large:
+        await send_response(
+            from_number, settings.WHATSAPP_MEDIA_TOO_LARGE_REPLY, "text"
+        )
 
-async def download_media(media_id: str) -> bytes:
-    """Download media from WhatsApp."""
-    media_metadata_url = f"https://graph.facebook.com/v21.0/{media_id}"
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
+    if not contents:
+        logger.warning(
+            f"No usable content in {len(messages)} message(s) from {from_number}"
+        )
+        return
+    human_message = HumanMessage(content="\n".join(contents))
 
-    async with httpx.AsyncClient() as client:
-        metadata_response = await client.get(media_metadata_url, headers=headers)
-        metadata_response.raise_for_status()
-        metadata = metadata_response.json()
-        download_url = metadata.get("url")
+    # Process message through the graph agent
+    runtime = get_graph_runtime()
+    try:
+        async with (
+            runtime.thread_lease(session_id),
+            runtime.admit(work_queue.depth, work_queue.oldest_wait()) as degraded,
+        ):
+            with count_llm_calls() as llm_calls:
+                await runtime.graph.ainvoke(
+                    {"messages": [human_message], "degraded": degraded},
+                    {"configurable": {"thread_id": session_id}},
+                )
 
-        media_response = await client.get(download_url, headers=headers)
-        media_response.raise_for_status()
-        return media_response.content
+            # Get the workflow type and response from the state
+            output_state = await runtime.graph.aget_state(
+                config={"configurable": {"thread_id": session_id}}
+            )
+    except GraphOverloadedError as e:
+        logger.warning(f"Shedding turn from {from_number}: {e}")
+        await send_response(from_number, settings.OVERLOAD_REPLY, "text")
+        return
+    except ThreadLeaseTimeoutError as e:
+        # Only the messages that were read are retried; the others were already answered.
+        await retry_busy_thread(from_number, read, e)
+        return
+
+    workflow = output_state.values.get("workflow", "conversation")
+    response_message = output_state.values["messages"][-1].content
+    current_workflow.set(workflow)
+    llm_calls.observe(settings.ROUTER_MODE, workflow)
+
+    # Handle different response types based on workflow
+    if workflow in ("audio", "image"):
+        # Media stays in the blob store until it is sent; state only holds its reference.
+        ref = output_state.values.get(f"{workflow}_ref", "")
+        try:
+            media = await get_blob_store().get(ref)
+        except BlobNotFoundError as e:
+            logger.error(f"Falling back to text, {workflow} reply is unavailable: {e}")
+            success = await send_response(from_number, response_message, "text")
+        else:
+            success = await send_response(
+                from_number, response_message, workflow, media
+            )
+    else:
+        success = await send_response(from_number, response_message, "text")
+
+    if not success:
+        logger.error(f"Failed to send {workflow} response to {from_number}")
+
+    # Degraded turns skip memory extraction and leave the summary to the next regular turn.
+    if not degraded:
+        runtime.schedule_memory_extraction(human_message)
+        runtime.schedule_summarization(session_id, output_state.values["messages"])
+
+
+async def retry_busy_thread(
+    from_number: str, messages: List[Dict], error: ThreadLeaseTimeoutError
+) -> None:
+    """Requeue a turn whose thread is still busy with an earlier one.
+
+    The webhook was already acknowledged and the message ids claimed, so Meta will not
+    redeliver these messages: dropping them here would lose them for good. Once the
+    retries are spent the claims are released, so a redelivery or resend goes through.
+    """
+    retries = messages[0].get("_lease_retries", 0)
+    if retries < settings.WHATSAPP_LEASE_MAX_RETRIES:
+        logger.warning(f"Requeueing turn from {from_number}, thread is busy: {error}")
+        for message in messages:
+            message["_lease_retries"] = retries + 1
+        work_queue.requeue(from_number, messages)
+        return
+
+    logger.error(
+        f"Giving up on turn from {from_number} after {retries} retries, thread is busy: {error}"
+    )
+    for message in messages:
+        if message.get("id"):
+            await deduplicator.release(message["id"])
+    await send_response(from_number, settings.OVERLOAD_REPLY, "text")
+
+
+deduplicator = MessageDeduplicator(
+    db_path=settings.WHATSAPP_STATE_DB_PATH,
+    ttl_seconds=settings.WHATSAPP_DEDUP_TTL_SECONDS,
+    cache_size=settings.WHATSAPP_DEDUP_CACHE_SIZE,
+)
+
+media_cache = MediaUploadCache(
+    db_path=settings.WHATSAPP_STATE_DB_PATH,
+    ttl_seconds=settings.WHATSAPP_MEDIA_CACHE_TTL_SECONDS,
+    max_entries=settings.WHATSAPP_MEDIA_CACHE_MAX_ENTRIES,
+)
+
+outbound_scheduler = OutboundScheduler(
+    send=GraphAPIClient.send_message,
+    rate=settings.WHATSAPP_SEND_RATE_PER_SECOND,
+    burst=settings.WHATSAPP_SEND_BURST,
+    recipient_rate=settings.WHATSAPP_RECIPIENT_RATE_PER_SECOND,
+    recipient_burst=settings.WHATSAPP_RECIPIENT_BURST,
+    max_retries=settings.WHATSAPP_SEND_MAX_RETRIES,
+    backoff_base=settings.WHATSAPP_SEND_BACKOFF_BASE,
+    backoff_max=settings.WHATSAPP_SEND_BACKOFF_MAX,
+)
+
+work_queue = SenderWorkQueue(
+    handler=process_messages,
+    concurrency=settings.WHATSAPP_WORKER_CONCURRENCY,
+    max_size=settings.WHATSAPP_QUEUE_MAX_SIZE,
+    coalesce_window=settings.WHATSAPP_COALESCE_WINDOW_MS / 1000,
+    coalesce_max_wait=settings.WHATSAPP_COALESCE_MAX_WAIT_MS / 1000,
+    max_batch=settings.WHATSAPP_COALESCE_MAX_BATCH,
+)
+
+
+async def download_media(media_id: str) -> BinaryIO:
+    """Download media from WhatsApp into a spooled temporary file."""
+    with track_stage("media_download"):
+        return await GraphAPIClient.download_media(media_id)
 
 
 async def process_audio_message(message: Dict) -> str:
     """Download and transcribe audio message."""
-    audio_id = message["audio"]["id"]
-    media_metadata_url = f"https://graph.facebook.com/v21.0/{audio_id}"
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-
-    async with httpx.AsyncClient() as client:
-        metadata_response = await client.get(media_metadata_url, headers=headers)
-        metadata_response.raise_for_status()
-        metadata = metadata_response.json()
-        download_url = metadata.get("url")
-
-    # Download the audio file
-    async with httpx.AsyncClient() as client:
-        audio_response = await client.get(download_url, headers=headers)
-        audio_response.raise_for_status()
-
-    # Prepare for transcription
-    audio_buffer = BytesIO(audio_response.content)
-    audio_buffer.seek(0)
-    audio_data = audio_buffer.read()
-
-    return await SpeechToText.transcribe(audio_data)
+    with await download_media(message["audio"]["id"]) as audio_file:
+        return await SpeechToText.transcribe(audio_file)
 
 
 async def send_response(
@@ -152,16 +338,35 @@ async def send_response(
     media_content: bytes = None,
 ) -> bool:
     """Send response to user via WhatsApp API."""
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json",
-    }
+    started = time.perf_counter()
+    sent = False
+    try:
+        sent = await _send_response(
+            from_number, response_text, message_type, media_content
+        )
+        return sent
+    finally:
+        outcome = "success" if sent else "error"
+        observe_stage(
+            "send_response",
+            current_workflow.get(),
+            outcome,
+            time.perf_counter() - started,
+        )
 
+
+async def _send_response(
+    from_number: str,
+    response_text: str,
+    message_type: str,
+    media_content: Optional[bytes],
+) -> bool:
+    cached = False
     if message_type in ["audio", "image"]:
         try:
             mime_type = "audio/mpeg" if message_type == "audio" else "image/png"
-            media_buffer = BytesIO(media_content)
-            media_id = await upload_media(media_buffer, mime_type)
+            digest = hashlib.sha256(media_content).hexdigest()
+            media_id, cached = await get_media_id(media_content, digest, mime_type)
             json_data = {
                 "messaging_product": "whatsapp",
                 "to": from_number,
@@ -184,34 +389,49 @@ async def send_response(
             "text": {"body": response_text},
         }
 
-    print(headers)
-    print(json_data)
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"https://graph.facebook.com/v21.0/{WHATSAPP_PHONE_NUMBER_ID}/messages",
-            headers=headers,
-            json=json_data,
+    logger.debug(f"Sending WhatsApp message: {json_data}")
+
+    response = await outbound_scheduler.send(from_number, json_data)
+    sent = response is not None and response.status_code == 200
+
+    if (
+        not sent
+        and cached
+        and response is not None
+        and GraphAPIClient.is_invalid_media_error(response)
+    ):
+        # The cached media id expired on Meta's side: upload again once. Other failures
+        # were already retried by the scheduler and would fail again with a new id.
+        logger.warning("Cached media id was rejected, re-uploading")
+        await media_cache.invalidate(digest, mime_type)
+        json_data[message_type]["id"], _ = await get_media_id(
+            media_content, digest, mime_type
         )
+        response = await outbound_scheduler.send(from_number, json_data)
+        sent = response is not None and response.status_code == 200
+
+    return sent
 
-    return response.status_code == 200
+
+async def get_media_id(
+    media_content: bytes, digest: str, mime_type: str
+) -> Tuple[str, bool]:
+    """Return a WhatsApp media id for the content, uploading it only when not cached.
+
+    Returns:
+        Tuple[str, bool]: The media id, and whether it came from the cache.
+    """
+    media_id = await media_cache.get(digest, mime_type)
+    if media_id:
+        return media_id, True
+
+    media_id = await upload_media(BytesIO(media_content), mime_type)
+    await media_cache.put(digest, mime_type, media_id)
+    return media_id, False
 
 
 async def upload_media(media_content: BytesIO, mime_type: str) -> str:
     """Upload media to WhatsApp servers."""
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-    files = {"file": ("response.mp3", media_content, mime_type)}
-    data = {"messaging_product": "whatsapp", "type": mime_type}
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"https://graph.facebook.com/v21.0/{WHATSAPP_PHONE_NUMBER_ID}/media",
-            headers=headers,
-            files=files,
-            data=data,
-        )
-        result = response.json()
-
-    if "id" not in result:
-        raise Exception("Failed to upload media")
-    return result["id"] 
\ No newline at end of file
+    filename = "response.png" if mime_type.startswith("image/") else "response.mp3"
+    with track_stage("upload_media"):
+        return await GraphAPIClient.upload_media(media_content, mime_type, filename)
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List
+
+from anantha.core.exceptions import WorkQueueFullError
+
+
+@dataclass
+class QueuedItem:
+    """Represent a unit of work waiting in the sender work queue."""
+
+    key: str
+    payload: Any
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class SenderWorkQueue:
+    """In-process work queue with strict FIFO ordering per key.
+
+    Items sharing a key (the WhatsApp sender number) are handled one batch at a time
+    and in arrival order, while different keys are drained concurrently by a fixed
+    pool of asyncio workers.
+
+    When `coalesce_window` is set, a key only becomes ready once no new item arrived
+    for that long, so a burst of messages is handed to the handler as one batch. The
+    wait never exceeds `coalesce_max_wait` past the first item of the burst.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        handler: Callable[[str, List[Any]], Awaitable[None]],
+        concurrency: int,
+        max_size: int,
+        coalesce_window: float = 0.0,
+        coalesce_max_wait: float = 0.0,
+        max_batch: int = 1,
+    ):
+        self._handler = handler
+        self._concurrency = max(1, concurrency)
+        self._max_size = max_size
+        self._coalesce_window = max(0.0, coalesce_window)
+        self._coalesce_max_wait = max(self._coalesce_window, coalesce_max_wait)
+        self._max_batch = max(1, max_batch) if self._coalesce_window else 1
+
+        # A key is present in `_pending` while it is debouncing in `_timers`, waiting
+        # in `_ready` or being processed by a worker, which guarantees a single
+        # consumer per key.
+        self._pending: Dict[str, Deque[QueuedItem]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+
+        self._depth = 0
+        self._active = 0
+        self._processed = 0
+        self._failed = 0
+        self._batches = 0
+        self._wait_last = 0.0
+        self._wait_max = 0.0
+        self._wait_total = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Number of items waiting to be processed."""
+        return self._depth
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    def oldest_wait(self) -> float:
+        """Seconds the oldest waiting item has been in the queue."""
+        oldest = min(
+            (items[0].enqueued_at for items in self._pending.values() if items),
+            default=None,
+        )
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def enqueue(self, key: str, payload: Any) -> None:
+        """Add an item to the queue of the given key.
+
+        Raises:
+            WorkQueueFullError: If the queue already holds `max_size` items.
+        """
+        if self._depth >= self._max_size:
+            raise WorkQueueFullError(
+                f"Work queue is full ({self._depth} items waiting)"
+            )
+
+        item = QueuedItem(key=key, payload=payload)
+        items = self._pending.get(key)
+        if items is None:
+            self._pending[key] = deque([item])
+            self._schedule(key)
+        else:
+            items.append(item)
+            if key in self._timers:
+                self._schedule(key)
+        self._depth += 1
+
+    def requeue(self, key: str, payloads: List[Any]) -> None:
+        """Put items back at the head of their key's queue, ahead of anything newer.
+
+        Used to retry a batch the handler could not process yet. Requeued items were
+        already admitted once, so they are not bounded by `max_size`.
+        """
+        requeued = [QueuedItem(key=key, payload=payload) for payload in payloads]
+        items = self._pending.get(key)
+        if items is None:
+            self._pending[key] = deque(requeued)
+            self._schedule(key)
+        else:
+            # A key being processed is rescheduled by its worker once the handler returns.
+            items.extendleft(reversed(requeued))
+            if key in self._timers:
+                self._schedule(key)
+        self._depth += len(requeued)
+
+    def _schedule(self, key: str) -> None:
+        """Mark a key ready, once its debounce window has elapsed."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        delay = 0.0
+        if self._coalesce_window:
+            items = self._pending[key]
+            due = min(
+                items[-1].enqueued_at + self._coalesce_window,
+                items[0].enqueued_at + self._coalesce_max_wait,
+            )
+            delay = due - time.monotonic()
+
+        if delay <= 0:
+            self._ready.put_nowait(key)
+        else:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                delay, self._on_timer, key
+            )
+
+    def _on_timer(self, key: str) -> None:
+        self._timers.pop(key, None)
+        self._ready.put_nowait(key)
+
+    async def start(self) -> None:
+        """Start the worker pool."""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"whatsapp-worker-{i}")
+            for i in range(self._concurrency)
+        ]
+        self.logger.info(f"Started {self._concurrency} WhatsApp workers")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Wait up to `timeout` seconds for in-flight work, then stop the workers."""
+        deadline = time.monotonic() + timeout
+        while (self._depth or self._active) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self._depth or self._active:
+            self.logger.warning(
+                f"Stopping WhatsApp workers with {self._depth} queued and {self._active} active items"
+            )
+
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the queue depth, throughput and wait times."""
+        started = self._processed + self._failed
+        return {
+            "depth": self._depth,
+            "active": self._active,
+            "senders": len(self._pending),
+            "debouncing": len(self._timers),
+            "concurrency": self._concurrency,
+            "processed": self._processed,
+            "failed": self._failed,
+            "batches": self._batches,
+            "wait_seconds_last": round(self._wait_last, 4),
+            "wait_seconds_max": round(self._wait_max, 4),
+            "wait_seconds_avg": round(self._wait_total / started, 4)
+            if started
+            else 0.0,
+            "wait_seconds_oldest": round(self.oldest_wait(), 4),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            items = self._pending[key]
+            batch = [items.popleft() for _ in range(min(self._max_batch, len(items)))]
+            self._depth -= len(batch)
+
+            now = time.monotonic()
+            for item in batch:
+                wait = now - item.enqueued_at
+                self._wait_last = wait
+                self._wait_max = max(self._wait_max, wait)
+                self._wait_total += wait
+
+            self._active += 1
+            try:
+                await self._handler(key, [item.payload for item in batch])
+                self._processed += len(batch)
+            except Exception as e:
+                self._failed += len(batch)
+                self.logger.error(
+                    f"Error processing queued items for {key}: {e}", exc_info=True
+                )
+            finally:
+                self._active -= 1
+                self._batches += 1
+                if items:
+                    # Items that arrived during processing form the next burst.
+                    self._schedule(key)
+                else:
+                    del self._pending[key]
@@ -1,34 +1,33 @@
-
-import os 
+import os
 from dataclasses import dataclass
 from datetime import datetime
 from functools import lru_cache
-from typing import Dict, List, Optional
+from typing import List, Optional
 
-from anantha.settings import settings
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, PointStruct, VectorParams
 from sentence_transformers import SentenceTransformer
 
+from anantha.settings import settings
 
 
 @dataclass
 class Memory:
     """Represent a memory entry in the vector Qdrant vector store."""
 
-    text: str 
+    text: str
     metadata: dict
     score: Optional[float] = None
 
     @property
-    def id(self)-> Optional[str]:
+    def id(self) -> Optional[str]:
         return self.metadata.get("id")
-    
+
     @property
-    def timestamp(self)-> Optional[datetime]:
+    def timestamp(self) -> Optional[datetime]:
         ts = self.metadata.get("timestamp")
         return datetime.fromisoformat(ts) if ts else None
-    
+
 
 class VectorStore:
     """A class to handle vector storage operations using Qdrant."""
@@ -36,30 +35,41 @@ class VectorStore:
     REQUIRED_ENV_VARS = ["QDRANT_URL", "QDRANT_API_KEY"]
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     COLLECTION_NAME = "long_term_memory"
-    SIMILARITY_THRESHOLD = 0.9  
+    SIMILARITY_THRESHOLD = 0.9
 
     _model = None
-    _client = None 
+    _client = None
 
     @classmethod
-    def _validate_env_vars(cls)-> None:
+    def _validate_env_vars(cls) -> None:
         missing_vars = [var for var in cls.REQUIRED_ENV_VARS if not os.getenv(var)]
         if missing_vars:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
-        
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing_vars)}"
+            )
+
     @classmethod
     def _initialize(cls) -> None:
         if cls._model is None or cls._client is None:
             cls._validate_env_vars()
+            cls.embedding_model()
+            cls._client = QdrantClient(
+                url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY
+            )
+
+    @classmethod
+    def embedding_model(cls) -> SentenceTransformer:
+        """Get the sentence embedding model, shared with other local classifiers."""
+        if cls._model is None:
             cls._model = SentenceTransformer(cls.EMBEDDING_MODEL)
-            cls._client = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
+        return cls._model
 
     @classmethod
     def _collection_exists(cls) -> bool:
         cls._initialize()
         collections = cls._client.get_collections().collections
         return any(col.name == cls.COLLECTION_NAME for col in collections)
-    
+
     @classmethod
     def _create_collection(cls) -> None:
         cls._initialize()
@@ -73,27 +83,26 @@ class VectorStore:
         )
 
     @classmethod
-    def find_similar_memory(cls, text:str) -> Optional[Memory]:
+    def find_similar_memory(cls, text: str) -> Optional[Memory]:
         """Find if a similar memory already exists in the vector store.
-        
+
         Args:
             text (str): The text to search for similar memories.
-        
+
         Returns:
             Optional[Memory]: The most similar memory found, or None if no similar memory is found.
         """
 
-        results = cls.search_memories(text, k=1) 
+        results = cls.search_memories(text, k=1)
         if results and results[0].score > cls.SIMILARITY_THRESHOLD:
             return results[0]
-        
-        return None
 
+        return None
 
     @classmethod
-    def store_memory(cls, text:str, metadata:dict) -> None:
+    def store_memory(cls, text: str, metadata: dict) -> None:
         """Store a new memory in the vector store or update if similar exists.
-        
+
         Args:
             text (str): The text of the memory.
             metadata (dict): Additional information about the memory (timestamp, type, etc.)
@@ -122,7 +131,7 @@ class VectorStore:
         )
 
     @classmethod
-    def search_memories(cls, query: str, k:int = 5) -> List[Memory]:
+    def search_memories(cls, query: str, k: int = 5) -> List[Memory]:
         """Search for similar memories in the vector store.
 
         Args:
@@ -134,7 +143,7 @@ class VectorStore:
         """
         if not cls._collection_exists():
             return []
-        
+
         query_embedding = cls._model.encode(query)
         results = cls._client.search(
             collection_name=cls.COLLECTION_NAME,
@@ -155,5 +164,5 @@ class VectorStore:
 @lru_cache
 def get_vector_store() -> type[VectorStore]:
     """Returns the class, since classmethods are used directly."""
-    
-    return VectorStore
\ No newline at end of file
+
+    return VectorStore
@@ -0,0 +1,394 @@
+"""
+Retention for the short-term memory checkpoints.
+
+Every super-step of every turn writes a checkpoint, and each checkpoint holds the full
+state of its thread. Only the latest ones are needed to resume a conversation, so
+compaction keeps the `keep_latest` newest checkpoints of every thread, drops threads
+idle for longer than `idle_ttl` seconds, and returns the freed pages to the filesystem.
+
+Report the database footprint, or compact it offline (every shard of `--db`):
+
+    python -m anantha.modules.memory.short_term.retention report --db /app/data/memory.db
+    python -m anantha.modules.memory.short_term.retention compact --db /app/data/memory.db
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import aiosqlite
+
+from anantha.core.exceptions import ThreadLeaseTimeoutError
+
+# 100ns intervals between the Gregorian epoch of UUID timestamps and the Unix epoch.
+UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time at which a checkpoint was written, read from its UUIDv6 id."""
+    value = uuid.UUID(checkpoint_id).int
+    # UUIDv6 layout: time_high (32 bits), time_mid (16), version (4), time_low (12).
+    timestamp = (
+        ((value >> 96) << 28)
+        | (((value >> 80) & 0xFFFF) << 12)
+        | ((value >> 64) & 0x0FFF)
+    )
+    return (timestamp - UUID_EPOCH_OFFSET) / 1e7
+
+
+@dataclass
+class ThreadFootprint:
+    """Storage used by one conversation thread."""
+
+    thread_id: str
+    checkpoints: int
+    checkpoint_bytes: int
+    writes: int
+    write_bytes: int
+    last_active: float
+
+    @property
+    def total_bytes(self) -> int:
+        return self.checkpoint_bytes + self.write_bytes
+
+
+@asynccontextmanager
+async def _no_lease(thread_id: str) -> AsyncIterator[None]:
+    yield
+
+
+class CheckpointRetention:
+    """Prune old checkpoints and idle threads, then run an incremental vacuum."""
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, keep_latest: int, idle_ttl: float, vacuum_pages: int):
+        self._keep_latest = max(1, keep_latest)
+        self._idle_ttl = idle_ttl
+        self._vacuum_pages = vacuum_pages
+
+    async def compact(
+        self,
+        conn: aiosqlite.Connection,
+        lock: Optional[asyncio.Lock] = None,
+        lease: Callable[[str], AsyncContextManager[None]] = _no_lease,
+    ) -> Dict[str, int]:
+        """Run one compaction pass.
+
+        Args:
+            conn: Connection to the checkpoint database.
+            lock: Lock serializing the connection with the checkpointer, held per thread
+                  so turns are not stalled for the whole pass.
+            lease: Exclusive lease of a thread, held while an idle thread is deleted so a
+                   turn arriving at the same time cannot lose its checkpoint.
+
+        Returns:
+            Dict[str, int]: Number of pruned checkpoints and writes, expired threads, idle threads
+                            skipped because a turn held their lease, and vacuumed pages.
+        """
+        lock = lock or asyncio.Lock()
+        report = {
+            "pruned_checkpoints": 0,
+            "pruned_writes": 0,
+            "expired_threads": 0,
+            "busy_threads": 0,
+            "vacuumed_pages": 0,
+        }
+        expire_before = time.time() - self._idle_ttl if self._idle_ttl > 0 else None
+
+        async with lock:
+            async with conn.execute(
+                "SELECT thread_id, checkpoint_ns, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id, checkpoint_ns"
+            ) as cursor:
+                threads = await cursor.fetchall()
+
+        for thread_id, checkpoint_ns, latest_id in threads:
+            if expire_before is not None and checkpoint_time(latest_id) < expire_before:
+                try:
+                    if await self._expire(conn, lock, lease, thread_id, expire_before):
+                        report["expired_threads"] += 1
+                except ThreadLeaseTimeoutError as e:
+                    # The user is back mid-turn, so the thread is no longer idle; the next pass decides.
+                    self.logger.info(f"Skipping expiry of busy thread {thread_id}: {e}")
+                    report["busy_threads"] += 1
+                continue
+
+            async with lock:
+                checkpoints, writes = await self._prune(conn, thread_id, checkpoint_ns)
+            report["pruned_checkpoints"] += checkpoints
+            report["pruned_writes"] += writes
+
+        report["vacuumed_pages"] = await self.vacuum(conn, lock)
+        return report
+
+    async def _prune(
+        self, conn: aiosqlite.Connection, thread_id: str, checkpoint_ns: str
+    ) -> Tuple[int, int]:
+        # Checkpoint ids are UUIDv6, so they sort by creation time.
+        async with conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self._keep_latest - 1),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return 0, 0
+
+        cutoff = row[0]
+        deleted_checkpoints = await conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, cutoff),
+        )
+        deleted_writes = await conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, cutoff),
+        )
+        await conn.commit()
+        return deleted_checkpoints.rowcount, deleted_writes.rowcount
+
+    async def _expire(
+        self,
+        conn: aiosqlite.Connection,
+        lock: asyncio.Lock,
+        lease: Callable[[str], AsyncContextManager[None]],
+        thread_id: str,
+        expire_before: float,
+    ) -> bool:
+        async with lease(thread_id), lock:
+            # A turn may have run since the thread was listed.
+            async with conn.execute(
+                "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?",
+                (thread_id,),
+            ) as cursor:
+                (latest_id,) = await cursor.fetchone()
+            if latest_id is None or checkpoint_time(latest_id) >= expire_before:
+                return False
+
+            await conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            await conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            await conn.commit()
+        self.logger.info(f"Expired idle thread {thread_id}")
+        return True
+
+    async def vacuum(
+        self, conn: aiosqlite.Connection, lock: Optional[asyncio.Lock] = None
+    ) -> int:
+        """Return free pages to the filesystem, at most `vacuum_pages` of them (0 for all)."""
+        lock = lock or asyncio.Lock()
+        async with lock:
+            async with conn.execute("PRAGMA auto_vacuum") as cursor:
+                (mode,) = await cursor.fetchone()
+            if mode != 2:
+                self.logger.warning(
+                    "Checkpoint database is not in incremental auto-vacuum mode; "
+                    "run the retention CLI with `compact --full-vacuum` once to convert it"
+                )
+                return 0
+
+            async with conn.execute("PRAGMA freelist_count") as cursor:
+                (free_pages,) = await cursor.fetchone()
+            pages = (
+                min(free_pages, self._vacuum_pages)
+                if self._vacuum_pages > 0
+                else free_pages
+            )
+            if pages:
+                # execute() steps the pragma once, which frees a single page; a script runs it to completion.
+                await conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            return pages
+
+
+class CheckpointCompactor:
+    """Periodic background compaction of the checkpoint database."""
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, retention: CheckpointRetention, interval: float):
+        self._retention = retention
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(
+        self,
+        shards: Sequence[Tuple[aiosqlite.Connection, asyncio.Lock]],
+        lease: Callable[[str], AsyncContextManager[None]],
+    ) -> None:
+        """Compact every shard, given as its connection and the lock of its checkpointer."""
+        if self._task is None and self._interval > 0:
+            self._task = asyncio.create_task(self._run(shards, lease))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, shards, lease) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            for index, (conn, lock) in enumerate(shards):
+                try:
+                    started = time.perf_counter()
+                    report = await self._retention.compact(conn, lock, lease)
+                    self.logger.info(
+                        f"Checkpoint compaction of shard {index} done in {time.perf_counter() - started:.1f}s: {report}"
+                    )
+                except Exception as e:
+                    self.logger.error(
+                        f"Checkpoint compaction of shard {index} failed: {e}"
+                    )
+
+
+async def enable_incremental_vacuum(conn: aiosqlite.Connection) -> None:
+    """Use incremental auto-vacuum; only takes effect before the first table is created."""
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+
+async def thread_footprints(conn: aiosqlite.Connection) -> List[ThreadFootprint]:
+    """Storage used by every thread, largest first."""
+    footprints: Dict[str, ThreadFootprint] = {}
+    async with conn.execute(
+        "SELECT thread_id, COUNT(*), SUM(LENGTH(checkpoint) + LENGTH(metadata)), MAX(checkpoint_id) "
+        "FROM checkpoints GROUP BY thread_id"
+    ) as cursor:
+        async for thread_id, count, size, latest_id in cursor:
+            footprints[thread_id] = ThreadFootprint(
+                thread_id, count, size or 0, 0, 0, checkpoint_time(latest_id)
+            )
+    async with conn.execute(
+        "SELECT thread_id, COUNT(*), SUM(LENGTH(value)) FROM writes GROUP BY thread_id"
+    ) as cursor:
+        async for thread_id, count, size in cursor:
+            if thread_id in footprints:
+                footprints[thread_id].writes = count
+                footprints[thread_id].write_bytes = size or 0
+    return sorted(footprints.values(), key=lambda f: f.total_bytes, reverse=True)
+
+
+async def database_size(conn: aiosqlite.Connection, db_path: str) -> Dict[str, int]:
+    """File and page usage of the database."""
+    sizes = {"file_bytes": 0, "wal_bytes": 0}
+    for key, path in (("file_bytes", db_path), ("wal_bytes", f"{db_path}-wal")):
+        if os.path.exists(path):
+            sizes[key] = os.path.getsize(path)
+    for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+        async with conn.execute(f"PRAGMA {pragma}") as cursor:
+            (sizes[pragma],) = await cursor.fetchone()
+    return sizes
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+async def report(db_paths: Sequence[str], top: int) -> None:
+    footprints: List[ThreadFootprint] = []
+    for db_path in db_paths:
+        async with aiosqlite.connect(db_path) as conn:
+            sizes = await database_size(conn, db_path)
+            shard_footprints = await thread_footprints(conn)
+        footprints.extend(shard_footprints)
+
+        print(f"Database: {db_path}")
+        print(
+            f"  file {format_bytes(sizes['file_bytes'])}, wal {format_bytes(sizes['wal_bytes'])}"
+        )
+        print(
+            f"  pages {sizes['page_count']} x {sizes['page_size']} B, free {sizes['freelist_count']}, "
+            f"auto_vacuum {sizes['auto_vacuum']}"
+        )
+        print(
+            f"  threads {len(shard_footprints)}, checkpoints {sum(f.checkpoints for f in shard_footprints)}"
+        )
+    footprints.sort(key=lambda f: f.total_bytes, reverse=True)
+
+    print()
+    print(f"{'thread':<32} {'checkpoints':>11} {'writes':>8} {'size':>10}  last active")
+    for footprint in footprints[:top]:
+        print(
+            f"{footprint.thread_id:<32} {footprint.checkpoints:>11} {footprint.writes:>8} "
+            f"{format_bytes(footprint.total_bytes):>10}  "
+            f"{datetime.fromtimestamp(footprint.last_active).isoformat(timespec='seconds')}"
+        )
+
+
+async def compact(
+    db_paths: Sequence[str], keep_latest: int, idle_ttl: float, full_vacuum: bool
+) -> None:
+    retention = CheckpointRetention(
+        keep_latest=keep_latest, idle_ttl=idle_ttl, vacuum_pages=0
+    )
+    for db_path in db_paths:
+        async with aiosqlite.connect(db_path) as conn:
+            await conn.execute("PRAGMA busy_timeout=30000")
+            result = await retention.compact(conn)
+            if full_vacuum:
+                # Switching to incremental auto-vacuum only takes effect through a full VACUUM.
+                await enable_incremental_vacuum(conn)
+                await conn.execute("VACUUM")
+        print(f"{db_path}: {result}")
+
+
+def main() -> None:
+    from anantha.modules.memory.short_term.sharding import shard_paths
+    from anantha.settings import settings
+
+    parser = argparse.ArgumentParser(
+        description="Short-term memory checkpoint retention"
+    )
+    parser.add_argument("command", choices=["report", "compact"])
+    parser.add_argument("--db", default=settings.SHORT_TERM_MEMORY_DB_PATH)
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=settings.CHECKPOINT_SHARDS,
+        help="Number of shards of --db",
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="Number of threads listed by the report"
+    )
+    parser.add_argument(
+        "--keep-latest", type=int, default=settings.CHECKPOINT_KEEP_LATEST
+    )
+    parser.add_argument(
+        "--idle-ttl", type=float, default=settings.CHECKPOINT_THREAD_TTL_SECONDS
+    )
+    parser.add_argument(
+        "--full-vacuum",
+        action="store_true",
+        help="Run a full VACUUM and enable incremental vacuum",
+    )
+    args = parser.parse_args()
+
+    db_paths = shard_paths(args.db, args.shards)
+    if args.command == "report":
+        asyncio.run(report(db_paths, args.top))
+    else:
+        asyncio.run(
+            compact(db_paths, args.keep_latest, args.idle_ttl, args.full_vacuum)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Compressed serializer for the short-term memory checkpoints.
+
+Checkpoints are encoded by langgraph's JsonPlusSerializer (msgpack for the graph state)
+and then compressed with zstd, using a dictionary trained on our own checkpoints so the
+repeated keys, message classes and character prompts cost almost nothing. Compressed
+payloads are stored under the serializer type with a `+zstd` suffix; anything else is
+passed to JsonPlusSerializer unchanged, so checkpoints written before compression was
+enabled stay readable.
+
+Dictionaries are kept in `CHECKPOINT_ZSTD_DICT_DIR`. The newest one compresses new
+checkpoints and every one of them can decompress, so old dictionaries must not be
+deleted while checkpoints written with them are retained. Train a dictionary with:
+
+    python -m anantha.modules.memory.short_term.serializer train --db /app/data/memory.db
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from anantha.core.exceptions import CheckpointSerializationError
+from anantha.modules.memory.short_term.sharding import shard_paths
+from anantha.settings import settings
+
+ZSTD_SUFFIX = "+zstd"
+DICTIONARY_EXTENSION = ".zdict"
+
+
+class CompressedSerializer(SerializerProtocol):
+    """zstd compression on top of another checkpoint serializer.
+
+    Args:
+        serde: The serializer producing the uncompressed payloads.
+        level: zstd compression level.
+        min_bytes: Payloads smaller than this are stored uncompressed.
+        dictionaries: Trained dictionaries, oldest first; the last one compresses.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        serde: Optional[SerializerProtocol] = None,
+        level: int = 3,
+        min_bytes: int = 256,
+        dictionaries: Sequence[zstandard.ZstdCompressionDict] = (),
+    ):
+        self._serde = serde or JsonPlusSerializer()
+        self._level = level
+        self._min_bytes = min_bytes
+        self._dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {
+            d.dict_id(): d for d in dictionaries
+        }
+        self._dictionary = dictionaries[-1] if dictionaries else None
+        # zstd contexts are not thread-safe, and the saver's sync methods run off the event loop.
+        self._local = threading.local()
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(
+                level=self._level, dict_data=self._dictionary
+            )
+        return compressor
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id and dict_id not in self._dictionaries:
+                raise CheckpointSerializationError(
+                    f"Checkpoint was compressed with zstd dictionary {dict_id}, which is not in "
+                    f"{settings.CHECKPOINT_ZSTD_DICT_DIR}"
+                )
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(
+                dict_data=self._dictionaries.get(dict_id)
+            )
+        return decompressor
+
+    def decompress(self, data: bytes) -> bytes:
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        return self._decompressor(dict_id).decompress(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self._serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self._serde.dumps_typed(obj)
+        if len(data) < self._min_bytes:
+            return type_, data
+        compressed = self._compressor().compress(data)
+        if len(compressed) >= len(data):
+            return type_, data
+        return f"{type_}{ZSTD_SUFFIX}", compressed
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(ZSTD_SUFFIX):
+            return self._serde.loads_typed(
+                (type_[: -len(ZSTD_SUFFIX)], self.decompress(payload))
+            )
+        return self._serde.loads_typed(data)
+
+
+def load_dictionaries(directory: str) -> List[zstandard.ZstdCompressionDict]:
+    """Trained dictionaries in a directory, oldest first."""
+    paths = sorted(
+        glob.glob(os.path.join(directory, f"*{DICTIONARY_EXTENSION}")),
+        key=os.path.getmtime,
+    )
+    dictionaries = []
+    for path in paths:
+        with open(path, "rb") as f:
+            dictionaries.append(zstandard.ZstdCompressionDict(f.read()))
+    return dictionaries
+
+
+@lru_cache(maxsize=1)
+def get_checkpoint_serializer() -> SerializerProtocol:
+    """Get the serializer of the short-term memory checkpointer."""
+
+    if not settings.CHECKPOINT_COMPRESSION:
+        return JsonPlusSerializer()
+    dictionaries = load_dictionaries(settings.CHECKPOINT_ZSTD_DICT_DIR)
+    if dictionaries:
+        CompressedSerializer.logger.info(
+            f"Compressing checkpoints with zstd dictionary {dictionaries[-1].dict_id()}"
+        )
+    return CompressedSerializer(
+        level=settings.CHECKPOINT_ZSTD_LEVEL,
+        min_bytes=settings.CHECKPOINT_COMPRESSION_MIN_BYTES,
+        dictionaries=dictionaries,
+    )
+
+
+def read_payloads(db_paths: Sequence[str], limit: int) -> List[bytes]:
+    """Uncompressed payloads of the most recent checkpoints and writes in the database shards."""
+    serde = CompressedSerializer(
+        dictionaries=load_dictionaries(settings.CHECKPOINT_ZSTD_DICT_DIR)
+    )
+    per_shard = max(1, limit // len(db_paths))
+    rows = []
+    for db_path in db_paths:
+        conn = sqlite3.connect(db_path)
+        try:
+            rows += conn.execute(
+                "SELECT type, checkpoint FROM checkpoints ORDER BY checkpoint_id DESC LIMIT ?",
+                (per_shard,),
+            ).fetchall()
+            rows += conn.execute(
+                "SELECT type, value FROM writes ORDER BY checkpoint_id DESC LIMIT ?",
+                (per_shard,),
+            ).fetchall()
+        finally:
+            conn.close()
+    return [
+        serde.decompress(data) if type_.endswith(ZSTD_SUFFIX) else data
+        for type_, data in rows
+        if data
+    ]
+
+
+def train_dictionary(samples: List[bytes], size: int) -> zstandard.ZstdCompressionDict:
+    """Train a zstd dictionary on serialized checkpoints."""
+    return zstandard.train_dictionary(size, samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Train a zstd dictionary for the checkpoint serializer"
+    )
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--db", default=settings.SHORT_TERM_MEMORY_DB_PATH)
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=settings.CHECKPOINT_SHARDS,
+        help="Number of shards of --db",
+    )
+    parser.add_argument("--out-dir", default=settings.CHECKPOINT_ZSTD_DICT_DIR)
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=5000,
+        help="Checkpoints and writes sampled from the database",
+    )
+    parser.add_argument(
+        "--size", type=int, default=112640, help="Dictionary size in bytes"
+    )
+    args = parser.parse_args()
+
+    samples = read_payloads(shard_paths(args.db, args.shards), args.samples)
+    try:
+        dictionary = train_dictionary(samples, args.size)
+    except zstandard.ZstdError as e:
+        raise SystemExit(
+            f"Training failed on {len(samples)} samples, record more conversations first: {e}"
+        )
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    path = os.path.join(args.out_dir, f"{dictionary.dict_id()}{DICTIONARY_EXTENSION}")
+    with open(path, "wb") as f:
+        f.write(dictionary.as_bytes())
+    print(
+        f"Trained dictionary {dictionary.dict_id()} on {len(samples)} samples, saved to {path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
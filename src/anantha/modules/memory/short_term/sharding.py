@@ -0,0 +1,290 @@
+"""
+Short-term memory checkpoints sharded across several SQLite files.
+
+SQLite allows one writer per file, so with a single database every thread's checkpoint
+write waits for every other. `ShardedAsyncSqliteSaver` routes each thread to one of
+`CHECKPOINT_SHARDS` files by a stable hash of its thread id, so writers of different
+threads mostly hit different files. Every shard runs in WAL mode with
+`synchronous=NORMAL`, memory-mapped reads and a busy timeout.
+
+With one shard the database stays at `SHORT_TERM_MEMORY_DB_PATH`; with K shards the files
+are named `<name>-<i>-of-<K>.db` next to it. Changing the shard count needs a migration,
+run while the application is stopped:
+
+    python -m anantha.modules.memory.short_term.sharding migrate --source /app/data/memory.db --shards 4
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from anantha.settings import settings
+
+
+def shard_paths(db_path: str, shard_count: int) -> List[str]:
+    """Files of a database split in `shard_count` shards."""
+    if shard_count <= 1:
+        return [db_path]
+    root, extension = os.path.splitext(db_path)
+    return [f"{root}-{i}-of-{shard_count}{extension}" for i in range(shard_count)]
+
+
+def shard_index(thread_id: str, shard_count: int) -> int:
+    """Shard of a thread; stable across processes and restarts, unlike `hash()`."""
+    digest = hashlib.sha256(str(thread_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+async def connect_shard(path: str) -> aiosqlite.Connection:
+    """Open a shard with the SQLite settings tuned for concurrent checkpoint writes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = await aiosqlite.connect(path)
+    # Only applies to a new database, before setup creates the tables; see retention.
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA synchronous={settings.CHECKPOINT_SQLITE_SYNCHRONOUS}")
+    await conn.execute(f"PRAGMA mmap_size={int(settings.CHECKPOINT_SQLITE_MMAP_SIZE)}")
+    await conn.execute(
+        f"PRAGMA busy_timeout={int(settings.CHECKPOINT_SQLITE_BUSY_TIMEOUT_MS)}"
+    )
+    return conn
+
+
+class ShardedAsyncSqliteSaver(BaseCheckpointSaver):
+    """Checkpointer routing every thread to one of several AsyncSqliteSaver shards."""
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        shards: Sequence[AsyncSqliteSaver],
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde)
+        self._shards = list(shards)
+
+    @classmethod
+    async def open(
+        cls, db_path: str, shard_count: int, serde: Optional[SerializerProtocol] = None
+    ) -> "ShardedAsyncSqliteSaver":
+        """Open (and create if needed) every shard of a database."""
+        shards = []
+        for path in shard_paths(db_path, shard_count):
+            shard = AsyncSqliteSaver(await connect_shard(path), serde=serde)
+            await shard.setup()
+            shards.append(shard)
+        cls.logger.info(f"Opened {len(shards)} checkpoint shard(s) at {db_path}")
+        return cls(shards, serde=serde)
+
+    @property
+    def shards(self) -> List[AsyncSqliteSaver]:
+        return self._shards
+
+    def shard(self, thread_id: str) -> AsyncSqliteSaver:
+        return self._shards[shard_index(thread_id, len(self._shards))]
+
+    def _route(self, config: RunnableConfig) -> AsyncSqliteSaver:
+        return self.shard(config["configurable"]["thread_id"])
+
+    def _routes(self, config: Optional[RunnableConfig]) -> List[AsyncSqliteSaver]:
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            return [self._route(config)]
+        return self._shards
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._route(config).aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for shard in self._routes(config):
+            async for checkpoint in shard.alist(
+                config, filter=filter, before=before, limit=limit
+            ):
+                yield checkpoint
+                if limit is not None:
+                    limit -= 1
+                    if limit <= 0:
+                        return
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._route(config).aput(
+            config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._route(config).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.shard(thread_id).adelete_thread(thread_id)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._route(config).get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        for shard in self._routes(config):
+            for checkpoint in shard.list(
+                config, filter=filter, before=before, limit=limit
+            ):
+                yield checkpoint
+                if limit is not None:
+                    limit -= 1
+                    if limit <= 0:
+                        return
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._route(config).put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._route(config).put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.shard(thread_id).delete_thread(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        return self._shards[0].get_next_version(current, channel)
+
+    async def close(self) -> None:
+        for shard in self._shards:
+            await shard.conn.close()
+
+
+def migrate(sources: Sequence[str], db_path: str, shard_count: int) -> Dict[str, int]:
+    """Copy the checkpoints and writes of `sources` into the shards of `db_path`.
+
+    Rows are copied as stored, whatever serializer wrote them. Existing rows in the
+    target shards are kept, so an interrupted migration can be rerun.
+    """
+    targets = shard_paths(db_path, shard_count)
+    if set(map(os.path.abspath, sources)) & set(map(os.path.abspath, targets)):
+        raise ValueError("The source databases must differ from the target shards")
+
+    connections = []
+    for path in targets:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        SqliteSaver(conn).setup()
+        connections.append(conn)
+
+    counts = {"threads": 0, "checkpoints": 0, "writes": 0}
+    try:
+        for source in sources:
+            source_conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            try:
+                thread_ids = [
+                    row[0]
+                    for row in source_conn.execute(
+                        "SELECT DISTINCT thread_id FROM checkpoints"
+                    )
+                ]
+                for thread_id in thread_ids:
+                    target = connections[shard_index(thread_id, shard_count)]
+                    checkpoints = source_conn.execute(
+                        "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                        "metadata FROM checkpoints WHERE thread_id = ?",
+                        (thread_id,),
+                    ).fetchall()
+                    writes = source_conn.execute(
+                        "SELECT thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value "
+                        "FROM writes WHERE thread_id = ?",
+                        (thread_id,),
+                    ).fetchall()
+                    with target:
+                        target.executemany(
+                            "INSERT OR IGNORE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            checkpoints,
+                        )
+                        target.executemany(
+                            "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            writes,
+                        )
+                    counts["threads"] += 1
+                    counts["checkpoints"] += len(checkpoints)
+                    counts["writes"] += len(writes)
+            finally:
+                source_conn.close()
+    finally:
+        for conn in connections:
+            conn.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Redistribute short-term memory checkpoints across shards"
+    )
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument(
+        "--source", nargs="+", required=True, help="Database file(s) to redistribute"
+    )
+    parser.add_argument(
+        "--db",
+        default=settings.SHORT_TERM_MEMORY_DB_PATH,
+        help="Path the shards are named after",
+    )
+    parser.add_argument("--shards", type=int, default=settings.CHECKPOINT_SHARDS)
+    args = parser.parse_args()
+
+    counts = migrate(args.source, args.db, args.shards)
+    print(
+        f"Copied {counts['threads']} threads ({counts['checkpoints']} checkpoints, {counts['writes']} writes) "
+        f"into {', '.join(shard_paths(args.db, args.shards))}"
+    )
+
+
+if __name__ == "__main__":
+    main()
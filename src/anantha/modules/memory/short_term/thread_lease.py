@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import aiosqlite
+
+from anantha.core.exceptions import ThreadLeaseTimeoutError
+
+
+class ThreadLeaseManager:
+    """Exclusive execution of graph runs per conversation thread.
+
+    A lease is an asyncio lock within the process plus a row in a SQLite lease table
+    shared by every process (e.g. several uvicorn workers). The row expires after
+    `ttl_seconds` unless renewed by its holder, so a lease left behind by a crashed
+    process is recovered automatically.
+    """
+
+    POLL_INTERVAL_SECONDS = 0.1
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, db_path: str, ttl_seconds: float, acquire_timeout: float):
+        self._db_path = db_path
+        self._ttl = ttl_seconds
+        self._acquire_timeout = acquire_timeout
+        self._owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+
+    async def start(self) -> None:
+        """Open the SQLite lease table."""
+        if self._conn is not None:
+            return
+        os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+        self._conn = await aiosqlite.connect(self._db_path)
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("PRAGMA busy_timeout=5000")
+        await self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_leases ("
+            "thread_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        await self._conn.commit()
+
+    async def close(self) -> None:
+        """Close the SQLite connection."""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    @asynccontextmanager
+    async def lease(self, thread_id: str) -> AsyncIterator[None]:
+        """Hold the exclusive lease of a thread for the duration of the block.
+
+        Raises:
+            ThreadLeaseTimeoutError: If the lease is not acquired within `acquire_timeout` seconds.
+        """
+        thread_id = str(thread_id)
+        deadline = time.monotonic() + self._acquire_timeout
+
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+        self._waiters[thread_id] = self._waiters.get(thread_id, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(
+                    lock.acquire(), timeout=max(0.0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                raise ThreadLeaseTimeoutError(
+                    f"Timed out waiting for thread {thread_id}"
+                ) from None
+
+            try:
+                owner = f"{self._owner_prefix}:{uuid.uuid4().hex}"
+                await self._acquire_row(thread_id, owner, deadline)
+                renewal = (
+                    asyncio.create_task(self._renew(thread_id, owner))
+                    if self._conn
+                    else None
+                )
+                try:
+                    yield
+                finally:
+                    if renewal is not None:
+                        renewal.cancel()
+                    await self._release_row(thread_id, owner)
+            finally:
+                lock.release()
+        finally:
+            self._waiters[thread_id] -= 1
+            if not self._waiters[thread_id]:
+                del self._waiters[thread_id]
+                del self._locks[thread_id]
+
+    async def _acquire_row(self, thread_id: str, owner: str, deadline: float) -> None:
+        if self._conn is None:
+            return
+
+        while True:
+            now = time.time()
+            # Take the row if it is free or its lease expired (stale lease recovery).
+            cursor = await self._conn.execute(
+                "INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE thread_leases.expires_at < ?",
+                (thread_id, owner, now + self._ttl, now),
+            )
+            await self._conn.commit()
+            if cursor.rowcount == 1:
+                return
+
+            if time.monotonic() >= deadline:
+                raise ThreadLeaseTimeoutError(
+                    f"Thread {thread_id} is leased by another process"
+                )
+            await asyncio.sleep(self.POLL_INTERVAL_SECONDS)
+
+    async def _renew(self, thread_id: str, owner: str) -> None:
+        while True:
+            await asyncio.sleep(self._ttl / 3)
+            try:
+                cursor = await self._conn.execute(
+                    "UPDATE thread_leases SET expires_at = ? WHERE thread_id = ? AND owner = ?",
+                    (time.time() + self._ttl, thread_id, owner),
+                )
+                await self._conn.commit()
+                if cursor.rowcount == 0:
+                    self.logger.warning(f"Lost the lease on thread {thread_id}")
+                    return
+            except Exception as e:
+                self.logger.warning(
+                    f"Failed to renew the lease on thread {thread_id}: {e}"
+                )
+
+    async def _release_row(self, thread_id: str, owner: str) -> None:
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?",
+                (thread_id, owner),
+            )
+            await self._conn.commit()
+        except Exception as e:
+            # The row expires on its own after the TTL.
+            self.logger.warning(
+                f"Failed to release the lease on thread {thread_id}: {e}"
+            )
@@ -1,11 +1,12 @@
-
+import asyncio
 import os
-import tempfile
-from typing import Optional
+from typing import BinaryIO, Optional, Union
+
+from groq import Groq
 
 from anantha.core.exceptions import SpeechToTextError
+from anantha.core.metrics import track_stage
 from anantha.settings import settings
-from groq import Groq
 
 
 class SpeechToText:
@@ -19,7 +20,9 @@ class SpeechToText:
         """Validate that all required environment variables are set."""
         missing_vars = [var for var in cls.REQUIRED_ENV_VARS if not os.getenv(var)]
         if missing_vars:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing_vars)}"
+            )
 
     @classmethod
     def client(cls) -> Groq:
@@ -30,11 +33,14 @@ class SpeechToText:
         return cls._client
 
     @classmethod
-    async def transcribe(cls, audio_data: bytes) -> str:
+    async def transcribe(
+        cls, audio_data: Union[bytes, BinaryIO], filename: str = "audio.wav"
+    ) -> str:
         """Convert speech to text using Groq's Whisper model.
 
         Args:
-            audio_data: Binary audio data
+            audio_data: Binary audio data, or a readable binary file positioned at the start
+            filename: Name sent with the upload, used to hint the audio format
 
         Returns:
             str: Transcribed text
@@ -43,30 +49,34 @@ class SpeechToText:
             ValueError: If the audio file is empty or invalid
             RuntimeError: If the transcription fails
         """
-        if not audio_data:
+        if isinstance(audio_data, bytes):
+            is_empty = not audio_data
+        else:
+            position = audio_data.tell()
+            is_empty = audio_data.seek(0, os.SEEK_END) == position
+            audio_data.seek(position)
+
+        if is_empty:
             raise ValueError("Audio data cannot be empty")
 
-        try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
-
+        with track_stage("speech_to_text"):
             try:
-                with open(temp_file_path, "rb") as audio_file:
-                    transcription = cls.client().audio.transcriptions.create(
-                        file=audio_file,
-                        model="whisper-large-v3-turbo",
-                        language="en",
-                        response_format="text",
-                    )
+                # The audio is handed straight to the client, without an intermediate temp file.
+                # The client is synchronous, so it runs off the event loop.
+                transcription = await asyncio.to_thread(
+                    cls.client().audio.transcriptions.create,
+                    file=(filename, audio_data),
+                    model=settings.STT_MODEL_NAME,
+                    language="en",
+                    response_format="text",
+                )
 
                 if not transcription:
                     raise SpeechToTextError("Transcription result is empty")
 
                 return transcription
 
-            finally:
-                os.unlink(temp_file_path)
-
-        except Exception as e:
-            raise SpeechToTextError(f"Speech-to-text conversion failed: {str(e)}") from e
+            except Exception as e:
+                raise SpeechToTextError(
+                    f"Speech-to-text conversion failed: {str(e)}"
+                ) from e
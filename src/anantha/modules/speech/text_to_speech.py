@@ -1,10 +1,15 @@
+import asyncio
+import os
+import re
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, List, Optional, Sequence
 
-import os 
-from typing import Optional
+from elevenlabs import ElevenLabs, Voice, VoiceSettings
 
 from anantha.core.exceptions import TextToSpeechError
+from anantha.core.metrics import AUDIO_FIRST_BYTE, track_stage
 from anantha.settings import settings
-from elevenlabs import ElevenLabs, Voice, VoiceSettings
+
 
 class TextToSpeech:
     """A class to handle text-to-speech conversion using ElevenLabs."""
@@ -17,8 +22,10 @@ class TextToSpeech:
         """Validate that all required environment variables are set."""
         missing_vars = [var for var in cls.REQUIRED_ENV_VARS if not os.getenv(var)]
         if missing_vars:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
-        
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing_vars)}"
+            )
+
     @classmethod
     def client(cls) -> ElevenLabs:
         """Get or create ElevenLabs client instance using singleton pattern."""
@@ -26,7 +33,7 @@ class TextToSpeech:
             cls._validate_env_vars()
             cls._client = ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
         return cls._client
-    
+
     @classmethod
     async def synthesize(cls, text: str) -> bytes:
         """Convert text to speech using ElevenLabs.
@@ -47,21 +54,157 @@ class TextToSpeech:
         if len(text) > 5000:
             raise ValueError("Input text exceeds maximum length of 5000 characters")
 
+        with track_stage("text_to_speech", "audio"):
+            try:
+                # The ElevenLabs client is synchronous; keep it off the event loop.
+                audio_bytes = await asyncio.to_thread(cls._generate, text)
+                if not audio_bytes:
+                    raise TextToSpeechError("Generated audio is empty")
+
+                return audio_bytes
+
+            except Exception as e:
+                raise TextToSpeechError(
+                    f"Text-to-speech conversion failed: {str(e)}"
+                ) from e
+
+    @classmethod
+    def _generate(cls, text: str) -> bytes:
+        audio_generator = cls.client().generate(
+            text=text,
+            voice=Voice(
+                voice_id=settings.ELEVENLABS_VOICE_ID,
+                settings=VoiceSettings(stability=0.5, similarity_boost=0.5),
+            ),
+            model=settings.TTS_MODEL_NAME,
+        )
+        return b"".join(audio_generator)
+
+    @classmethod
+    async def synthesize_stream(
+        cls,
+        chunks: AsyncIterable[str],
+        concurrency: int,
+        min_chars: int,
+        clean: Callable[[str], str] = str.strip,
+    ) -> bytes:
+        """Synthesize text while it is still being generated.
+
+        The text is cut at sentence boundaries and every sentence is synthesized as soon
+        as it is complete, with at most `concurrency` requests in flight. The MP3 segments
+        are stitched in sentence order into one stream (see `stitch_mp3`).
+
+        Args:
+            chunks: The text as it is generated, e.g. the tokens of an LLM stream.
+            concurrency: Maximum number of sentences synthesized at once.
+            min_chars: Minimum sentence length; shorter sentences are merged with the next one.
+            clean: Applied to every sentence before synthesis.
+
+        Returns:
+            bytes: Audio data
+
+        Raises:
+            TextToSpeechError: If no text was generated or a sentence fails to synthesize
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        started = time.perf_counter()
+        tasks: List[asyncio.Task] = []
+
+        async def speak(sentence: str) -> bytes:
+            async with semaphore:
+                return await cls.synthesize(sentence)
+
+        def first_audio(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is None:
+                AUDIO_FIRST_BYTE.labels(mode="streaming").observe(
+                    time.perf_counter() - started
+                )
+
         try:
-            audio_generator = cls.client().generate(
-                text=text,
-                voice=Voice(
-                    voice_id=settings.ELEVENLABS_VOICE_ID,
-                    settings=VoiceSettings(stability=0.5, similarity_boost=0.5),
-                ),
-                model=settings.TTS_MODEL_NAME,
-            )
+            async for sentence in split_sentences(chunks, min_chars, clean):
+                tasks.append(asyncio.create_task(speak(sentence)))
+                if len(tasks) == 1:
+                    tasks[0].add_done_callback(first_audio)
+
+            if not tasks:
+                raise TextToSpeechError("No text to synthesize")
+
+            segments = [await task for task in tasks]
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return stitch_mp3(segments)
+
+
+def _strip_id3v2(segment: bytes) -> bytes:
+    """Drop the ID3v2 tag at the start of an MP3 segment, if any."""
+    if segment[:3] != b"ID3" or len(segment) < 10:
+        return segment
+    # The tag size is a 28-bit syncsafe integer, excluding the header and the footer.
+    size = (segment[6] << 21) | (segment[7] << 14) | (segment[8] << 7) | segment[9]
+    footer = 10 if segment[5] & 0x10 else 0
+    return segment[10 + size + footer :]
 
-            audio_bytes = b"".join(audio_generator)
-            if not audio_bytes:
-                raise TextToSpeechError("Generated audio is empty")
 
-            return audio_bytes
+def _strip_id3v1(segment: bytes) -> bytes:
+    """Drop the ID3v1 tag at the end of an MP3 segment, if any."""
+    if len(segment) >= 128 and segment[-128:-125] == b"TAG":
+        return segment[:-128]
+    return segment
+
+
+def stitch_mp3(segments: Sequence[bytes]) -> bytes:
+    """Concatenate MP3 segments into a single stream of frames.
+
+    MPEG audio frames are self-contained, so segments can be joined as they are, except
+    for ID3 tags: a tag in the middle of the stream is not a frame, and some players stop
+    or skip there. Only the leading tag of the first segment and the trailing tag of the
+    last one are kept.
+    """
+    parts = []
+    for index, segment in enumerate(segments):
+        if index > 0:
+            segment = _strip_id3v2(segment)
+        if index < len(segments) - 1:
+            segment = _strip_id3v1(segment)
+        parts.append(segment)
+    return b"".join(parts)
+
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+
+
+async def split_sentences(
+    chunks: AsyncIterable[str],
+    min_chars: int,
+    clean: Callable[[str], str] = str.strip,
+) -> AsyncIterator[str]:
+    """Cut a stream of text chunks into sentences of at least `min_chars` characters.
+
+    A boundary is only taken outside *action* spans, so a span is never split across
+    two sentences.
+    """
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            boundary = next(
+                (
+                    m
+                    for m in SENTENCE_END.finditer(buffer)
+                    if m.start() >= min_chars and buffer[: m.end()].count("*") % 2 == 0
+                ),
+                None,
+            )
+            if boundary is None:
+                break
+            sentence, buffer = clean(buffer[: boundary.end()]), buffer[boundary.end() :]
+            if sentence:
+                yield sentence
 
-        except Exception as e:
-            raise TextToSpeechError(f"Text-to-speech conversion failed: {str(e)}") from e
\ No newline at end of file
+    sentence = clean(buffer)
+    if sentence:
+        yield sentence
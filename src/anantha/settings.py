@@ -1,20 +1,23 @@
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+
 class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env", extra="ignore", env_file_encoding="utf-8")
+    model_config = SettingsConfigDict(
+        env_file=".env", extra="ignore", env_file_encoding="utf-8"
+    )
 
     GROQ_API_KEY: str
     TOGETHER_API_KEY: str
     ELEVENLABS_API_KEY: str
     ELEVENLABS_VOICE_ID: str
-    
+
     QDRANT_API_KEY: str | None
     QDRANT_URL: str | None
     QDRANT_PORT: str = "6333"
     QDRANT_HOST: str | None = None
 
-
     TEXT_MODEL_NAME: str = "llama-3.3-70b-versatile"
     SMALL_TEXT_MODEL_NAME: str = "gemma2-9b-it"
     STT_MODEL_NAME: str = "whisper-large-v3-turbo"
@@ -23,14 +26,133 @@ class Settings(BaseSettings):
     ITT_MODEL_NAME: str = "meta-llama/llama-4-scout-17b-16e-instruct"
     # "llama-3.2-90b-vision-preview"
 
+    LLM_MAX_RETRIES: int = 2
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    LLM_HTTP_TIMEOUT: float = 60.0
+    LLM_HTTP_CONNECT_TIMEOUT: float = 5.0
+
+    # Synthesize voice replies sentence by sentence while the reply is generated.
+    TTS_STREAMING: bool = False
+    TTS_STREAM_CONCURRENCY: int = 3
+    TTS_STREAM_MIN_CHARS: int = 40
+
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
     GEMINI_EMBEDDING_MODEL: str = "gemini-embedding-exp-03-07"
 
     MEMORY_TOP_K: int = 3
     ROUTER_MESSAGES_TO_ANALYZE: int = 3
-    TOTAL_MESSAGES_SUMMARY_TRIGGER: int = 20
-    TOTAL_MESSAGES_AFTER_SUMMARY: int = 5
+    # "separate" routes and replies in two LLM calls, "combined" in a single structured call.
+    ROUTER_MODE: Literal["separate", "combined"] = "separate"
+    ROUTER_FAST_ENABLED: bool = True
+    ROUTER_FAST_CONFIDENCE: float = 0.9
+    ROUTER_MODEL_PATH: str = "/app/data/router_model.joblib"
+    # The log holds user messages: keep it off unless collecting training data for the fast router.
+    ROUTER_DECISION_LOG_ENABLED: bool = False
+    ROUTER_DECISION_LOG_PATH: str = "/app/data/router_decisions.jsonl"
+    ROUTER_DECISION_LOG_MAX_BYTES: int = (
+        20 * 1024 * 1024
+    )  # Rotated to <path>.1 past this size
+
+    # Token budgets of the prompt; counts use a tiktoken encoding as an approximation.
+    TOKENIZER_ENCODING: str = "cl100k_base"
+    TOKEN_COUNT_CACHE_SIZE: int = 20000
+    CONTEXT_TOKEN_BUDGET: int = 8000
+    RESPONSE_TOKEN_RESERVE: int = 512
+    SUMMARY_TOKEN_BUDGET: int = 800
+    MEMORY_CONTEXT_TOKEN_BUDGET: int = 400
+    SUMMARY_TRIGGER_TOKENS: int = 4000
+    TOKENS_AFTER_SUMMARY: int = 1000
+
+    # "inline" summarizes at the end of the turn, "deferred" in a background task after the reply.
+    SUMMARY_MODE: Literal["inline", "deferred"] = "inline"
+    SUMMARY_USE_SMALL_MODEL: bool = False
+    SUMMARY_CONCURRENCY: int = 2
+    SUMMARY_MAX_PENDING: int = 256
+    SUMMARY_ERROR_BUDGET: int = 5
+    SUMMARY_ERROR_WINDOW_SECONDS: float = 60.0
+
+    # "inline" extracts long-term memories before routing, "deferred" in a background task after the reply.
+    MEMORY_EXTRACTION_MODE: Literal["inline", "deferred"] = "inline"
+    MEMORY_EXTRACTION_CONCURRENCY: int = 4
+    MEMORY_EXTRACTION_MAX_PENDING: int = 256
+    MEMORY_EXTRACTION_ERROR_BUDGET: int = 10
+    MEMORY_EXTRACTION_ERROR_WINDOW_SECONDS: float = 60.0
+    BACKGROUND_DRAIN_TIMEOUT: float = 10.0
+
+    GRAPH_MAX_CONCURRENT_RUNS: int = 6
+    GRAPH_MAX_WAITING_RUNS: int = 16
+    GRAPH_DEGRADE_THRESHOLD: int = (
+        6  # Clamped to WHATSAPP_WORKER_CONCURRENCY for the WhatsApp interface
+    )
+    GRAPH_ADMISSION_TIMEOUT_SECONDS: float = 60.0
+    # Backlog of the WhatsApp work queue; 0 disables a signal.
+    GRAPH_DEGRADE_QUEUE_DEPTH: int = 40
+    GRAPH_DEGRADE_QUEUE_WAIT_SECONDS: float = 15.0
+    GRAPH_SHED_QUEUE_WAIT_SECONDS: float = 120.0
+    OVERLOAD_REPLY: str = "Ugh, my phone is blowing up right now! Give me a few minutes and I'll get back to you."
+
+    BLOB_STORE_PATH: str = "/app/data/blobs"
+    BLOB_STORE_MAX_BYTES: int = 512 * 1024 * 1024
 
     SHORT_TERM_MEMORY_DB_PATH: str = "/app/data/memory.db"
+    CHECKPOINT_SHARDS: int = 1  # Changing it requires `python -m anantha.modules.memory.short_term.sharding migrate`
+    CHECKPOINT_SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    CHECKPOINT_SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    CHECKPOINT_SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    THREAD_LEASE_DB_PATH: str = "/app/data/thread_leases.db"
+    THREAD_LEASE_TTL_SECONDS: float = 60.0
+    THREAD_LEASE_TIMEOUT_SECONDS: float = 120.0
+    WHATSAPP_LEASE_MAX_RETRIES: int = (
+        2  # Requeues of a turn whose thread lease timed out
+    )
+
+    CHECKPOINT_KEEP_LATEST: int = 10
+    CHECKPOINT_THREAD_TTL_SECONDS: float = (
+        30 * 24 * 3600
+    )  # 0 keeps idle threads forever
+    CHECKPOINT_COMPACTION_INTERVAL_SECONDS: float = (
+        3600.0  # 0 disables background compaction
+    )
+    CHECKPOINT_VACUUM_PAGES: int = 2000  # Pages returned per compaction, 0 for all
+    CHECKPOINT_COMPRESSION: bool = True
+    CHECKPOINT_ZSTD_LEVEL: int = 3
+    CHECKPOINT_COMPRESSION_MIN_BYTES: int = 256
+    CHECKPOINT_ZSTD_DICT_DIR: str = "/app/data/zstd_dicts"
+
+    WHATSAPP_STATE_DB_PATH: str = "/app/data/whatsapp_state.db"
+    WHATSAPP_DEDUP_TTL_SECONDS: int = 86400
+    WHATSAPP_DEDUP_CACHE_SIZE: int = 10000
+    WHATSAPP_MEDIA_CACHE_TTL_SECONDS: int = 29 * 24 * 3600
+    WHATSAPP_MEDIA_CACHE_MAX_ENTRIES: int = 5000
+
+    WHATSAPP_GRAPH_API_URL: str = "https://graph.facebook.com/v21.0"
+    WHATSAPP_HTTP_MAX_CONNECTIONS: int = 100
+    WHATSAPP_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    WHATSAPP_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    WHATSAPP_HTTP_TIMEOUT: float = 30.0
+    WHATSAPP_HTTP_CONNECT_TIMEOUT: float = 5.0
+    WHATSAPP_MEDIA_MAX_BYTES: int = 16 * 1024 * 1024
+    WHATSAPP_MEDIA_TOO_LARGE_REPLY: str = (
+        "Oops, that file is too big for me to open! Could you send a smaller one?"
+    )
+    WHATSAPP_MEDIA_SPOOL_THRESHOLD: int = 1024 * 1024
+
+    WHATSAPP_SEND_RATE_PER_SECOND: float = 80.0
+    WHATSAPP_SEND_BURST: int = 80
+    WHATSAPP_RECIPIENT_RATE_PER_SECOND: float = 1 / 6
+    WHATSAPP_RECIPIENT_BURST: int = 10
+    WHATSAPP_SEND_MAX_RETRIES: int = 4
+    WHATSAPP_SEND_BACKOFF_BASE: float = 0.5
+    WHATSAPP_SEND_BACKOFF_MAX: float = 30.0
+
+    WHATSAPP_WORKER_CONCURRENCY: int = 8
+    WHATSAPP_QUEUE_MAX_SIZE: int = 1000
+    WHATSAPP_QUEUE_DRAIN_TIMEOUT: float = 10.0
+    WHATSAPP_COALESCE_WINDOW_MS: int = 800
+    WHATSAPP_COALESCE_MAX_WAIT_MS: int = 3000
+    WHATSAPP_COALESCE_MAX_BATCH: int = 10
+
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from anantha.core.exceptions import GraphOverloadedError
+from anantha.graph.admission import AdmissionController
+
+
+def _controller(**overrides):
+    options = dict(
+        max_concurrent=2, max_waiting=2, degrade_threshold=2, wait_timeout=1.0
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+async def _hold(controller, release, degraded, **admit_args):
+    async with controller.admit(**admit_args) as is_degraded:
+        degraded.append(is_degraded)
+        await release.wait()
+
+
+def test_turns_degrade_once_the_load_reaches_the_threshold():
+    async def run():
+        controller = _controller(max_concurrent=4, degrade_threshold=2)
+        release = asyncio.Event()
+        degraded = []
+        tasks = [
+            asyncio.create_task(_hold(controller, release, degraded)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        stats = controller.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return degraded, stats, controller.stats()
+
+    degraded, busy, idle = asyncio.run(run())
+
+    assert degraded == [False, False, True]
+    assert busy == {"running": 3, "waiting": 0}
+    assert idle == {"running": 0, "waiting": 0}
+
+
+def test_a_deep_or_old_backlog_degrades_the_turn():
+    async def run():
+        controller = _controller(
+            degrade_threshold=10, degrade_queue_depth=5, degrade_queue_wait=3.0
+        )
+        results = []
+        for args in ({}, {"queue_depth": 5}, {"queue_wait": 3.0}):
+            async with controller.admit(**args) as degraded:
+                results.append(degraded)
+        return results
+
+    assert asyncio.run(run()) == [False, True, True]
+
+
+def test_turns_are_shed_when_the_waiting_queue_is_full():
+    async def run():
+        controller = _controller(max_concurrent=1, max_waiting=1)
+        release = asyncio.Event()
+        degraded = []
+        tasks = [
+            asyncio.create_task(_hold(controller, release, degraded)) for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        with pytest.raises(GraphOverloadedError):
+            async with controller.admit():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return degraded
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_turns_are_shed_after_the_wait_timeout():
+    async def run():
+        controller = _controller(max_concurrent=1, wait_timeout=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, []))
+        await asyncio.sleep(0.01)
+        with pytest.raises(GraphOverloadedError):
+            async with controller.admit():
+                pass
+        stats = controller.stats()
+        release.set()
+        await holder
+        # The shed turn did not keep a permit: a new turn is admitted at once.
+        async with controller.admit():
+            pass
+        return stats
+
+    assert asyncio.run(run()) == {"running": 1, "waiting": 0}
+
+
+def test_turns_are_shed_when_the_backlog_waited_too_long():
+    async def run():
+        controller = _controller(shed_queue_wait=10.0)
+        with pytest.raises(GraphOverloadedError):
+            async with controller.admit(queue_wait=10.0):
+                pass
+        async with controller.admit(queue_wait=9.0):
+            pass
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiters_do_not_leak_permits():
+    async def run():
+        controller = _controller(max_concurrent=1, max_waiting=10)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, []))
+        await asyncio.sleep(0.01)
+        waiters = [
+            asyncio.create_task(_hold(controller, release, [])) for _ in range(5)
+        ]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        release.set()
+        await holder
+        return controller.stats(), controller._semaphore._value
+
+    stats, permits = asyncio.run(run())
+
+    assert stats == {"running": 0, "waiting": 0}
+    assert permits == 1
+
+
+def test_limit_load_clamps_an_unreachable_degrade_threshold():
+    controller = _controller(max_concurrent=8, max_waiting=8, degrade_threshold=20)
+    assert controller._degrade_threshold == 15
+
+    controller.limit_load(4)
+    assert controller._degrade_threshold == 3
+
+    controller.limit_load(100)
+    assert controller._degrade_threshold == 3
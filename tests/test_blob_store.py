@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+import pytest
+
+from anantha.core.blob_store import BlobStore
+from anantha.core.exceptions import BlobNotFoundError
+
+
+def test_blobs_are_stored_once_per_content(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=1024)
+
+    async def run():
+        first = await store.put(b"audio", ".mp3")
+        second = await store.put(b"audio", ".mp3")
+        return first, second, await store.get(first)
+
+    first, second, data = asyncio.run(run())
+
+    assert first == second
+    assert first.endswith(".mp3")
+    assert data == b"audio"
+    assert store.stats() == {"blobs": 1, "bytes": 5, "max_bytes": 1024}
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=300)
+
+    async def run():
+        a = await store.put(b"a" * 100)
+        b = await store.put(b"b" * 100)
+        c = await store.put(b"c" * 100)
+        # Reading `a` makes `b` the least recently used blob.
+        await store.get(a)
+        d = await store.put(b"d" * 100)
+        return a, b, c, d
+
+    a, b, c, d = asyncio.run(run())
+
+    assert not os.path.exists(store.path(b))
+    assert all(os.path.exists(store.path(ref)) for ref in (a, c, d))
+    assert store.stats()["bytes"] == 300
+    with pytest.raises(BlobNotFoundError):
+        asyncio.run(store.get(b))
+
+
+def test_a_blob_larger_than_the_store_evicts_everything_else(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=100)
+
+    async def run():
+        small = await store.put(b"s" * 50)
+        large = await store.put(b"l" * 200)
+        return small, large, await store.get(large)
+
+    small, large, data = asyncio.run(run())
+
+    assert data == b"l" * 200
+    assert not os.path.exists(store.path(small))
+    assert store.stats()["blobs"] == 1
+
+
+def test_the_index_is_rebuilt_from_disk_in_mtime_order(tmp_path):
+    async def run():
+        store = BlobStore(str(tmp_path), max_bytes=300)
+        refs = [await store.put(bytes([i]) * 100) for i in range(3)]
+        for age, ref in zip((30, 10, 20), refs):
+            os.utime(store.path(ref), (1_000_000 - age, 1_000_000 - age))
+
+        restarted = BlobStore(str(tmp_path), max_bytes=300)
+        await restarted.put(b"x" * 100)
+        return refs, restarted
+
+    refs, restarted = asyncio.run(run())
+
+    # The oldest blob on disk is the first one evicted after a restart.
+    assert not os.path.exists(restarted.path(refs[0]))
+    assert os.path.exists(restarted.path(refs[1]))
+    assert restarted.stats()["blobs"] == 3
+
+
+def test_invalid_references_are_rejected(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=100)
+
+    with pytest.raises(BlobNotFoundError):
+        store.path("../../etc/passwd")
+    with pytest.raises(BlobNotFoundError):
+        asyncio.run(store.get("0" * 64))
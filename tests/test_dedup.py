@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+from anantha.interfaces.whatsapp import dedup
+from anantha.interfaces.whatsapp.dedup import MessageDeduplicator
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _use_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_duplicate_ids_are_rejected_within_the_ttl(tmp_path, monkeypatch):
+    clock = _use_clock(monkeypatch)
+
+    async def run():
+        deduplicator = MessageDeduplicator(str(tmp_path / "state.db"), 60, 100)
+        await deduplicator.start()
+        results = [await deduplicator.claim("wamid.1")]
+        clock.now += 59
+        results.append(await deduplicator.claim("wamid.1"))
+        clock.now += 2
+        results.append(await deduplicator.claim("wamid.1"))
+        await deduplicator.close()
+        return results
+
+    assert asyncio.run(run()) == [True, False, True]
+
+
+def test_ids_evicted_from_the_lru_are_still_found_in_sqlite(tmp_path, monkeypatch):
+    _use_clock(monkeypatch)
+
+    async def run():
+        deduplicator = MessageDeduplicator(str(tmp_path / "state.db"), 60, 2)
+        await deduplicator.start()
+        for message_id in ("wamid.1", "wamid.2", "wamid.3"):
+            await deduplicator.claim(message_id)
+        cached = list(deduplicator._cache)
+        duplicate = await deduplicator.claim("wamid.1")
+        await deduplicator.close()
+        return cached, duplicate
+
+    cached, duplicate = asyncio.run(run())
+
+    assert cached == ["wamid.2", "wamid.3"]
+    assert duplicate is False
+
+
+def test_the_lru_alone_forgets_the_least_recently_seen_id(tmp_path, monkeypatch):
+    _use_clock(monkeypatch)
+
+    async def run():
+        # Not started: only the in-memory cache is used.
+        deduplicator = MessageDeduplicator(str(tmp_path / "state.db"), 60, 2)
+        results = []
+        for message_id in ("wamid.1", "wamid.2", "wamid.1", "wamid.3"):
+            results.append(await deduplicator.claim(message_id))
+        # wamid.1 was seen again after wamid.2, so wamid.2 is the one evicted.
+        results.append(await deduplicator.claim("wamid.1"))
+        results.append(await deduplicator.claim("wamid.2"))
+        return results
+
+    assert asyncio.run(run()) == [True, True, False, True, False, True]
+
+
+def test_released_ids_are_processed_again(tmp_path, monkeypatch):
+    _use_clock(monkeypatch)
+
+    async def run():
+        deduplicator = MessageDeduplicator(str(tmp_path / "state.db"), 60, 100)
+        await deduplicator.start()
+        await deduplicator.claim("wamid.1")
+        await deduplicator.release("wamid.1")
+        claimed = await deduplicator.claim("wamid.1")
+        await deduplicator.close()
+        return claimed
+
+    assert asyncio.run(run()) is True
+
+
+def test_claims_survive_a_restart(tmp_path, monkeypatch):
+    clock = _use_clock(monkeypatch)
+    db_path = str(tmp_path / "state.db")
+
+    async def run():
+        first = MessageDeduplicator(db_path, 60, 100)
+        await first.start()
+        await first.claim("wamid.1")
+        await first.claim("wamid.2")
+        await first.close()
+
+        clock.now += 30
+        second = MessageDeduplicator(db_path, 60, 100)
+        await second.start()
+        duplicate = await second.claim("wamid.1")
+        clock.now += 31
+        expired = await second.claim("wamid.2")
+        await second.close()
+        return duplicate, expired
+
+    assert asyncio.run(run()) == (False, True)
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+
+from anantha.interfaces.whatsapp.outbound import OutboundScheduler, TokenBucket
+
+
+class FakeGraphAPI:
+    """Send callable replaying scripted responses and recording when each call happened."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def __call__(self, json_data):
+        self.calls.append((time.monotonic(), json_data))
+        response = self.responses.pop(0) if self.responses else httpx.Response(200)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _scheduler(send, **overrides):
+    options = dict(
+        rate=1000.0,
+        burst=1000,
+        recipient_rate=1000.0,
+        recipient_burst=1000,
+        max_retries=3,
+        backoff_base=0.001,
+        backoff_max=0.001,
+    )
+    options.update(overrides)
+    return OutboundScheduler(send, **options)
+
+
+def test_token_bucket_refills_up_to_its_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    bucket.tokens = 0
+    start = bucket.updated_at
+
+    assert bucket.wait_time() == 0.5
+    bucket.refill(start + 1.0)
+    assert bucket.tokens == 2.0
+    assert bucket.wait_time() == 0.0
+    bucket.refill(start + 10.0)
+    assert bucket.tokens == 3.0
+
+
+def test_sends_to_one_recipient_are_paced_by_its_bucket():
+    send = FakeGraphAPI()
+    scheduler = _scheduler(send, recipient_rate=10.0, recipient_burst=1)
+
+    async def run():
+        await asyncio.gather(
+            scheduler.send("alice", {"n": 1}),
+            scheduler.send("alice", {"n": 2}),
+            scheduler.send("bob", {"n": 3}),
+        )
+
+    asyncio.run(run())
+
+    sent_at = {data["n"]: at for at, data in send.calls}
+    assert sent_at[2] - sent_at[1] >= 0.09
+    assert sent_at[3] - sent_at[1] < 0.05
+    assert scheduler.stats()["sent"] == 3
+    assert scheduler.stats()["recipients"] == 2
+
+
+def test_throttled_and_server_errors_are_retried():
+    send = FakeGraphAPI(
+        httpx.Response(429),
+        httpx.Response(503),
+        httpx.Response(400, json={"error": {"code": 131056}}),
+        httpx.Response(200),
+    )
+    scheduler = _scheduler(send)
+
+    response = asyncio.run(scheduler.send("alice", {}))
+
+    assert response.status_code == 200
+    assert len(send.calls) == 4
+    assert scheduler.stats()["retried"] == 3
+    assert scheduler.stats()["dropped"] == 0
+
+
+def test_transport_errors_are_retried_until_the_budget_runs_out():
+    send = FakeGraphAPI(*[httpx.ConnectError("refused")] * 3)
+    scheduler = _scheduler(send, max_retries=2)
+
+    response = asyncio.run(scheduler.send("alice", {}))
+
+    assert response is None
+    assert len(send.calls) == 3
+    assert scheduler.stats()["dropped"] == 1
+
+
+def test_rejected_messages_are_not_retried():
+    send = FakeGraphAPI(httpx.Response(400, json={"error": {"code": 131026}}))
+    scheduler = _scheduler(send)
+
+    response = asyncio.run(scheduler.send("alice", {}))
+
+    assert response.status_code == 400
+    assert len(send.calls) == 1
+    assert scheduler.stats()["dropped"] == 1
+
+
+def test_retry_after_is_a_floor_on_the_backoff():
+    send = FakeGraphAPI(httpx.Response(429, headers={"Retry-After": "0.2"}))
+    scheduler = _scheduler(send, backoff_base=0.01, backoff_max=0.05)
+
+    asyncio.run(scheduler.send("alice", {}))
+
+    (first, _), (second, _) = send.calls
+    assert second - first >= 0.19
+    # The backoff cap never shortens a server-sent delay.
+    assert scheduler._backoff(5, 30.0) == 30.0
+    assert scheduler._backoff(5, None) <= 0.05
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    in_a_minute = datetime.now(timezone.utc) + timedelta(seconds=60)
+
+    def retry_after(value):
+        return OutboundScheduler._retry_after(
+            httpx.Response(429, headers={"Retry-After": value})
+        )
+
+    assert retry_after("7") == 7.0
+    assert retry_after("-3") == 0.0
+    assert 55 < retry_after(format_datetime(in_a_minute, usegmt=True)) <= 60
+    assert retry_after("soon") is None
+    assert OutboundScheduler._retry_after(httpx.Response(429)) is None
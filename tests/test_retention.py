@@ -0,0 +1,157 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import aiosqlite
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+from anantha.core.exceptions import ThreadLeaseTimeoutError
+from anantha.modules.memory.short_term import retention
+from anantha.modules.memory.short_term.retention import (
+    CheckpointRetention,
+    checkpoint_time,
+)
+from anantha.modules.memory.short_term.sharding import ShardedAsyncSqliteSaver
+
+DAY = 24 * 3600
+
+
+async def _write_turns(saver, thread_id, turns, value_size=16):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for step in range(turns):
+        config = await saver.aput(config, empty_checkpoint(), {"step": step}, {})
+        await saver.aput_writes(
+            config, [("messages", "x" * value_size)], f"task-{step}"
+        )
+
+
+async def _count(conn, table, thread_id):
+    async with conn.execute(
+        f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)
+    ) as cursor:
+        (count,) = await cursor.fetchone()
+    return count
+
+
+def _advance_clock(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(
+        retention,
+        "time",
+        SimpleNamespace(time=lambda: now, perf_counter=time.perf_counter),
+    )
+
+
+def test_checkpoint_time_reads_the_uuid6_timestamp():
+    assert abs(checkpoint_time(str(uuid6())) - time.time()) < 1
+
+
+def test_compaction_keeps_the_latest_checkpoints_of_every_thread(tmp_path):
+    async def run():
+        saver = await ShardedAsyncSqliteSaver.open(str(tmp_path / "memory.db"), 1)
+        await _write_turns(saver, "alice", 5)
+        await _write_turns(saver, "bob", 2)
+        conn = saver.shards[0].conn
+
+        report = await CheckpointRetention(3, DAY, 0).compact(conn)
+        counts = {
+            thread_id: (
+                await _count(conn, "checkpoints", thread_id),
+                await _count(conn, "writes", thread_id),
+            )
+            for thread_id in ("alice", "bob")
+        }
+        latest = await saver.aget_tuple({"configurable": {"thread_id": "alice"}})
+        await saver.close()
+        return report, counts, latest
+
+    report, counts, latest = asyncio.run(run())
+
+    assert report["pruned_checkpoints"] == 2
+    assert report["pruned_writes"] == 2
+    assert report["expired_threads"] == 0
+    assert counts == {"alice": (3, 3), "bob": (2, 2)}
+    assert latest.metadata["step"] == 4
+
+
+def test_idle_threads_are_expired(tmp_path, monkeypatch):
+    async def run():
+        saver = await ShardedAsyncSqliteSaver.open(str(tmp_path / "memory.db"), 1)
+        await _write_turns(saver, "alice", 2)
+        conn = saver.shards[0].conn
+
+        _advance_clock(monkeypatch, 2 * DAY)
+        report = await CheckpointRetention(3, DAY, 0).compact(conn)
+        counts = (
+            await _count(conn, "checkpoints", "alice"),
+            await _count(conn, "writes", "alice"),
+        )
+        await saver.close()
+        return report, counts
+
+    report, counts = asyncio.run(run())
+
+    assert report["expired_threads"] == 1
+    assert counts == (0, 0)
+
+
+def test_idle_threads_busy_with_a_turn_are_kept(tmp_path, monkeypatch):
+    leased = []
+
+    @asynccontextmanager
+    async def busy_lease(thread_id):
+        leased.append(thread_id)
+        raise ThreadLeaseTimeoutError(f"Timed out waiting for thread {thread_id}")
+        yield
+
+    async def run():
+        saver = await ShardedAsyncSqliteSaver.open(str(tmp_path / "memory.db"), 1)
+        await _write_turns(saver, "alice", 2)
+        await _write_turns(saver, "bob", 2)
+        conn = saver.shards[0].conn
+
+        _advance_clock(monkeypatch, 2 * DAY)
+        report = await CheckpointRetention(3, DAY, 0).compact(conn, lease=busy_lease)
+        count = await _count(conn, "checkpoints", "alice")
+        await saver.close()
+        return report, count
+
+    report, count = asyncio.run(run())
+
+    assert sorted(leased) == ["alice", "bob"]
+    assert report["busy_threads"] == 2
+    assert report["expired_threads"] == 0
+    assert count == 2
+
+
+def test_compaction_returns_freed_pages_to_the_filesystem(tmp_path):
+    async def run():
+        saver = await ShardedAsyncSqliteSaver.open(str(tmp_path / "memory.db"), 1)
+        await _write_turns(saver, "alice", 20, value_size=8192)
+        conn = saver.shards[0].conn
+
+        report = await CheckpointRetention(1, DAY, 0).compact(conn)
+        async with conn.execute("PRAGMA freelist_count") as cursor:
+            (free_pages,) = await cursor.fetchone()
+        await saver.close()
+        return report, free_pages
+
+    report, free_pages = asyncio.run(run())
+
+    assert report["pruned_writes"] == 19
+    assert report["vacuumed_pages"] > 0
+    assert free_pages == 0
+
+
+def test_vacuum_is_skipped_without_incremental_auto_vacuum(tmp_path):
+    async def run():
+        async with aiosqlite.connect(str(tmp_path / "plain.db")) as conn:
+            await conn.execute("CREATE TABLE t (x BLOB)")
+            await conn.execute("INSERT INTO t VALUES (zeroblob(100000))")
+            await conn.execute("DELETE FROM t")
+            await conn.commit()
+            return await CheckpointRetention(1, DAY, 0).vacuum(conn)
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+import zstandard
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from anantha.core.exceptions import CheckpointSerializationError
+from anantha.modules.memory.short_term.serializer import (
+    ZSTD_SUFFIX,
+    CompressedSerializer,
+    load_dictionaries,
+    train_dictionary,
+)
+
+
+def _state(i):
+    return {
+        "messages": [
+            HumanMessage(content=f"Hey Anantha, how was your day {i}?", id=f"h{i}"),
+            AIMessage(
+                content=f"Pretty good! I spent hour {i % 24} painting by the lake.",
+                id=f"a{i}",
+            ),
+        ],
+        "summary": "Anantha and the user talked about painting and travel. " * 4,
+        "workflow": "conversation",
+    }
+
+
+def _dictionary(first=0, size=4096):
+    samples = [
+        JsonPlusSerializer().dumps_typed(_state(i))[1]
+        for i in range(first, first + 300)
+    ]
+    return train_dictionary(samples, size)
+
+
+def test_large_payloads_round_trip_compressed():
+    serde = CompressedSerializer(min_bytes=64)
+
+    type_, data = serde.dumps_typed(_state(1))
+
+    assert type_.endswith(ZSTD_SUFFIX)
+    assert len(data) < len(JsonPlusSerializer().dumps_typed(_state(1))[1])
+    assert serde.loads_typed((type_, data)) == _state(1)
+
+
+def test_small_payloads_are_stored_uncompressed():
+    serde = CompressedSerializer(min_bytes=256)
+
+    type_, data = serde.dumps_typed({"step": 1})
+
+    assert not type_.endswith(ZSTD_SUFFIX)
+    assert serde.loads_typed((type_, data)) == {"step": 1}
+
+
+def test_checkpoints_written_before_compression_stay_readable():
+    legacy = JsonPlusSerializer().dumps_typed(_state(2))
+
+    assert CompressedSerializer().loads_typed(legacy) == _state(2)
+
+
+def test_payloads_are_decompressed_with_the_dictionary_they_name():
+    old, new = _dictionary(), _dictionary(first=300, size=2048)
+    assert old.dict_id() != new.dict_id()
+
+    written_with_old = CompressedSerializer(min_bytes=64, dictionaries=[old])
+    serde = CompressedSerializer(min_bytes=64, dictionaries=[old, new])
+    old_payload = written_with_old.dumps_typed(_state(3))
+    new_payload = serde.dumps_typed(_state(4))
+
+    assert zstandard.get_frame_parameters(old_payload[1]).dict_id == old.dict_id()
+    assert zstandard.get_frame_parameters(new_payload[1]).dict_id == new.dict_id()
+    assert serde.loads_typed(old_payload) == _state(3)
+    assert serde.loads_typed(new_payload) == _state(4)
+    # Payloads compressed without a dictionary are readable by every serializer.
+    assert serde.loads_typed(
+        CompressedSerializer(min_bytes=64).dumps_typed(_state(5))
+    ) == _state(5)
+
+
+def test_a_missing_dictionary_is_reported():
+    payload = CompressedSerializer(
+        min_bytes=64, dictionaries=[_dictionary()]
+    ).dumps_typed(_state(6))
+
+    with pytest.raises(CheckpointSerializationError):
+        CompressedSerializer().loads_typed(payload)
+
+
+def test_dictionaries_are_loaded_oldest_first(tmp_path):
+    dictionaries = [_dictionary(), _dictionary(first=300, size=2048)]
+    for age, dictionary in zip((10, 20), dictionaries):
+        path = tmp_path / f"{dictionary.dict_id()}.zdict"
+        path.write_bytes(dictionary.as_bytes())
+        os.utime(path, (1_000_000 - age, 1_000_000 - age))
+    (tmp_path / "notes.txt").write_text("not a dictionary")
+
+    loaded = load_dictionaries(str(tmp_path))
+
+    assert [d.dict_id() for d in loaded] == [
+        dictionaries[1].dict_id(),
+        dictionaries[0].dict_id(),
+    ]
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from anantha.modules.memory.short_term.serializer import CompressedSerializer
+from anantha.modules.memory.short_term.sharding import (
+    ShardedAsyncSqliteSaver,
+    migrate,
+    shard_index,
+    shard_paths,
+)
+
+THREADS = [f"+1555000{i:04d}" for i in range(40)]
+
+
+async def _write_threads(saver, thread_ids, turns=2):
+    for thread_id in thread_ids:
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        for step in range(turns):
+            config = await saver.aput(
+                config, empty_checkpoint(), {"step": step, "thread": thread_id}, {}
+            )
+            await saver.aput_writes(config, [("messages", thread_id)], f"task-{step}")
+
+
+def _query(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _threads_in(path):
+    return {
+        row[0] for row in _query(path, "SELECT DISTINCT thread_id FROM checkpoints")
+    }
+
+
+def test_shard_paths_name_every_shard():
+    assert shard_paths("/data/memory.db", 1) == ["/data/memory.db"]
+    assert shard_paths("/data/memory.db", 3) == [
+        "/data/memory-0-of-3.db",
+        "/data/memory-1-of-3.db",
+        "/data/memory-2-of-3.db",
+    ]
+
+
+def test_shard_index_is_stable_and_spreads_threads():
+    indexes = [shard_index(thread_id, 4) for thread_id in THREADS]
+
+    # sha256 based, so the mapping never changes across processes or releases.
+    assert shard_index("+15550000000", 4) == 0
+    assert shard_index("+15550000000", 16) == 12
+    assert shard_index(12345, 4) == shard_index("12345", 4)
+    assert set(indexes) == {0, 1, 2, 3}
+    assert all(shard_index(thread_id, 1) == 0 for thread_id in THREADS)
+
+
+def test_threads_are_routed_to_their_shard(tmp_path):
+    db_path = str(tmp_path / "memory.db")
+
+    async def run():
+        saver = await ShardedAsyncSqliteSaver.open(
+            db_path, 4, serde=CompressedSerializer(min_bytes=0)
+        )
+        await _write_threads(saver, THREADS)
+        latest = {
+            thread_id: await saver.aget_tuple(
+                {"configurable": {"thread_id": thread_id}}
+            )
+            for thread_id in THREADS
+        }
+        listed = [c async for c in saver.alist(None)]
+        limited = [c async for c in saver.alist(None, limit=5)]
+        await saver.close()
+        return latest, listed, limited
+
+    latest, listed, limited = asyncio.run(run())
+
+    for index, path in enumerate(shard_paths(db_path, 4)):
+        assert _threads_in(path) == {t for t in THREADS if shard_index(t, 4) == index}
+    assert all(
+        checkpoint.metadata["thread"] == thread_id
+        and checkpoint.metadata["step"] == 1
+        and checkpoint.pending_writes
+        for thread_id, checkpoint in latest.items()
+    )
+    assert len(listed) == 2 * len(THREADS)
+    assert len(limited) == 5
+
+
+def test_migration_redistributes_threads_and_can_be_rerun(tmp_path):
+    source = str(tmp_path / "memory.db")
+    target = str(tmp_path / "sharded" / "memory.db")
+
+    async def write_source():
+        saver = await ShardedAsyncSqliteSaver.open(source, 1)
+        await _write_threads(saver, THREADS, turns=3)
+        await saver.close()
+
+    async def read_target():
+        saver = await ShardedAsyncSqliteSaver.open(target, 3)
+        latest = {
+            thread_id: await saver.aget_tuple(
+                {"configurable": {"thread_id": thread_id}}
+            )
+            for thread_id in THREADS
+        }
+        await saver.close()
+        return latest
+
+    asyncio.run(write_source())
+    counts = migrate([source], target, 3)
+    rerun = migrate([source], target, 3)
+    latest = asyncio.run(read_target())
+
+    expected = {"threads": 40, "checkpoints": 120, "writes": 120}
+    assert counts == expected
+    assert rerun == expected
+    for index, path in enumerate(shard_paths(target, 3)):
+        assert _threads_in(path) == {t for t in THREADS if shard_index(t, 3) == index}
+    assert all(checkpoint.metadata["step"] == 2 for checkpoint in latest.values())
+    # Rerunning kept one copy of every row.
+    rows = [
+        _query(path, "SELECT COUNT(*) FROM checkpoints")[0][0]
+        for path in shard_paths(target, 3)
+    ]
+    assert sum(rows) == 120
+
+
+def test_migration_refuses_to_overwrite_its_source(tmp_path):
+    db_path = str(tmp_path / "memory.db")
+    sqlite3.connect(db_path).close()
+
+    with pytest.raises(ValueError):
+        migrate([db_path], db_path, 1)
+    assert os.path.exists(db_path)
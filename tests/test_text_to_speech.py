@@ -0,0 +1,105 @@
+import asyncio
+
+from anantha.graph.utils.helpers import remover_asterisk_content
+from anantha.modules.speech.text_to_speech import (
+    TextToSpeech,
+    split_sentences,
+    stitch_mp3,
+)
+
+
+async def _stream(text, size=7):
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
+
+
+async def _collect(text, min_chars):
+    return [
+        s
+        async for s in split_sentences(
+            _stream(text), min_chars, clean=remover_asterisk_content
+        )
+    ]
+
+
+def test_split_sentences_keeps_action_spans_whole():
+    text = (
+        "Oh hey! *puts down my coffee and stretches. leans closer to the screen* "
+        "So tell me everything about the trip!"
+    )
+
+    sentences = asyncio.run(_collect(text, 40))
+
+    assert sentences
+    assert not any(
+        "*" in s or "puts down" in s or "leans closer" in s for s in sentences
+    )
+    assert "So tell me everything about the trip!" in " ".join(sentences)
+
+
+# MPEG-1 Layer III frame header: 128 kbps, 44.1 kHz, no padding, so every frame is 417 bytes.
+FRAME_HEADER = b"\xff\xfb\x90\x64"
+FRAME_SIZE = 144 * 128000 // 44100
+
+
+def _frames(marker, count=3):
+    return (FRAME_HEADER + bytes([marker]) * (FRAME_SIZE - len(FRAME_HEADER))) * count
+
+
+def _id3v2(payload=b"\x00" * 20):
+    size = len(payload)
+    syncsafe = bytes(
+        [(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]
+    )
+    return b"ID3\x04\x00\x00" + syncsafe + payload
+
+
+def _id3v1():
+    return b"TAG" + b"\x00" * 125
+
+
+def _walk_frames(data):
+    """Markers of the frames of an MP3 stream, failing on anything that is not a frame."""
+    markers = []
+    for offset in range(0, len(data), FRAME_SIZE):
+        frame = data[offset : offset + FRAME_SIZE]
+        assert frame[:4] == FRAME_HEADER, f"No MPEG frame at byte {offset}"
+        assert len(frame) == FRAME_SIZE, f"Truncated frame at byte {offset}"
+        markers.append(frame[4])
+    return markers
+
+
+def test_stitch_mp3_keeps_tags_only_at_the_ends():
+    segments = [_id3v2() + _frames(i) + _id3v1() for i in range(3)]
+
+    stitched = stitch_mp3(segments)
+
+    assert stitched.startswith(_id3v2()) and stitched.endswith(_id3v1())
+    frames = stitched[len(_id3v2()) : -len(_id3v1())]
+    assert _walk_frames(frames) == [0, 0, 0, 1, 1, 1, 2, 2, 2]
+
+
+def test_synthesize_stream_stitches_sentences_in_order(monkeypatch):
+    text = "First sentence is here. Second one comes next. Third and last one!"
+    calls = []
+
+    async def synthesize(cls, sentence):
+        index = len(calls)
+        calls.append(sentence)
+        # Later sentences finish first, so the output order must not follow completion.
+        await asyncio.sleep(0.01 * (3 - index))
+        return _id3v2() + _frames(index)
+
+    monkeypatch.setattr(TextToSpeech, "synthesize", classmethod(synthesize))
+
+    audio = asyncio.run(
+        TextToSpeech.synthesize_stream(_stream(text), concurrency=3, min_chars=10)
+    )
+
+    assert calls == [
+        "First sentence is here.",
+        "Second one comes next.",
+        "Third and last one!",
+    ]
+    assert audio.startswith(_id3v2())
+    assert _walk_frames(audio[len(_id3v2()) :]) == [0, 0, 0, 1, 1, 1, 2, 2, 2]
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from anantha.core.exceptions import ThreadLeaseTimeoutError
+from anantha.modules.memory.short_term.thread_lease import ThreadLeaseManager
+
+
+async def _rows(manager):
+    async with manager._conn.execute(
+        "SELECT thread_id, owner FROM thread_leases"
+    ) as cursor:
+        return await cursor.fetchall()
+
+
+def test_runs_of_a_thread_are_exclusive(tmp_path):
+    async def run():
+        manager = ThreadLeaseManager(str(tmp_path / "leases.db"), 5.0, 5.0)
+        await manager.start()
+        events = []
+
+        async def turn(thread_id, name):
+            async with manager.lease(thread_id):
+                events.append(f"{name} start")
+                await asyncio.sleep(0.05)
+                events.append(f"{name} end")
+
+        await asyncio.gather(turn("t1", "a"), turn("t1", "b"), turn("t2", "c"))
+        rows = await _rows(manager)
+        await manager.close()
+        return events, rows, manager._locks
+
+    events, rows, locks = asyncio.run(run())
+
+    t1 = [e for e in events if e[0] in "ab"]
+    assert t1 == ["a start", "a end", "b start", "b end"]
+    assert events.index("c start") < events.index("a end")
+    assert rows == []
+    assert locks == {}
+
+
+def test_acquire_times_out_while_the_thread_is_busy(tmp_path):
+    async def run():
+        manager = ThreadLeaseManager(str(tmp_path / "leases.db"), 5.0, 0.1)
+        await manager.start()
+        try:
+            async with manager.lease("t1"):
+                with pytest.raises(ThreadLeaseTimeoutError):
+                    async with manager.lease("t1"):
+                        pass
+        finally:
+            await manager.close()
+
+    asyncio.run(run())
+
+
+def test_a_lease_held_by_another_process_blocks_until_timeout(tmp_path):
+    db_path = str(tmp_path / "leases.db")
+
+    async def run():
+        first = ThreadLeaseManager(db_path, 5.0, 0.3)
+        second = ThreadLeaseManager(db_path, 5.0, 0.3)
+        await first.start()
+        await second.start()
+        try:
+            async with first.lease("t1"):
+                with pytest.raises(ThreadLeaseTimeoutError):
+                    async with second.lease("t1"):
+                        pass
+            async with second.lease("t1"):
+                pass
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(run())
+
+
+def test_an_expired_lease_is_taken_over(tmp_path):
+    async def run():
+        manager = ThreadLeaseManager(str(tmp_path / "leases.db"), 0.2, 2.0)
+        await manager.start()
+        # A row left behind by a crashed process, already past its TTL.
+        await manager._conn.execute(
+            "INSERT INTO thread_leases VALUES ('t1', 'crashed:1:x', 0)"
+        )
+        await manager._conn.commit()
+        async with manager.lease("t1"):
+            rows = await _rows(manager)
+        await manager.close()
+        return rows
+
+    ((thread_id, owner),) = asyncio.run(run())
+
+    assert thread_id == "t1"
+    assert owner != "crashed:1:x"
+
+
+def test_the_holder_renews_its_lease_past_the_ttl(tmp_path):
+    db_path = str(tmp_path / "leases.db")
+
+    async def run():
+        holder = ThreadLeaseManager(db_path, 0.3, 1.0)
+        other = ThreadLeaseManager(db_path, 0.3, 0.2)
+        await holder.start()
+        await other.start()
+        try:
+            async with holder.lease("t1"):
+                # Well past the TTL: only renewal keeps the row from being taken over.
+                await asyncio.sleep(0.8)
+                with pytest.raises(ThreadLeaseTimeoutError):
+                    async with other.lease("t1"):
+                        pass
+        finally:
+            await holder.close()
+            await other.close()
+
+    asyncio.run(run())
@@ -0,0 +1,202 @@
+import asyncio
+
+import pytest
+
+from anantha.core.exceptions import WorkQueueFullError
+from anantha.interfaces.whatsapp.work_queue import SenderWorkQueue
+
+
+class Recorder:
+    """Handler that records the batches it receives after an optional delay."""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, key, payloads):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            self.batches.append((key, payloads))
+        finally:
+            self.active -= 1
+
+
+async def _drain(queue, timeout=5.0):
+    await queue.stop(timeout=timeout)
+
+
+def test_items_of_a_key_are_handled_in_arrival_order():
+    async def run():
+        handler = Recorder(delay=0.01)
+        queue = SenderWorkQueue(handler, concurrency=4, max_size=100)
+        await queue.start()
+        for i in range(5):
+            queue.enqueue("alice", i)
+        await _drain(queue)
+        return handler
+
+    handler = asyncio.run(run())
+
+    assert [payloads for _, payloads in handler.batches] == [[0], [1], [2], [3], [4]]
+    assert handler.max_active == 1
+
+
+def test_different_keys_are_handled_concurrently():
+    async def run():
+        handler = Recorder(delay=0.05)
+        queue = SenderWorkQueue(handler, concurrency=3, max_size=100)
+        await queue.start()
+        for key in ("alice", "bob", "carol"):
+            queue.enqueue(key, key)
+        await _drain(queue)
+        return handler, queue.stats()
+
+    handler, stats = asyncio.run(run())
+
+    assert handler.max_active == 3
+    assert stats["processed"] == 3
+    assert stats["depth"] == 0
+    assert stats["senders"] == 0
+
+
+def test_enqueue_raises_when_full():
+    async def run():
+        queue = SenderWorkQueue(Recorder(), concurrency=1, max_size=2)
+        queue.enqueue("alice", 1)
+        queue.enqueue("bob", 2)
+        with pytest.raises(WorkQueueFullError):
+            queue.enqueue("carol", 3)
+        return queue.depth
+
+    assert asyncio.run(run()) == 2
+
+
+def test_handler_errors_do_not_stop_the_key():
+    async def run():
+        seen = []
+
+        async def handler(key, payloads):
+            seen.extend(payloads)
+            if payloads == [0]:
+                raise RuntimeError("boom")
+
+        queue = SenderWorkQueue(handler, concurrency=1, max_size=10)
+        await queue.start()
+        queue.enqueue("alice", 0)
+        queue.enqueue("alice", 1)
+        await _drain(queue)
+        return seen, queue.stats()
+
+    seen, stats = asyncio.run(run())
+
+    assert seen == [0, 1]
+    assert stats["failed"] == 1
+    assert stats["processed"] == 1
+
+
+def test_a_burst_is_coalesced_into_one_batch():
+    async def run():
+        handler = Recorder()
+        queue = SenderWorkQueue(
+            handler,
+            concurrency=2,
+            max_size=100,
+            coalesce_window=0.1,
+            coalesce_max_wait=1.0,
+            max_batch=10,
+        )
+        await queue.start()
+        for i in range(3):
+            queue.enqueue("alice", i)
+            await asyncio.sleep(0.02)
+        debouncing = queue.stats()["debouncing"]
+        await _drain(queue)
+        return handler, debouncing
+
+    handler, debouncing = asyncio.run(run())
+
+    assert debouncing == 1
+    assert handler.batches == [("alice", [0, 1, 2])]
+
+
+def test_coalescing_never_waits_past_max_wait():
+    async def run():
+        handler = Recorder()
+        queue = SenderWorkQueue(
+            handler,
+            concurrency=1,
+            max_size=100,
+            coalesce_window=0.1,
+            coalesce_max_wait=0.2,
+            max_batch=100,
+        )
+        await queue.start()
+        # Arrivals every 50 ms keep resetting the window, so only max_wait releases the burst.
+        for i in range(10):
+            queue.enqueue("alice", i)
+            await asyncio.sleep(0.05)
+        await _drain(queue)
+        return handler
+
+    handler = asyncio.run(run())
+
+    batches = [payloads for _, payloads in handler.batches]
+    assert len(batches) > 1
+    assert [i for batch in batches for i in batch] == list(range(10))
+
+
+def test_batches_are_capped_at_max_batch():
+    async def run():
+        handler = Recorder()
+        queue = SenderWorkQueue(
+            handler,
+            concurrency=1,
+            max_size=100,
+            coalesce_window=0.05,
+            coalesce_max_wait=0.5,
+            max_batch=2,
+        )
+        await queue.start()
+        for i in range(5):
+            queue.enqueue("alice", i)
+        await _drain(queue)
+        return handler
+
+    handler = asyncio.run(run())
+
+    assert [payloads for _, payloads in handler.batches] == [[0, 1], [2, 3], [4]]
+
+
+def test_requeued_items_go_ahead_of_newer_ones():
+    async def run():
+        seen = []
+
+        async def handler(key, payloads):
+            seen.append(payloads)
+            if payloads == [0, 1]:
+                queue.enqueue(key, 2)
+                queue.requeue(key, payloads)
+
+        queue = SenderWorkQueue(
+            handler,
+            concurrency=1,
+            max_size=2,
+            coalesce_window=0.02,
+            coalesce_max_wait=0.1,
+            max_batch=10,
+        )
+        await queue.start()
+        queue.enqueue("alice", 0)
+        queue.enqueue("alice", 1)
+        await _drain(queue)
+        return seen, queue.depth
+
+    seen, depth = asyncio.run(run())
+
+    # The retry is not bounded by max_size, and keeps the batch in front of item 2.
+    assert seen == [[0, 1], [0, 1, 2]]
+    assert depth == 0